@@ -1,11 +1,14 @@
 import tkinter as tk
-from tkinter import messagebox, Toplevel
-import random
+from tkinter import messagebox, filedialog, Toplevel
+import argparse
 import threading
 import os
+from collections import OrderedDict
 from PIL import Image, ImageTk
 import pygame
 
+from problembank import LEVELS, MAX_SEED, ProblemBank, generate_bank, problem_text
+
 AUDIO_FILE = "quizaudio.mp3"
 BG_IMAGE_FILE = "background1.jpg"
 
@@ -38,8 +41,30 @@ CURRENT_HINT = ""
 BG_LABEL = None
 ORIGINAL_BG_IMAGE = None
 BG_PHOTO = None
+# background resizing: quick drafts while the window is being resized, a
+# LANCZOS pass once it has settled, and the last few finished sizes kept
+BG_DRAFT_MS = 50
+BG_SETTLE_MS = 200
+BG_CACHE_SIZE = 6
+BG_CACHE = OrderedDict()  # (width, height) -> PhotoImage
+BG_SIZE = None            # size of the image on screen
+BG_WANTED = None          # size of the frame, once a redraw is pending
+BG_DRAFT_JOB = None
+BG_SETTLE_JOB = None
 name_entry = None
 inst_entry = None
+# questions of the current quiz, drawn when it starts (see problembank.py)
+QUIZ_BANK = None
+# the question screen: built once by buildQuizScreen, then only updated per question
+QUIZ_CARD = None
+score_label = None
+problem_label = None
+submit_button = None
+# from the command line: seed for every quiz drawn, or a saved bank to play
+QUIZ_SEED = None
+SAVED_BANK = None
+# where SAVED_BANK came from, shown with the results when its seed cannot replay it
+SAVED_BANK_SOURCE = ""
 
 # Colors
 COLOR_PALETTE = {
@@ -54,12 +79,9 @@ COLOR_PALETTE = {
     "ACCENT_BLACK": "#3E2723"      # deep brown
 }
 
-# Difficulty Map
-DIFFICULTY_MAP = {
-    1: (0, 9, "Single-Digit (0-9)"),
-    2: (10, 99, "Double-Digit (10-99)"),
-    3: (1000, 9999, "Four-Digit (1000-9999)")
-}
+# Difficulty Map: operand ranges are the problem bank's (problembank.LEVELS)
+LEVEL_NAMES = {1: "Single-Digit", 2: "Double-Digit", 3: "Four-Digit"}
+DIFFICULTY_MAP = {level: (lo, hi, f"{LEVEL_NAMES[level]} ({lo}-{hi})") for level, (lo, hi) in LEVELS.items()}
 
 # Audio
 USE_PYGAME = False
@@ -92,15 +114,14 @@ def start_music():
 # Utility
 def clear_frame(frame):
     for widget in frame.winfo_children():
-        if widget != BG_LABEL:
+        if widget == BG_LABEL:
+            continue
+        if widget == QUIZ_CARD:
+            # kept for the next quiz, just taken off the screen
+            widget.pack_forget()
+        else:
             widget.destroy()
 
-def randomInt(min_val, max_val):
-    return random.randint(min_val, max_val)
-
-def decideOperation():
-    return random.choice(['+', '-'])
-
 def get_rank(final_score):
     if final_score >= 90: return "A+"
     elif final_score >= 80: return "A"
@@ -113,14 +134,12 @@ def get_hint(num1, num2, operation):
 
 def generateProblem():
     global CURRENT_ANSWER, PROBLEM_STRING, ATTEMPTS_LEFT
-    min_val, max_val, _ = DIFFICULTY_MAP.get(DIFFICULTY, (0,9,""))
-    num1 = randomInt(min_val, max_val)
-    num2 = randomInt(min_val, max_val)
-    operation = decideOperation()
-    CURRENT_ANSWER = num1+num2 if operation=='+' else num1-num2
-    PROBLEM_STRING = f"{num1} {operation} {num2} ="
+    # the quiz's questions were all drawn in startQuiz; this only looks the next one up
+    problem = QUIZ_BANK[QUESTION_COUNT]
+    CURRENT_ANSWER = problem.answer
+    PROBLEM_STRING = problem_text(problem)
     ATTEMPTS_LEFT = 2
-    return PROBLEM_STRING, num1, num2, operation
+    return PROBLEM_STRING, problem.num1, problem.num2, problem.operation
 
 def isCorrect(user_answer, current_answer):
     try:
@@ -135,15 +154,54 @@ def quitQuizEarly():
         window.quit()
 
 # Background Image
+def show_background(width, height, final):
+    global BG_PHOTO, BG_SIZE
+    if not (ORIGINAL_BG_IMAGE and BG_LABEL) or width < 2 or height < 2:
+        return
+    size = (width, height)
+    photo = BG_CACHE.get(size)
+    if photo is not None:
+        BG_CACHE.move_to_end(size)
+    elif final:
+        photo = ImageTk.PhotoImage(ORIGINAL_BG_IMAGE.resize(size, Image.Resampling.LANCZOS))
+        BG_CACHE[size] = photo
+        if len(BG_CACHE) > BG_CACHE_SIZE:
+            BG_CACHE.popitem(last=False)
+    elif size == BG_SIZE:
+        return
+    else:
+        # a draft for a size the window is only passing through: fast and not kept
+        photo = ImageTk.PhotoImage(ORIGINAL_BG_IMAGE.resize(size, Image.Resampling.NEAREST))
+    BG_PHOTO = photo
+    BG_SIZE = size
+    BG_LABEL.config(image=BG_PHOTO)
+    BG_LABEL.image = BG_PHOTO
+
+def draw_draft_background():
+    global BG_DRAFT_JOB
+    BG_DRAFT_JOB = None
+    show_background(*BG_WANTED, final=False)
+
+def draw_final_background():
+    global BG_SETTLE_JOB
+    BG_SETTLE_JOB = None
+    show_background(*BG_WANTED, final=True)
+
 def resize_background(event):
-    global ORIGINAL_BG_IMAGE, BG_PHOTO, BG_LABEL
-    if ORIGINAL_BG_IMAGE and BG_LABEL:
-        new_width = event.width
-        new_height = event.height
-        resized_image = ORIGINAL_BG_IMAGE.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        BG_PHOTO = ImageTk.PhotoImage(resized_image)
-        BG_LABEL.config(image=BG_PHOTO)
-        BG_LABEL.image = BG_PHOTO
+    global BG_WANTED, BG_DRAFT_JOB, BG_SETTLE_JOB
+    # only the frame's own size matters, not its children's or a move of the window
+    if event.widget is not main_frame:
+        return
+    size = (event.width, event.height)
+    if size == BG_WANTED or (BG_WANTED is None and size == BG_SIZE):
+        return
+    BG_WANTED = size
+    # at most one draft per BG_DRAFT_MS while resizing, and the real resize once it stops
+    if BG_DRAFT_JOB is None:
+        BG_DRAFT_JOB = window.after(BG_DRAFT_MS, draw_draft_background)
+    if BG_SETTLE_JOB is not None:
+        window.after_cancel(BG_SETTLE_JOB)
+    BG_SETTLE_JOB = window.after(BG_SETTLE_MS, draw_final_background)
 
 def set_background(frame):
     global ORIGINAL_BG_IMAGE, BG_LABEL
@@ -151,16 +209,15 @@ def set_background(frame):
         return
     if ORIGINAL_BG_IMAGE is None:
         ORIGINAL_BG_IMAGE = Image.open(BG_IMAGE_PATH)
+        # decode once here rather than on the first resize
+        ORIGINAL_BG_IMAGE.load()
     if BG_LABEL is None:
         BG_LABEL = tk.Label(frame)
         BG_LABEL.place(x=0,y=0,relwidth=1,relheight=1)
         BG_LABEL.lower()
         frame.bind('<Configure>', resize_background)
-    class DummyEvent:
-        def __init__(self, width, height):
-            self.width = width
-            self.height = height
-    resize_background(DummyEvent(frame.winfo_width(), frame.winfo_height()))
+    # a cache hit whenever the window has not changed size since the last screen
+    show_background(frame.winfo_width(), frame.winfo_height(), final=True)
 
 # GUI Screens
 def displayWelcomeScreen():
@@ -224,57 +281,72 @@ def displayMenu():
     tk.Label(card,text="Select Difficulty", font=('Inter',20,'bold'), fg=COLOR_PALETTE["ACCENT_PRIMARY"], bg=COLOR_PALETTE["BG_SECONDARY"]).pack(pady=15)
     
     for level, (_,_,desc) in DIFFICULTY_MAP.items():
+        if SAVED_BANK is not None and level != SAVED_BANK.level:
+            continue
         tk.Button(card,text=f"{level}. {desc}", command=lambda l=level: startQuiz(l), width=25,
                   font=('Inter',14), bg=COLOR_PALETTE["ACCENT_PRIMARY"], fg="white").pack(pady=10)
 
-def startQuiz(level):
-    global DIFFICULTY, SCORE, QUESTION_COUNT
+def startQuiz(level, bank=None):
+    global DIFFICULTY, SCORE, QUESTION_COUNT, QUIZ_BANK
     DIFFICULTY = level
+    # every question of the quiz is drawn now, without repeats; bank replays an earlier quiz
+    if bank is None:
+        bank = SAVED_BANK if SAVED_BANK is not None else generate_bank(level, MAX_QUESTIONS, QUIZ_SEED)
+    QUIZ_BANK = bank
     SCORE = 0
     QUESTION_COUNT = 0
     start_music()
     displayProblem()
 
-#  MODIFIED FUNCTION 
+def buildQuizScreen():
+    global QUIZ_CARD, score_label, problem_label, answer_entry, feedback_label, submit_button
+    QUIZ_CARD = tk.Frame(main_frame, bg=COLOR_PALETTE["BG_SECONDARY"], padx=30,pady=30)
+
+    # Header frame inside the problem card
+    header_frame = tk.Frame(QUIZ_CARD, bg=COLOR_PALETTE["BG_SECONDARY"])
+    header_frame.pack(fill='x', expand=True, pady=(0, 15))
+    score_label = tk.Label(header_frame, text="", bg=COLOR_PALETTE["BG_SECONDARY"], fg=COLOR_PALETTE["FG_PRIMARY"])
+    score_label.pack(side=tk.LEFT)
+
+    problem_label = tk.Label(QUIZ_CARD, text="", font=('Inter',40,'bold'), bg=COLOR_PALETTE["BG_SECONDARY"], fg=COLOR_PALETTE["FG_PRIMARY"])
+    problem_label.pack(pady=20)
+
+    answer_entry = tk.Entry(QUIZ_CARD, font=('Inter',20), width=15, justify='center', bd=2, relief='solid', bg=COLOR_PALETTE["ENTRY_BG"], fg=COLOR_PALETTE["FG_PRIMARY"], insertbackground=COLOR_PALETTE["FG_PRIMARY"])
+    answer_entry.pack(pady=15)
+
+    # Feedback label inside the card
+    feedback_label = tk.Label(QUIZ_CARD, text="", font=('Inter',14), bg=COLOR_PALETTE["BG_SECONDARY"])
+    feedback_label.pack(pady=(10,0))
+
+    submit_button = tk.Button(QUIZ_CARD, text="Submit Answer", command=submitAnswer, bg=COLOR_PALETTE["ACCENT_PRIMARY"], fg="white")
+    submit_button.pack(pady=20)
+
+    # Quit button
+    tk.Button(QUIZ_CARD, text="❌ Quit Test", command=quitQuizEarly,
+              bg=COLOR_PALETTE["ACCENT_FAIL"], fg="white").pack(pady=(5, 10))
+
 def displayProblem():
-    global QUESTION_COUNT, answer_entry, feedback_label, CURRENT_HINT
-    clear_frame(main_frame)
+    global CURRENT_HINT
+    if QUIZ_CARD is None:
+        buildQuizScreen()
+    if not QUIZ_CARD.winfo_manager():
+        # first question of a quiz: swap the previous screen for the question card
+        clear_frame(main_frame)
+        main_frame.config(bg=COLOR_PALETTE["BG_PRIMARY"])
+        set_background(main_frame)
+        QUIZ_CARD.pack(pady=40)
     window.title(f"Math Quiz | Question {QUESTION_COUNT+1}")
-    main_frame.config(bg=COLOR_PALETTE["BG_PRIMARY"])
-    set_background(main_frame)
-    
-    problem_card = tk.Frame(main_frame, bg=COLOR_PALETTE["BG_SECONDARY"], padx=30,pady=30)
-    problem_card.pack(pady=40) 
-    
-    # Header frame inside the problem_card
-    header_frame = tk.Frame(problem_card, bg=COLOR_PALETTE["BG_SECONDARY"])
-    header_frame.pack(fill='x', expand=True, pady=(0, 15))
-             
-    # Score label
-    tk.Label(header_frame,text=f"Score: {SCORE} | Question: {QUESTION_COUNT+1} of {MAX_QUESTIONS}",
-             bg=COLOR_PALETTE["BG_SECONDARY"], 
-             fg=COLOR_PALETTE["FG_PRIMARY"]).pack(side=tk.LEFT)
-    # End of header
 
     problem_text, num1, num2, operation = generateProblem()
     CURRENT_HINT = get_hint(num1,num2,operation)
-    
-    tk.Label(problem_card,text=problem_text, font=('Inter',40,'bold'), bg=COLOR_PALETTE["BG_SECONDARY"], fg=COLOR_PALETTE["FG_PRIMARY"]).pack(pady=20)
-    
-    answer_entry = tk.Entry(problem_card, font=('Inter',20), width=15, justify='center', bd=2, relief='solid', bg=COLOR_PALETTE["ENTRY_BG"], fg=COLOR_PALETTE["FG_PRIMARY"], insertbackground=COLOR_PALETTE["FG_PRIMARY"])
-    answer_entry.pack(pady=15)
+
+    # later questions only change what the widgets show
+    score_label.config(text=f"Score: {SCORE} | Question: {QUESTION_COUNT+1} of {MAX_QUESTIONS}")
+    problem_label.config(text=problem_text)
+    feedback_label.config(text="")
+    answer_entry.delete(0,tk.END)
+    submit_button.config(state="normal")
     answer_entry.focus_set()
-    
-    # Feedback label moved inside the card
-    feedback_label = tk.Label(problem_card,text="", font=('Inter',14), bg=COLOR_PALETTE["BG_SECONDARY"])
-    feedback_label.pack(pady=(10,0)) # Packed inside problem_card
-    
-    tk.Button(problem_card,text="Submit Answer", command=submitAnswer, bg=COLOR_PALETTE["ACCENT_PRIMARY"], fg="white").pack(pady=20)
-    
-    # Quit button
-    tk.Button(problem_card,text="❌ Quit Test", command=quitQuizEarly, 
-              bg=COLOR_PALETTE["ACCENT_FAIL"], fg="white").pack(pady=(5, 10))
-#  END OF MODIFIED FUNCTION 
 
 def submitAnswer():
     global SCORE, QUESTION_COUNT, ATTEMPTS_LEFT
@@ -291,6 +363,8 @@ def submitAnswer():
         feedback_label.config(text=f"✅ Correct! (+{score_awarded} points)", fg=COLOR_PALETTE["ACCENT_SUCCESS"])
         QUESTION_COUNT += 1
         answer_entry.delete(0,tk.END)
+        # no second submit while the feedback is shown
+        submit_button.config(state="disabled")
         window.after(500,nextQuestionOrEnd) # Wait 500ms before next question
     else:
         ATTEMPTS_LEFT -= 1
@@ -349,10 +423,48 @@ def displayResults():
     tk.Label(results_card,text=f"Total Score: {SCORE}/{MAX_QUESTIONS*10}", font=('Inter',16), fg=COLOR_PALETTE["ACCENT_PRIMARY"], bg=COLOR_PALETTE["BG_SECONDARY"]).pack(pady=5)
     tk.Label(results_card,text=f"Final Rank: {rank}", font=('Inter',18,'bold'), fg=COLOR_PALETTE["ACCENT_SUCCESS"], bg=COLOR_PALETTE["BG_SECONDARY"]).pack(pady=10)
     
+    source = f"seed {QUIZ_BANK.seed}" if QUIZ_BANK.seed is not None else SAVED_BANK_SOURCE
+    tk.Label(results_card,text=f"Level {QUIZ_BANK.level}, {source}", font=('Inter',11), fg=COLOR_PALETTE["FG_SECONDARY"], bg=COLOR_PALETTE["BG_SECONDARY"]).pack(pady=5)
+    tk.Button(results_card,text="Retry Same Questions", command=lambda: startQuiz(DIFFICULTY, QUIZ_BANK), font=('Inter',14), bg=COLOR_PALETTE["ACCENT_SUCCESS"], fg=COLOR_PALETTE["FG_PRIMARY"], relief='flat', padx=20,pady=10,width=15).pack(pady=(15,5))
+    tk.Button(results_card,text="Save Questions...", command=saveQuestions, font=('Inter',12), bg=COLOR_PALETTE["BG_PRIMARY"], fg=COLOR_PALETTE["FG_PRIMARY"], relief='flat', padx=20,pady=6,width=15).pack(pady=5)
     tk.Button(results_card,text="Replay", command=displayWelcomeScreen, font=('Inter',14), bg=COLOR_PALETTE["ACCENT_PRIMARY"], fg="white", relief='flat', padx=20,pady=10,width=15).pack(pady=15)
     tk.Button(results_card,text="Exit", command=quitQuizEarly, font=('Inter',14), bg=COLOR_PALETTE["ACCENT_FAIL"], fg="white", relief='flat', padx=20,pady=10,width=15).pack(pady=5)
 
+def saveQuestions():
+    path = filedialog.asksaveasfilename(defaultextension=".mqb", filetypes=[("Problem bank","*.mqb")], title="Save questions")
+    if not path:
+        return
+    try:
+        QUIZ_BANK.save(path)
+        messagebox.showinfo("Saved", f"Questions saved. Play them again with:\npython mathquiz.py --bank {os.path.basename(path)}")
+    except Exception as e:
+        messagebox.showerror("Error", f"Could not save the questions: {e}")
+
+def parseArguments():
+    global QUIZ_SEED, SAVED_BANK, SAVED_BANK_SOURCE
+    parser = argparse.ArgumentParser(description="Arithmetic quiz.")
+    parser.add_argument("--seed", type=int, default=None, help="draw every quiz from this seed (the same questions each time)")
+    parser.add_argument("--bank", default=None, help="play questions from a problem bank file (see problembank.py)")
+    parser.add_argument("--start", type=int, default=0, help="first question of the bank to play")
+    args = parser.parse_args()
+    if args.seed is not None and not 0 <= args.seed <= MAX_SEED:
+        parser.error(f"--seed must be a whole number from 0 to {MAX_SEED}")
+    if args.start < 0:
+        parser.error("--start cannot be negative")
+    QUIZ_SEED = args.seed
+    if args.bank:
+        try:
+            bank = ProblemBank.load(args.bank)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        if len(bank) < args.start + MAX_QUESTIONS:
+            parser.error(f"{args.bank} has no {MAX_QUESTIONS} questions from question {args.start + 1}")
+        # a part of a bank cannot be drawn again from the bank's seed, so it gets none
+        SAVED_BANK = bank.slice(args.start, args.start + MAX_QUESTIONS)
+        SAVED_BANK_SOURCE = f"questions {args.start + 1}-{args.start + MAX_QUESTIONS} of {os.path.basename(args.bank)}"
+
 # Main App 
+parseArguments()
 window = tk.Tk()
 window.title("Math Quiz")
 window.attributes('-fullscreen', True)
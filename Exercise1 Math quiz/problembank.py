@@ -0,0 +1,188 @@
+# problembank.py
+# Problem banks for the math quiz: every question of a session (or of a large
+# practice set) is generated up front from a seed, so nothing is generated
+# while the quiz screen is up and a session can be replayed exactly.
+#
+# A problem "num1 op num2" of a level is stored as one integer code, its index
+# in the level's problem space (every num1, num2 in the level's range and
+# both operations). A bank without duplicates is a sample of that space
+# without replacement, drawn by random.sample in one call rather than three
+# random calls per question, and kept in an array of 32 bit codes, so a
+# million problems take 4 MB in memory and on disk. For example:
+#
+#     python problembank.py --level 3 --count 1000000 --seed 42 --out practice.mqb
+#     python problembank.py --show practice.mqb
+import argparse
+import os
+import random
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+
+# level -> (lowest operand, highest operand); mathquiz.DIFFICULTY_MAP is built from this
+LEVELS = {
+    1: (0, 9),
+    2: (10, 99),
+    3: (1000, 9999),
+}
+OPERATIONS = ("+", "-")
+
+MAGIC = b"MQB1"
+# magic, level, unique flag, flags, seed, count, crc32 of the codes
+HEADER = struct.Struct("<4sBBBxQII")
+CODE_TYPE = "I"
+# set in the flags when the seed does not reproduce the codes (e.g. a slice of a bank)
+FLAG_NO_SEED = 1
+MAX_SEED = 2**64 - 1
+
+Problem = namedtuple("Problem", "num1 operation num2 answer")
+
+
+def problem_text(p):
+    return f"{p.num1} {p.operation} {p.num2} ="
+
+
+def space_size(level):
+    """Number of distinct problems of a level."""
+    lo, hi = LEVELS[level]
+    span = hi - lo + 1
+    return span * span * len(OPERATIONS)
+
+
+def decode(level, code):
+    lo, hi = LEVELS[level]
+    span = hi - lo + 1
+    code, op = divmod(code, len(OPERATIONS))
+    a, b = divmod(code, span)
+    num1, num2 = lo + a, lo + b
+    operation = OPERATIONS[op]
+    return Problem(num1, operation, num2, num1 + num2 if operation == "+" else num1 - num2)
+
+
+def encode(level, num1, operation, num2):
+    lo, hi = LEVELS[level]
+    span = hi - lo + 1
+    return ((num1 - lo) * span + (num2 - lo)) * len(OPERATIONS) + OPERATIONS.index(operation)
+
+
+class ProblemBank:
+    """An ordered list of problems for one level, and the seed it was drawn from (None if unknown)."""
+    def __init__(self, level, seed, codes, unique=True):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level {level}")
+        self.level = level
+        self.seed = seed
+        self.codes = codes
+        self.unique = unique
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return decode(self.level, self.codes[i])
+
+    def __iter__(self):
+        level = self.level
+        return (decode(level, c) for c in self.codes)
+
+    def save(self, path):
+        """Write the bank in the binary format: a fixed header, then the codes."""
+        codes = self.codes
+        if sys.byteorder != "little":
+            codes = array(CODE_TYPE, codes)
+            codes.byteswap()
+        data = codes.tobytes()
+        with open(path + ".tmp", "wb") as f:
+            flags = FLAG_NO_SEED if self.seed is None else 0
+            f.write(HEADER.pack(MAGIC, self.level, self.unique, flags, self.seed or 0, len(self.codes), zlib.crc32(data)))
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+            if len(head) < HEADER.size:
+                raise ValueError(f"{path} is not a problem bank")
+            magic, level, unique, flags, seed, count, crc = HEADER.unpack(head)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a problem bank")
+            data = f.read()
+        codes = array(CODE_TYPE)
+        if len(data) != count * codes.itemsize or zlib.crc32(data) != crc:
+            raise ValueError(f"{path} is truncated or damaged")
+        codes.frombytes(data)
+        if sys.byteorder != "little":
+            codes.byteswap()
+        return cls(level, None if flags & FLAG_NO_SEED else seed, codes, bool(unique))
+
+    def slice(self, start, stop):
+        """A bank of the problems start..stop-1; its seed is kept only if that is all of them."""
+        codes = self.codes[start:stop]
+        seed = self.seed if len(codes) == len(self.codes) else None
+        return ProblemBank(self.level, seed, codes, self.unique)
+
+
+def new_seed():
+    return random.SystemRandom().getrandbits(63)
+
+
+def generate_bank(level, count, seed=None, unique=True):
+    """Draw count problems of a level from seed (a fresh one when None, kept on the bank).
+
+    With unique set no problem appears twice, so count may not exceed
+    space_size(level) (200 at level 1).
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level {level}")
+    if seed is None:
+        seed = new_seed()
+    if not 0 <= seed <= MAX_SEED:
+        raise ValueError(f"The seed must be a whole number from 0 to {MAX_SEED}")
+    size = space_size(level)
+    rng = random.Random(seed)
+    if unique:
+        if count > size:
+            raise ValueError(f"Level {level} only has {size} different problems; {count} were asked for")
+        codes = array(CODE_TYPE, rng.sample(range(size), count))
+    else:
+        codes = array(CODE_TYPE, rng.choices(range(size), k=count))
+    return ProblemBank(level, seed, codes, unique)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or inspect math quiz problem banks.")
+    parser.add_argument("--level", type=int, choices=sorted(LEVELS), default=1)
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None, help="default: a random seed, printed so the bank can be rebuilt")
+    parser.add_argument("--repeats", action="store_true", help="allow the same problem more than once")
+    parser.add_argument("--out", default=None, help="write the bank to this file")
+    parser.add_argument("--show", default=None, metavar="BANK", help="print the problems of a saved bank")
+    parser.add_argument("--limit", type=int, default=20, help="problems printed by --show")
+    args = parser.parse_args()
+
+    if args.show:
+        try:
+            bank = ProblemBank.load(args.show)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        seed = f"seed {bank.seed}" if bank.seed is not None else "no seed (part of another bank)"
+        print(f"level {bank.level}, {seed}, {len(bank)} problems{'' if bank.unique else ' (repeats allowed)'}")
+        for i in range(min(args.limit, len(bank))):
+            p = bank[i]
+            print(f"{i + 1:>6}. {problem_text(p)} {p.answer}")
+        return
+    try:
+        bank = generate_bank(args.level, args.count, args.seed, unique=not args.repeats)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"level {bank.level}, seed {bank.seed}, {len(bank)} problems")
+    if args.out:
+        bank.save(args.out)
+        print(f"Saved to {args.out} ({os.path.getsize(args.out)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
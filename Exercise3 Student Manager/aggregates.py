@@ -0,0 +1,105 @@
+# aggregates.py
+# Running statistics for the stats window: grade counts, fixed 10% histogram
+# bins and the lowest/highest/average percentage. They are updated with a
+# constant amount of work on every add/update/delete, so drawing a chart or
+# the stats header never has to look at every student again.
+from studentmodel import ModelListener
+
+BIN_WIDTH = 10
+BIN_COUNT = 10
+# percentages are kept to 2 decimal places for min/max (0.00 .. 100.00)
+PERC_SCALE = 100
+MAX_KEY = 100 * PERC_SCALE
+
+
+def perc_bin(perc):
+    return min(max(int(perc // BIN_WIDTH), 0), BIN_COUNT - 1)
+
+
+def perc_key(perc):
+    return min(max(int(round(perc * PERC_SCALE)), 0), MAX_KEY)
+
+
+class GradeAggregates(ModelListener):
+    """Materialized grade counts, percentage bins and min/max/mean."""
+    def __init__(self, students=()):
+        self.records_reset(students)
+
+    def records_reset(self, students):
+        self.count = 0
+        self.perc_sum = 0.0
+        self.grade_counts = {}
+        self.bins = [0] * BIN_COUNT
+        # students per percentage key, so min/max survive deletes without a rescan
+        self.key_counts = [0] * (MAX_KEY + 1)
+        self.min_key = MAX_KEY + 1
+        self.max_key = -1
+        for s in students:
+            self._add(s["perc"], s["grade"])
+
+    def _add(self, perc, grade):
+        self.count += 1
+        self.perc_sum += perc
+        self.grade_counts[grade] = self.grade_counts.get(grade, 0) + 1
+        self.bins[perc_bin(perc)] += 1
+        key = perc_key(perc)
+        self.key_counts[key] += 1
+        if key < self.min_key:
+            self.min_key = key
+        if key > self.max_key:
+            self.max_key = key
+
+    def _remove(self, perc, grade):
+        self.count -= 1
+        self.perc_sum -= perc
+        left = self.grade_counts.get(grade, 0) - 1
+        if left > 0:
+            self.grade_counts[grade] = left
+        else:
+            self.grade_counts.pop(grade, None)
+        self.bins[perc_bin(perc)] -= 1
+        key = perc_key(perc)
+        self.key_counts[key] -= 1
+        if self.count == 0:
+            self.min_key, self.max_key = MAX_KEY + 1, -1
+            self.perc_sum = 0.0
+            return
+        # walk to the next occupied key (bounded by the 10001 possible keys)
+        counts = self.key_counts
+        if key == self.min_key and not counts[key]:
+            while not counts[self.min_key]:
+                self.min_key += 1
+        if key == self.max_key and not counts[key]:
+            while not counts[self.max_key]:
+                self.max_key -= 1
+
+    def record_added(self, s):
+        self._add(s["perc"], s["grade"])
+
+    def record_removed(self, s):
+        self._remove(s["perc"], s["grade"])
+
+    def record_changed(self, old, s):
+        if old["perc"] != s["perc"] or old["grade"] != s["grade"]:
+            self._remove(old["perc"], old["grade"])
+            self._add(s["perc"], s["grade"])
+
+    @property
+    def average(self):
+        return self.perc_sum / self.count if self.count else 0
+
+    @property
+    def highest(self):
+        return self.max_key / PERC_SCALE if self.count else 0
+
+    @property
+    def lowest(self):
+        return self.min_key / PERC_SCALE if self.count else 0
+
+    def grade_distribution(self, grade_order):
+        """(labels, counts) for the grades present, in grade_order."""
+        labels = [g for g in grade_order if self.grade_counts.get(g)]
+        return labels, [self.grade_counts[g] for g in labels]
+
+    def bin_edges(self):
+        return [i * BIN_WIDTH for i in range(BIN_COUNT)]
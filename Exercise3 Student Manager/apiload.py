@@ -0,0 +1,190 @@
+# apiload.py
+# Load test for studentapi.py: many concurrent keep-alive clients on one
+# asyncio loop send a mix of API requests and the latencies are summarised
+# per endpoint, e.g.
+#
+#     python apiload.py --size 100k --clients 50 --requests 200
+#     python apiload.py --connect 127.0.0.1:8765 --clients 20
+#
+# Without --connect a server is started in a separate process over a cohort
+# from gencohort.py, so clients and server do not share an interpreter.
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import gencohort
+from benchmark import summarize
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# share of requests per endpoint kind
+MIX = (
+    ("get", 40), ("page", 20), ("search", 20), ("stats", 8), ("top", 5), ("bottom", 5), ("filter", 2),
+)
+FILTERS = ("grade in (A,B) and exam < 60", "perc >= 80", 'course = "Data Science" and grade = A')
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection."""
+    def __init__(self, host=None, port=None, unix_path=None):
+        self.host, self.port, self.unix_path = host, port, unix_path
+        self.reader = self.writer = None
+
+    async def connect(self):
+        if self.unix_path:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def get(self, target):
+        self.writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        body = await self.reader.readexactly(length)
+        return status, body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+def pick_target(rng, kind, sample, total):
+    s = rng.choice(sample)
+    if kind == "get":
+        return f"/students/{s['code']}"
+    if kind == "page":
+        return f"/students?offset={rng.randrange(max(1, total))}&limit=50"
+    if kind == "search":
+        return f"/search?q={s['name'].split()[-1].replace(' ', '%20')}&limit=20"
+    if kind == "filter":
+        return "/students?limit=50&filter=" + rng.choice(FILTERS).replace(" ", "%20").replace('"', "%22")
+    if kind in ("top", "bottom"):
+        return f"/{kind}?n=10"
+    return "/stats"
+
+
+async def run_client(args, rng, sample, total, results, errors):
+    client = Client(args.host, args.port, args.unix)
+    await client.connect()
+    kinds = [k for k, _ in MIX]
+    weights = [w for _, w in MIX]
+    try:
+        for _ in range(args.requests):
+            kind = rng.choices(kinds, weights)[0]
+            target = pick_target(rng, kind, sample, total)
+            start = time.perf_counter()
+            status, _ = await client.get(target)
+            results[kind].append(time.perf_counter() - start)
+            if status != 200:
+                errors[status] += 1
+    finally:
+        await client.close()
+
+
+async def load_test(args):
+    rng = random.Random(args.seed)
+    probe = Client(args.host, args.port, args.unix)
+    await probe.connect()
+    status, body = await probe.get("/students?limit=1000")
+    await probe.close()
+    if status != 200:
+        raise SystemExit(f"Server answered {status}: {body[:200]!r}")
+    page = json.loads(body)
+    sample = page["students"]
+    if not sample:
+        raise SystemExit("The server has no students to query")
+    results = defaultdict(list)
+    errors = defaultdict(int)
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(args, random.Random(rng.random()), sample, page["total"], results, errors)
+                           for _ in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    done = sum(len(v) for v in results.values())
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "clients": args.clients,
+        "requests": done,
+        "seconds": elapsed,
+        "requests_per_s": done / elapsed if elapsed else 0.0,
+        "errors": dict(errors),
+        "all": summarize([t for v in results.values() for t in v]),
+        "endpoints": {k: summarize(v) for k, v in sorted(results.items())},
+    }
+    return report
+
+
+def start_server(args):
+    """Run studentapi.py in its own process over a generated cohort; returns (process, host, port)."""
+    cohort_dir = os.path.join(args.data, f"{args.size}-seed{args.seed}")
+    marks_path = os.path.join(cohort_dir, "studentMarks.txt")
+    if not os.path.exists(marks_path):
+        print(f"generating {args.size} students in {cohort_dir}")
+        gencohort.write_cohort(cohort_dir, gencohort.parse_size(args.size), args.seed)
+    cmd = [sys.executable, os.path.join(SCRIPT_DIR, "studentapi.py"), "--marks", marks_path]
+    cmd += ["--unix", args.unix] if args.unix else ["--port", "0"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        raise SystemExit("The API server did not start")
+    print(line.strip())
+    if args.unix:
+        return proc, None, None
+    host, port = line.rsplit("//", 1)[1].strip().rsplit(":", 1)
+    return proc, host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the student JSON API with concurrent local clients.")
+    parser.add_argument("--connect", default=None, help="host:port of a running server (default: start one)")
+    parser.add_argument("--unix", default=None, help="use this Unix socket instead of TCP")
+    parser.add_argument("--size", default="100k", help="cohort size for the server started here, e.g. 1k,100k,1M")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default=os.path.join(tempfile.gettempdir(), "studentmanager-bench"),
+                        help="where generated cohorts are kept between runs")
+    parser.add_argument("--out", default=None, help="write results to this JSON file")
+    args = parser.parse_args()
+
+    proc = None
+    if args.connect:
+        args.host, port = args.connect.rsplit(":", 1)
+        args.port = int(port)
+    elif args.unix and os.path.exists(args.unix):
+        args.host = args.port = None
+    else:
+        proc, args.host, args.port = start_server(args)
+    try:
+        report = asyncio.run(load_test(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    print(f"{report['requests']} requests from {args.clients} clients in {report['seconds']:.2f} s "
+          f"({report['requests_per_s']:.0f} req/s), errors: {report['errors'] or 'none'}")
+    for name, r in [("all", report["all"])] + list(report["endpoints"].items()):
+        print(f"  {name:<8} median {r['median_ms']:8.2f} ms   p95 {r['p95_ms']:8.2f} ms   ({r['runs']} requests)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
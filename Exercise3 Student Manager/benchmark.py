@@ -0,0 +1,367 @@
+# benchmark.py
+# Times the app's hot paths without a display, e.g.
+#
+#     python benchmark.py --sizes 1k,100k,1M --repeat 5 --out bench.json
+#
+# Cohorts come from gencohort.py (written once per size and seed into --data).
+# The table operations run the real StudentManager methods against an
+# in-memory stand-in for the Treeview, so they measure our code rather than Tk.
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import gencohort
+from aggregates import GradeAggregates
+from extraindex import ExtraIndex, course_rows
+from fuzzysearch import NameIndex
+from grading import GradingEngine, load_grading_config
+from filewatch import FileWatcher
+from rankindex import RankIndex
+from sharedmarks import MarksSync, read_version
+from snapshots import SnapshotStore, files_signature, snapshot_dir_for
+from studentmodel import StudentModel, read_marks, write_marks
+from workspace import file_signature
+from studentmanager import (
+    GRADING_FILE, REPORTLAB_AVAILABLE, SUGGESTION_LIMIT, SEARCH_LIMIT,
+    StudentManager, load_extra, save_extra, write_csv_table, write_pdf_table,
+)
+from treesync import RowChanges, TreeReconciler
+
+TABLE_COLUMNS = ("code","name","c1","c2","c3","exam","total","perc","grade","rank","percentile","cohort")
+# PDF export is slow and mostly reportlab's time; only run it on smaller cohorts
+PDF_MAX_ROWS = 100000
+
+
+class FakeTree:
+    """Just enough of ttk.Treeview for TreeReconciler and the export code."""
+    def __init__(self, columns=TABLE_COLUMNS):
+        self.children = []
+        self.values = {}
+        self.options = {"columns": columns, "displaycolumns": columns[:-1]}
+        self.calls = 0
+
+    def __getitem__(self, key):
+        return self.options[key]
+
+    def heading(self, col):
+        return {"text": col.title()}
+
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        self.calls += 1
+        if index == "end":
+            self.children.append(iid)
+        else:
+            self.children.insert(index, iid)
+        self.values[iid] = (values, tags)
+
+    def delete(self, *iids):
+        self.calls += 1
+        gone = set(iids)
+        self.children = [i for i in self.children if i not in gone]
+        for i in iids:
+            del self.values[i]
+
+    def item(self, iid, values=None, tags=None):
+        self.calls += 1
+        self.values[iid] = (values, tags)
+
+    def move(self, iid, parent, index):
+        self.calls += 1
+        self.children.remove(iid)
+        self.children.insert(index, iid)
+
+    def set_children(self, parent, *iids):
+        self.calls += 1
+        self.children = list(iids)
+
+    def get_children(self):
+        return tuple(self.children)
+
+
+class HeadlessManager(StudentManager):
+    """StudentManager with only its data-side state set up: no window, no watchers."""
+    def __init__(self, students, extra):
+        self.grader = GradingEngine(load_grading_config(GRADING_FILE))
+        self.model = StudentModel(grader=self.grader)
+        self.name_index = self.model.subscribe(NameIndex())
+        self.aggregates = self.model.subscribe(GradeAggregates())
+        self.ranks = self.model.subscribe(RankIndex())
+        self.extra_index = self.model.subscribe(ExtraIndex(self.model))
+        self.model.reset(students)
+        self.extra = extra
+        self.workspace = None
+        self.active_cohort = ""
+        self.loading = False
+        self.query = None
+        self.browse = None
+        self._view_mode = "all"
+        self._single_code = None
+        self._col_sort_reverse = {}
+        self.details_widgets = {}
+        self.tree = FakeTree()
+        self.table = TreeReconciler(self.tree)
+        self.row_changes = self.model.subscribe(RowChanges())
+        self._row_cache = {}
+        self._rank_version = None
+        self._shown = None
+
+    def stripe_later(self):
+        # no window: stripes are only painted on rows in view
+        pass
+
+    def attach_files(self, marks_path, extra_path):
+        """Save to these files the way the window does: shared-file sync and version history."""
+        write_marks(marks_path, self.students, 1)
+        save_extra(self.extra, extra_path)
+        self.marks_file = marks_path
+        self.extra_file = extra_path
+        # created but not started: save_data only tells them about its own writes
+        self.marks_watcher = FileWatcher(marks_path, read_marks)
+        self.extra_watcher = FileWatcher(extra_path, load_extra)
+        self.sync = self.model.subscribe(MarksSync(self.model))
+        self.sync.loaded(read_version(marks_path), file_signature(marks_path))
+        self.snapshots = self.model.subscribe(SnapshotStore(snapshot_dir_for(marks_path)))
+        self.snapshots.prime(self.students, files_signature(marks_path, extra_path))
+
+
+def time_op(fn, repeat, warmup, setup=None):
+    """Run fn warmup + repeat times; returns per-run seconds for the timed runs."""
+    times = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+    return times
+
+
+def summarize(times):
+    ordered = sorted(times)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))] * 1000
+    return {
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "min_ms": ordered[0] * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "runs": len(ordered),
+    }
+
+
+def search_queries(students, rng, count=20):
+    """A mix of exact codes, code prefixes, names and misspelt names."""
+    picks = [rng.choice(students) for _ in range(count)]
+    queries = []
+    for i, s in enumerate(picks):
+        kind = i % 4
+        if kind == 0:
+            queries.append(s["code"])
+        elif kind == 1:
+            queries.append(s["code"][:3])
+        elif kind == 2:
+            queries.append(s["name"].split()[-1])
+        else:
+            name = s["name"]
+            j = rng.randrange(1, len(name) - 1)
+            queries.append(name[:j] + name[j + 1:])
+    return queries
+
+
+def check_search(app, rng, count=20):
+    """Check that substring queries find what a scan finds: a piece from inside a name
+    (e.g. 'ear' for Pearson) and a piece of a code (e.g. '43' for 8439)."""
+    students = app.students
+    for i in range(count):
+        s = rng.choice(students)
+        text = s["name"].lower() if i % 2 == 0 else s["code"].lower()
+        if len(text) < 3:
+            continue
+        j = rng.randrange(1, len(text) - 1)
+        q = text[j:j + rng.randint(2, 3)].strip()
+        if not q or q in app.model.by_code:
+            # an exact code is answered with just that student
+            continue
+        hits = sum(1 for t in students if q in t["name"].lower() or q in t["code"].lower())
+        found = app.find_students(q, SEARCH_LIMIT)
+        # substring hits rank above fuzzy ones, so the first of the results must be hits
+        expected = min(hits, SEARCH_LIMIT)
+        if sum(1 for t in found[:expected] if q in t["name"].lower() or q in t["code"].lower()) != expected:
+            raise RuntimeError(f"Search for {q!r} (inside {text!r}) missed substring matches")
+
+
+def check_table(app):
+    """Check that the rows view_all left in the table are what a full rebuild gives."""
+    rank_columns = app.ranks.rank_columns()
+    students = app.visible_students()
+    top_student, low_student = app.top_low(students)
+    want = [(s["code"], app.row_values(s, rank_columns), app.row_tag(s, top_student, low_student))
+            for s in students]
+    got = [(iid,) + app.table.rows[iid] for iid in app.table.order[:len(want)]]
+    if got != want:
+        raise RuntimeError("view_all left table rows out of date")
+
+
+def check_delete(app, rng):
+    """Check that after one delete view_all only sends Tk the rows whose values changed
+    (the ranks below it shift), not a new stripe for every row below it."""
+    before = dict(app.table.rows)
+    calls = app.tree.calls
+    app.model.remove(rng.choice(app.students)["code"])
+    app.view_all()
+    changed = sum(1 for iid, row in app.table.rows.items() if iid in before and before[iid] != row)
+    # one delete call plus one item call per changed row
+    if app.tree.calls - calls != 1 + changed:
+        raise RuntimeError(f"view_all made {app.tree.calls - calls} Tk calls for one delete, "
+                           f"{changed} rows changed")
+
+
+def bench_size(label, n, data_dir, seed, repeat, warmup, log):
+    cohort_dir = os.path.join(data_dir, f"{label}-seed{seed}")
+    marks_path = os.path.join(cohort_dir, "studentMarks.txt")
+    extra_path = os.path.join(cohort_dir, "studentExtra.json")
+    if not (os.path.exists(marks_path) and os.path.exists(extra_path)):
+        log(f"  generating {n} students in {cohort_dir}")
+        gencohort.write_cohort(cohort_dir, n, seed)
+
+    results = {}
+
+    def record(name, times):
+        results[name] = summarize(times)
+        log(f"  {name:<22} median {results[name]['median_ms']:10.2f} ms   p95 {results[name]['p95_ms']:10.2f} ms")
+
+    # big cohorts are expensive per run; fewer repeats keep the suite usable
+    if n >= 1000000:
+        repeat, warmup = max(1, min(repeat, 3)), 0
+
+    grader = GradingEngine(load_grading_config(GRADING_FILE))
+
+    def load():
+        students = read_marks(marks_path)
+        StudentModel(students, grader=grader)
+        load_extra(extra_path)
+    record("load_data", time_op(load, repeat, warmup))
+
+    app = HeadlessManager(read_marks(marks_path), load_extra(extra_path))
+    out_dir = tempfile.mkdtemp(prefix="smbench-")
+    app.attach_files(os.path.join(out_dir, "studentMarks.txt"), os.path.join(out_dir, "studentExtra.json"))
+    save_rng = random.Random(seed)
+
+    def edit_and_settle():
+        # a save follows an edit; the previous save's history write is finished first
+        app.snapshots.flush()
+        s = save_rng.choice(app.students)
+        app.model.update(s["code"], {"exam": save_rng.randint(0, 100)})
+    # locked write with the version check, then recording the history version;
+    # what the window waits for (the version is compressed and written in the background)
+    record("save_data", time_op(app.save_data, repeat, warmup, setup=edit_and_settle))
+    # the same including the background write, every FULL_EVERY-th one a full snapshot
+    record("save_data + history", time_op(lambda: (app.save_data(), app.snapshots.flush()), repeat, warmup,
+                                          setup=edit_and_settle))
+
+    def fresh_table():
+        app.tree = FakeTree()
+        app.table = TreeReconciler(app.tree)
+        app._row_cache = {}
+    record("view_all (first draw)", time_op(app.view_all, repeat, warmup, setup=fresh_table))
+    record("view_all (unchanged)", time_op(app.view_all, repeat, warmup))
+
+    rng = random.Random(seed)
+
+    def edit_one():
+        s = rng.choice(app.students)
+        app.model.update(s["code"], {"exam": rng.randint(0, 100)})
+    record("view_all (one edit)", time_op(app.view_all, repeat, warmup, setup=edit_one))
+    check_table(app)
+
+    def delete_one():
+        app.model.remove(rng.choice(app.students)["code"])
+    record("view_all (one delete)", time_op(app.view_all, repeat, warmup, setup=delete_one))
+    check_table(app)
+    check_delete(app, rng)
+
+    check_search(app, rng)
+    queries = search_queries(app.students, rng)
+    suggest_times = []
+    search_times = []
+    for q in queries:
+        suggest_times += time_op(lambda: app.find_students(q, SUGGESTION_LIMIT), 1, 0)
+        search_times += time_op(lambda: app.find_students(q, SEARCH_LIMIT), 1, 0)
+    record("update_suggestions", suggest_times)
+    record("search_student", search_times)
+
+    record("sort_by_column name", time_op(lambda: app.sort_by_column("name"), repeat, warmup))
+    record("sort_by_column total", time_op(lambda: app.sort_by_column("total"), repeat, warmup))
+
+    def stats_prep():
+        agg = GradeAggregates(app.students)
+        agg.grade_distribution(app.grader.grade_order)
+    record("show_stats prep", time_op(stats_prep, repeat, warmup))
+    record("show_stats (cached)", time_op(lambda: app.aggregates.grade_distribution(app.grader.grade_order), repeat, warmup))
+
+    course = app.extra_index.keys("course")[0][0]
+    def browse_course():
+        app.browse = ("course", course)
+        app.visible_students()
+        app.browse = None
+    record("browse course", time_op(browse_course, repeat, warmup))
+    record("course stats", time_op(lambda: course_rows(app.extra_index.courses, app.grader.grade_order), repeat, warmup))
+
+    app.view_all()
+
+    def export_csv():
+        headers, rows = app.export_rows()
+        write_csv_table(os.path.join(out_dir, "export.csv"), headers, rows)
+    record("export csv", time_op(export_csv, repeat, warmup))
+    if REPORTLAB_AVAILABLE and n <= PDF_MAX_ROWS:
+        def export_pdf():
+            headers, rows = app.export_rows()
+            write_pdf_table(os.path.join(out_dir, "export.pdf"), headers, rows)
+        record("export pdf", time_op(export_pdf, max(1, repeat // 2), 0))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Student Manager hot paths headlessly.")
+    parser.add_argument("--sizes", default="1k,100k", help="comma separated sizes, e.g. 1k,100k,1M,10M")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default=os.path.join(tempfile.gettempdir(), "studentmanager-bench"),
+                        help="where generated cohorts are kept between runs")
+    parser.add_argument("--out", default=None, help="write results to this JSON file")
+    args = parser.parse_args()
+
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "sizes": {},
+    }
+    for label in args.sizes.split(","):
+        label = label.strip()
+        n = gencohort.parse_size(label)
+        print(f"{label} ({n} students)")
+        report["sizes"][label] = bench_size(label, n, args.data, args.seed, args.repeat, args.warmup, print)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# edithistory.py
+# Undo/redo for student edits as an operation log: every step stores the
+# inverse of what it did (the removed record, the fields an update replaced),
+# never a copy of the cohort, so a step costs memory for one record and undo
+# is as cheap after thousands of edits as after one. Several operations can be
+# grouped into a batch that undoes and redoes as a single step.
+from collections import deque
+from contextlib import contextmanager
+
+from studentmodel import RECORD_FIELDS, ModelListener
+
+UNDO_LIMIT = 1000
+# update() leaves the extra details alone unless given a value for them
+KEEP = object()
+
+
+class EditHistory(ModelListener):
+    """Applies add/update/remove to the model and its extras, keeping undo/redo stacks."""
+    def __init__(self, model, limit=UNDO_LIMIT):
+        self.model = model
+        self.undo_steps = deque(maxlen=limit)
+        self.redo_steps = []
+        self._batch = None
+
+    # a reload or restore replaces every record: old steps no longer apply
+    def records_reset(self, students):
+        self.clear()
+
+    def records_regraded(self, students):
+        pass
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+
+    def undo_label(self):
+        return self.undo_steps[-1][0] if self.undo_steps else None
+
+    def redo_label(self):
+        return self.redo_steps[-1][0] if self.redo_steps else None
+
+    # editing ------------------------------------------------------------
+    def add(self, s, extra=None):
+        self._do("Add " + s["code"], ("add", {k: s[k] for k in RECORD_FIELDS}, None, extra))
+
+    def update(self, code, fields, extra=KEEP):
+        self._do("Update " + code, ("update", code, fields, extra))
+
+    def remove(self, code):
+        self._do("Delete " + code, ("remove", code))
+
+    @contextmanager
+    def batch(self, label):
+        """Group the operations done inside the block into one undo step."""
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+        finally:
+            ops, self._batch = self._batch, None
+            if ops:
+                self._push(label, ops)
+
+    def _do(self, label, op):
+        inverse = self._apply(op)
+        if self._batch is not None:
+            self._batch.append(inverse)
+        else:
+            self._push(label, [inverse])
+
+    def _push(self, label, inverses):
+        self.undo_steps.append((label, inverses))
+        self.redo_steps.clear()
+
+    # undo/redo ------------------------------------------------------------
+    def undo(self):
+        """Undo the last step; returns its label (None if there was nothing to undo)."""
+        if not self.undo_steps:
+            return None
+        label, inverses = self.undo_steps[-1]
+        done = self._replay(inverses)
+        self.undo_steps.pop()
+        self.redo_steps.append((label, done))
+        return label
+
+    def redo(self):
+        if not self.redo_steps:
+            return None
+        label, inverses = self.redo_steps[-1]
+        done = self._replay(inverses)
+        self.redo_steps.pop()
+        self.undo_steps.append((label, done))
+        return label
+
+    def _replay(self, inverses):
+        # inverses are applied newest first; what they return re-does the step.
+        # A step is all or nothing: if one op fails (the record was changed
+        # elsewhere) the ones already applied are reversed before re-raising
+        done = []
+        try:
+            for op in reversed(inverses):
+                done.append(self._apply(op))
+        except Exception:
+            for op in reversed(done):
+                self._apply(op)
+            raise
+        return done
+
+    def _apply(self, op):
+        """Perform op and return the op that reverses it."""
+        kind = op[0]
+        model = self.model
+        if kind == "add":
+            _, fields, index, extra_entry = op
+            model.add(dict(fields), index)
+            if extra_entry is not None:
+                model.set_extra(fields["code"], extra_entry)
+            return ("remove", fields["code"])
+        if kind == "remove":
+            code = op[1]
+            s = model.get(code)
+            if s is None:
+                raise KeyError(f"Student {code} no longer exists")
+            fields = {k: s[k] for k in RECORD_FIELDS}
+            index = model.index_of(code)
+            model.remove(code)
+            return ("add", fields, index, model.set_extra(code, None))
+        # update
+        _, code, fields, extra_entry = op
+        s = model.get(code)
+        if s is None:
+            raise KeyError(f"Student {code} no longer exists")
+        old_fields = {k: s[k] for k in fields}
+        old_fields["code"] = code
+        new_code = fields.get("code", code)
+        old_extra = KEEP
+        if extra_entry is not KEEP or new_code != code:
+            old_extra = model.extra.get(code)
+        model.update(code, fields)
+        if old_extra is not KEEP:
+            entry = old_extra if extra_entry is KEEP else extra_entry
+            if new_code != code:
+                model.set_extra(code, None)
+            if entry is not None or new_code == code:
+                model.set_extra(new_code, entry)
+        return ("update", new_code, old_fields, old_extra)
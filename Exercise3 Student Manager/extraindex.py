@@ -0,0 +1,145 @@
+# extraindex.py
+# Secondary indexes over the extra details: course -> codes, year of birth ->
+# codes and email domain -> codes, plus running per-course grade counts and
+# percentage sums. They follow the model's record and extra events, so
+# "everyone on course X" is a dict lookup and the per-course table in the
+# stats window never rescans the cohort or the extras.
+from studentmodel import ModelListener
+
+# index name -> (label, function from an extra details entry to its key or "")
+KEYS = {
+    "course": ("Course", lambda e: e.get("course", "").strip()),
+    "year": ("DOB year", lambda e: e.get("dob", "")[:4] if e.get("dob", "")[:4].isdigit() else ""),
+    "domain": ("Email domain", lambda e: e.get("email", "").rpartition("@")[2].strip().lower() if "@" in e.get("email", "") else ""),
+}
+
+
+class CourseStats:
+    __slots__ = ("count", "perc_sum", "grade_counts")
+
+    def __init__(self):
+        self.count = 0
+        self.perc_sum = 0.0
+        self.grade_counts = {}
+
+    def add(self, s, sign):
+        self.count += sign
+        self.perc_sum += sign * s["perc"]
+        self.grade_counts[s["grade"]] = self.grade_counts.get(s["grade"], 0) + sign
+
+    @property
+    def average(self):
+        return self.perc_sum / self.count if self.count else 0.0
+
+
+def course_stats(students, extra):
+    """Per-course stats computed from scratch, for a filtered subset of students."""
+    course_of = KEYS["course"][1]
+    stats = {}
+    empty = {}
+    for s in students:
+        course = course_of(extra.get(s["code"], empty))
+        if course:
+            cs = stats.get(course)
+            if cs is None:
+                cs = stats[course] = CourseStats()
+            cs.add(s, 1)
+    return stats
+
+
+def course_rows(stats, grade_order):
+    """(course, students, average, grade counts text) rows, biggest course first."""
+    rows = []
+    for course, cs in stats.items():
+        if cs.count:
+            grades = "  ".join(f"{g}: {cs.grade_counts[g]}" for g in grade_order if cs.grade_counts.get(g))
+            rows.append((course, cs.count, f"{cs.average:.2f}", grades))
+    rows.sort(key=lambda r: (-r[1], r[0]))
+    return rows
+
+
+class ExtraIndex(ModelListener):
+    """Codes by course, DOB year and email domain, and live per-course aggregates.
+
+    Codes are indexed whether or not a student with that code is loaded (the
+    extras file may hold details for students that have gone); the course
+    aggregates only count students that exist.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.extras_reset(model.extra)
+
+    def extras_reset(self, extra):
+        self.index = {name: {} for name in KEYS}
+        for code, entry in extra.items():
+            self._index(code, entry, 1)
+        self._recount()
+
+    def records_reset(self, students):
+        self._recount()
+
+    def _recount(self):
+        self.courses = {}
+        by_code = self.model.by_code
+        course_of = KEYS["course"][1]
+        for code, entry in self.model.extra.items():
+            s = by_code.get(code)
+            if s is not None:
+                self._count(course_of(entry), s, 1)
+
+    def _index(self, code, entry, sign):
+        for name, (_, key_of) in KEYS.items():
+            key = key_of(entry)
+            if not key:
+                continue
+            codes = self.index[name].setdefault(key, set())
+            if sign > 0:
+                codes.add(code)
+            else:
+                codes.discard(code)
+                if not codes:
+                    del self.index[name][key]
+
+    def _count(self, course, s, sign):
+        if not course:
+            return
+        cs = self.courses.get(course)
+        if cs is None:
+            cs = self.courses[course] = CourseStats()
+        cs.add(s, sign)
+        if not cs.count:
+            del self.courses[course]
+
+    def _course(self, code):
+        entry = self.model.extra.get(code)
+        return KEYS["course"][1](entry) if entry else ""
+
+    # a student counts towards the course in the extras under its current code
+    def record_added(self, s):
+        self._count(self._course(s["code"]), s, 1)
+
+    def record_removed(self, s):
+        self._count(self._course(s["code"]), s, -1)
+
+    def record_changed(self, old, s):
+        self._count(self._course(old["code"]), old, -1)
+        self._count(self._course(s["code"]), s, 1)
+
+    def extra_changed(self, code, old, new):
+        if old is not None:
+            self._index(code, old, -1)
+        if new is not None:
+            self._index(code, new, 1)
+        s = self.model.by_code.get(code)
+        if s is not None:
+            course_of = KEYS["course"][1]
+            self._count(course_of(old) if old else "", s, -1)
+            self._count(course_of(new) if new else "", s, 1)
+
+    # lookups ----------------------------------------------------------------
+    def codes(self, name, key):
+        return self.index[name].get(key, set())
+
+    def keys(self, name):
+        """[(key, number of codes)] for one index, most common first."""
+        return sorted(((k, len(v)) for k, v in self.index[name].items()), key=lambda kv: (-kv[1], kv[0]))
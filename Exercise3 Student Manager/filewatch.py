@@ -0,0 +1,70 @@
+# filewatch.py
+# Polls a file on a background thread and hands freshly parsed contents to the
+# Tk thread through a queue (Tk widgets must only be touched from mainloop).
+import os
+import queue
+import threading
+import time
+
+
+class FileWatcher:
+    """Watches one file's mtime/size and re-reads it with `loader` when it changes."""
+    def __init__(self, path, loader, interval=1.0, settle=0.2):
+        self.path = path
+        self.loader = loader
+        self.interval = interval
+        self.settle = settle
+        self.results = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._sig = self._signature()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def mark_seen(self):
+        # call after writing the file ourselves so our own save is not re-read
+        with self._lock:
+            self._sig = self._signature()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            sig = self._signature()
+            with self._lock:
+                if sig is None or sig == self._sig:
+                    continue
+            # wait for the writer to finish before parsing a half-written file
+            time.sleep(self.settle)
+            if self._signature() != sig:
+                continue
+            with self._lock:
+                if sig == self._sig:
+                    continue
+                self._sig = sig
+            try:
+                self.results.put((None, self.loader(self.path)))
+            except Exception as e:
+                self.results.put((e, None))
+
+    def drain(self):
+        """Return the newest (error, data) result waiting in the queue, or None."""
+        latest = None
+        while True:
+            try:
+                latest = self.results.get_nowait()
+            except queue.Empty:
+                return latest
@@ -0,0 +1,177 @@
+# fuzzysearch.py
+# Typo-tolerant student lookup. Names are broken into character trigrams and
+# kept in an inverted index (trigram -> distinct lowercased names), so a query
+# only looks at names that share at least one trigram with it instead of
+# scanning every student. Cohorts repeat names a lot, so indexing distinct
+# names rather than students keeps the postings small. A query that appears
+# inside a name is always a match, whatever its share of trigrams; codes are
+# matched exactly, by prefix and as substrings.
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import chain
+from math import ceil
+
+from studentmodel import ModelListener
+
+# fuzzy matches must share at least this share of the query's trigrams
+MIN_COVERAGE = 0.4
+# queries shorter than this are matched as plain substrings
+MIN_NGRAM_QUERY = 3
+
+# a name substring scores SUBSTRING plus its fuzzy score (at most 1)
+EXACT_CODE, CODE_PREFIX, SUBSTRING, CODE_SUBSTRING = 4.0, 3.0, 2.0, 1.5
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i+3] for i in range(len(padded) - 2)}
+
+
+def inner_trigrams(text):
+    """The trigrams of text itself, without the padding: every name containing text has them all."""
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+
+class NameIndex(ModelListener):
+    """Trigram index over student names plus a sorted code list for prefix lookups."""
+    def __init__(self):
+        self.records_reset([])
+
+    def records_reset(self, students):
+        self.postings = {}
+        self.gram_count = {}
+        self.name_codes = {}
+        self.code_name = {}
+        self.codes = []
+        for s in students:
+            self._add_name(s["name"].lower(), s["code"])
+        self.codes = sorted(c.lower() for c in self.code_name)
+        self.code_lookup = {c.lower(): c for c in self.code_name}
+        self._code_text = None
+
+    def records_regraded(self, students):
+        pass
+
+    def _add_name(self, name, code):
+        self.code_name[code] = name
+        codes = self.name_codes.get(name)
+        if codes is None:
+            self.name_codes[name] = {code}
+            grams = trigrams(name)
+            self.gram_count[name] = len(grams)
+            for g in grams:
+                self.postings.setdefault(g, set()).add(name)
+        else:
+            codes.add(code)
+
+    def _remove_name(self, name, code):
+        self.code_name.pop(code, None)
+        codes = self.name_codes.get(name)
+        if codes is None:
+            return
+        codes.discard(code)
+        if not codes:
+            del self.name_codes[name]
+            del self.gram_count[name]
+            for g in trigrams(name):
+                post = self.postings.get(g)
+                if post is not None:
+                    post.discard(name)
+                    if not post:
+                        del self.postings[g]
+
+    def record_added(self, s):
+        self._add_name(s["name"].lower(), s["code"])
+        insort(self.codes, s["code"].lower())
+        self.code_lookup[s["code"].lower()] = s["code"]
+        self._code_text = None
+
+    def record_removed(self, s):
+        self._remove_name(s["name"].lower(), s["code"])
+        i = bisect_left(self.codes, s["code"].lower())
+        if i < len(self.codes) and self.codes[i] == s["code"].lower():
+            del self.codes[i]
+        self.code_lookup.pop(s["code"].lower(), None)
+        self._code_text = None
+
+    def record_changed(self, old, s):
+        if old["code"] != s["code"] or old["name"] != s["name"]:
+            self.record_removed(old)
+            self.record_added(s)
+
+    def code_substrings(self, q, k):
+        """Up to k codes containing q, in code order."""
+        if self._code_text is None:
+            # one string searched with str.find, rebuilt after the codes change
+            self._code_text = "\n" + "\n".join(self.codes) + "\n"
+        text = self._code_text
+        found = []
+        pos = text.find(q)
+        while pos != -1 and len(found) < k:
+            start = text.rfind("\n", 0, pos) + 1
+            end = text.find("\n", pos)
+            found.append(self.code_lookup[text[start:end]])
+            pos = text.find(q, end)
+        return found
+
+    def search(self, query, k=20):
+        """Return up to k (score, code) pairs, best first.
+
+        Exact code > code prefix > name substring > code substring > fuzzy trigram match.
+        """
+        q = query.strip().lower()
+        if not q:
+            return []
+        scores = {}
+        code = self.code_lookup.get(q)
+        if code is not None:
+            scores[code] = EXACT_CODE
+        i = bisect_left(self.codes, q)
+        while i < len(self.codes) and len(scores) < k and self.codes[i].startswith(q):
+            c = self.code_lookup[self.codes[i]]
+            scores.setdefault(c, CODE_PREFIX)
+            i += 1
+        if "\n" not in q:
+            for c in self.code_substrings(q, k):
+                scores.setdefault(c, CODE_SUBSTRING)
+
+        if len(q) < MIN_NGRAM_QUERY:
+            # too short for trigrams: substring scan over distinct names
+            named = [(SUBSTRING, name) for name in self.name_codes if q in name]
+        else:
+            # a name sharing `need` of the nq query trigrams must contain one
+            # of the nq - need + 1 rarest, so only those postings are scanned;
+            # the commoner trigrams are then checked by set membership
+            qgrams = sorted(trigrams(q), key=lambda g: len(self.postings.get(g, ())))
+            nq = len(qgrams)
+            need = max(1, ceil(MIN_COVERAGE * nq))
+            probe = nq - need + 1
+            counts = Counter(chain.from_iterable(self.postings.get(g, ()) for g in qgrams[:probe]))
+            rest = [self.postings[g] for g in qgrams[probe:] if g in self.postings]
+            # names with q inside them: the padded trigrams of q ("  he", "ar ") need
+            # not be in them, so they are found through q's rarest inner trigram
+            inner = min((self.postings.get(g, ()) for g in inner_trigrams(q)), key=len)
+            candidates = set(counts)
+            candidates.update(name for name in inner if q in name)
+            named = []
+            for name in candidates:
+                shared = counts.get(name, 0)
+                for post in rest:
+                    if name in post:
+                        shared += 1
+                coverage = shared / nq
+                if coverage < MIN_COVERAGE and q not in name:
+                    continue
+                jaccard = shared / (nq + self.gram_count[name] - shared)
+                score = 0.7 * coverage + 0.3 * jaccard
+                if q in name:
+                    score += SUBSTRING
+                named.append((score, name))
+
+        for score, name in heapq.nlargest(k, named):
+            for c in sorted(self.name_codes[name]):
+                if c not in scores:
+                    scores[c] = score
+        best = heapq.nsmallest(k, scores.items(), key=lambda cs: (-cs[1], cs[0]))
+        return [(sc, c) for c, sc in best]
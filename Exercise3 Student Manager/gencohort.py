@@ -0,0 +1,102 @@
+# gencohort.py
+# Writes a synthetic cohort in the app's file formats (studentMarks.txt and
+# studentExtra.json) for benchmarking, e.g.
+#
+#     python gencohort.py 1M --out bench_data --seed 1
+#
+# The same size and seed always give the same files. Records are streamed to
+# disk, so even 10M rows never sit in memory at once.
+import argparse
+import json
+import os
+import random
+from math import gcd
+
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000, "1M": 1000000, "10M": 10000000}
+
+FIRST_NAMES = [
+    "Alan", "Ada", "Grace", "Linus", "Margaret", "Tim", "Barbara", "Dennis", "Radia", "Ken",
+    "Frances", "John", "Katherine", "Guido", "Hedy", "Edsger", "Sophie", "Donald", "Jean", "Niklaus",
+    "Anita", "Bjarne", "Karen", "James", "Mary", "Vint", "Shafi", "Gareth", "Jake", "Jo",
+]
+LAST_NAMES = [
+    "Turing", "Lovelace", "Hopper", "Torvalds", "Hamilton", "Berners-Lee", "Liskov", "Ritchie",
+    "Perlman", "Thompson", "Allen", "McCarthy", "Johnson", "van Rossum", "Lamarr", "Dijkstra",
+    "Wilson", "Knuth", "Sammet", "Wirth", "Borg", "Stroustrup", "Sparck Jones", "Gosling",
+    "Keller", "Cerf", "Goldwasser", "Southgate", "Hobbs", "Hyde",
+]
+COURSES = [
+    "Creative Computing", "Computer Science", "Software Engineering", "Data Science",
+    "Cyber Security", "Games Development", "Artificial Intelligence", "Mathematics",
+]
+
+
+def parse_size(text):
+    if text in SIZES:
+        return SIZES[text]
+    return int(text.replace("_", ""))
+
+
+def code_width(n):
+    # the sample data uses 4 digit codes; bigger cohorts need more digits
+    return max(4, len(str(n - 1)))
+
+
+def generate_records(n, seed=0):
+    """Yield (student, extra) pairs; codes are unique and in random order."""
+    rng = random.Random(seed)
+    width = code_width(n)
+    # a random permutation of the codes without building a list of n codes:
+    # step through 0..n-1 with a stride coprime to n
+    stride = rng.randrange(1, n) if n > 1 else 1
+    while gcd(stride, n) != 1:
+        stride += 1
+    offset = rng.randrange(n) if n else 0
+    for i in range(n):
+        code = str((offset + i * stride) % n).zfill(width)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        s = {
+            "code": code,
+            "name": f"{first} {last}",
+            "c1": rng.randint(0, 20),
+            "c2": rng.randint(0, 20),
+            "c3": rng.randint(0, 20),
+            "exam": rng.randint(0, 100),
+        }
+        extra = {
+            "email": f"{first}.{last}{code}@example.ac.uk".lower().replace(" ", ""),
+            "dob": f"{rng.randint(1995, 2007)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "course": rng.choice(COURSES),
+        }
+        yield s, extra
+
+
+def write_cohort(directory, n, seed=0):
+    """Write studentMarks.txt and studentExtra.json for n students into directory."""
+    os.makedirs(directory, exist_ok=True)
+    marks_path = os.path.join(directory, "studentMarks.txt")
+    extra_path = os.path.join(directory, "studentExtra.json")
+    with open(marks_path, "w") as mf, open(extra_path, "w") as ef:
+        mf.write(f"{n}\n")
+        ef.write("{\n")
+        for i, (s, extra) in enumerate(generate_records(n, seed)):
+            mf.write(f"{s['code']},{s['name']},{s['c1']},{s['c2']},{s['c3']},{s['exam']}\n")
+            sep = ",\n" if i else ""
+            ef.write(f"{sep}  {json.dumps(s['code'])}: {json.dumps(extra)}")
+        ef.write("\n}\n")
+    return marks_path, extra_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic student cohort.")
+    parser.add_argument("size", help="number of students or one of " + ", ".join(SIZES))
+    parser.add_argument("--out", default="bench_data", help="output directory")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    n = parse_size(args.size)
+    marks_path, extra_path = write_cohort(args.out, n, args.seed)
+    print(f"Wrote {n} students to {marks_path} and {extra_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# jobs.py
+# Background jobs for slow work started from the UI (exports, reports): the
+# work runs on a worker thread, reports its progress and checks for
+# cancellation through the Job it is handed, and every state change reaches
+# the Tk thread through a queue that the window drains on a timer (Tk widgets
+# must only be touched from mainloop). Results and errors are handed to the
+# job's callbacks on the Tk thread as well.
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# progress events closer together than this are dropped (the last one is always sent)
+PROGRESS_INTERVAL_S = 0.1
+
+
+class Cancelled(Exception):
+    """Raised by Job.check() inside a job that was asked to stop."""
+
+
+class Job:
+    """One piece of background work and what the UI shows for it."""
+    def __init__(self, runner, job_id, title, fn, on_done=None, on_error=None):
+        self.runner = runner
+        self.id = job_id
+        self.title = title
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.state = QUEUED
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._last_post = 0.0
+
+    @property
+    def percent(self):
+        return 100.0 * self.done / self.total if self.total else 0.0
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    # called from the job's own thread --------------------------------------
+    def progress(self, done, total=None, message=None):
+        """Record how far the job has got, and stop it if it was cancelled."""
+        self.check()
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        now = time.perf_counter()
+        if now - self._last_post >= PROGRESS_INTERVAL_S or done == self.total:
+            self._last_post = now
+            self.runner.events.put(self)
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    # called from the Tk thread ---------------------------------------------
+    def cancel(self):
+        """Ask the job to stop; a queued job never starts, a running one stops at its next check."""
+        with self.runner._lock:
+            self._cancel.set()
+            if self.state == QUEUED:
+                self.state = CANCELLED
+        self.runner.events.put(self)
+
+
+class JobRunner:
+    """A small pool of worker threads running Jobs in the order they were submitted."""
+    def __init__(self, workers=1):
+        self.workers = workers
+        # jobs not yet reported finished to the Tk thread, oldest first
+        self.jobs = []
+        # Jobs whose state changed, for poll() on the Tk thread
+        self.events = queue.Queue()
+        self._pending = queue.Queue()
+        # guards the queued -> running/cancelled step against a cancel from the Tk thread
+        self._lock = threading.Lock()
+        self._threads = []
+        self._next_id = 1
+
+    def submit(self, title, fn, on_done=None, on_error=None):
+        """Queue fn(job) to run in the background.
+
+        on_done(result) or on_error(exception) is called from poll() once it
+        finishes; a cancelled job calls neither.
+        """
+        job = Job(self, self._next_id, title, fn, on_done, on_error)
+        self._next_id += 1
+        self.jobs.append(job)
+        self._pending.put(job)
+        if len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, daemon=True)
+            t.start()
+            self._threads.append(t)
+        self.events.put(job)
+        return job
+
+    def _work(self):
+        while True:
+            job = self._pending.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.cancelled:
+                    continue
+                job.state = RUNNING
+            self.events.put(job)
+            try:
+                job.result = job.fn(job)
+                job.done = job.total
+                job.state = DONE
+            except Cancelled:
+                job.state = CANCELLED
+            except Exception as e:
+                job.error = e
+                job.state = FAILED
+            self.events.put(job)
+
+    def poll(self):
+        """Drain state changes on the Tk thread; returns the jobs that changed.
+
+        Finished jobs leave self.jobs here and their callbacks run.
+        """
+        changed = {}
+        while True:
+            try:
+                job = self.events.get_nowait()
+            except queue.Empty:
+                break
+            changed[job.id] = job
+        for job in changed.values():
+            if not job.finished or job not in self.jobs:
+                continue
+            self.jobs.remove(job)
+            if job.state == DONE and job.on_done is not None:
+                job.on_done(job.result)
+            elif job.state == FAILED and job.on_error is not None:
+                job.on_error(job.error)
+        return list(changed.values())
+
+    @property
+    def busy(self):
+        return bool(self.jobs)
+
+    def shutdown(self):
+        """Cancel everything and let the worker threads exit."""
+        for job in self.jobs:
+            job.cancel()
+        for _ in self._threads:
+            self._pending.put(None)
+        self._threads = []
+
+
+@contextmanager
+def output_path(path):
+    """Yield a temporary path next to path that replaces it only if the block succeeds.
+
+    A cancelled or failed export then leaves neither a half-written file nor
+    a stray temporary one behind.
+    """
+    tmp = path + ".tmp"
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
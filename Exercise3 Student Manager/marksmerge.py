@@ -0,0 +1,172 @@
+# marksmerge.py
+# Merging a marks file sent by an exam board into the loaded cohort. The file
+# is streamed line by line and each row is joined to the current records
+# through the model's code -> record dict, so nothing but the planned changes
+# is kept in memory. A merge is planned first (nothing changes) so the diff
+# can be shown before it is applied.
+#
+# The incoming file is either in the app's own format (count line, then
+# code,name,c1,c2,c3,exam) or has a header naming its columns, e.g.
+#
+#     code,exam
+#     8439,61
+#
+# so a board can send just the component it marked. Empty cells are ignored.
+import csv
+from collections import namedtuple
+
+from grading import MARK_FIELDS
+from studentmodel import RECORD_FIELDS
+
+POLICIES = {
+    "overwrite": "Incoming marks replace current ones",
+    "keep-max": "Keep the higher of the current and incoming mark",
+    "fill-missing": "Only fill marks that are not entered yet (0) and blank names",
+}
+
+Change = namedtuple("Change", "code field old new")
+
+
+class MergePlan:
+    """What merging an incoming file would do: updates, new students and rejected rows."""
+    def __init__(self, path, policy):
+        self.path = path
+        self.policy = policy
+        # code -> {field: new value} for existing students
+        self.updates = {}
+        self.added = []
+        self.changes = []
+        self.unmatched = []
+        # (line number, reason)
+        self.rejected = []
+        self.rows = 0
+        self.matched = 0
+
+    @property
+    def unchanged(self):
+        return self.matched - len(self.updates)
+
+    def summary(self):
+        return (f"{self.rows} rows read: {self.matched} matched ({len(self.updates)} changed, {self.unchanged} unchanged), "
+                f"{len(self.added)} new, {len(self.unmatched)} unmatched, {len(self.rejected)} rejected")
+
+
+def _columns(first):
+    """Column names from a header row, or None if the row is not a header."""
+    names = [c.strip().lower() for c in first]
+    if "code" not in names:
+        return None
+    unknown = [n for n in names if n and n not in RECORD_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown column(s) {', '.join(unknown)}; expected some of {', '.join(RECORD_FIELDS)}")
+    return names
+
+
+def _merged_value(policy, field, old, new):
+    if policy == "overwrite":
+        return new
+    if field == "name":
+        # names are not marks: only a blank one is ever filled in
+        return new if not old else old
+    if policy == "keep-max":
+        return max(old, new)
+    return new if old == 0 else old
+
+
+def plan_merge(path, by_code, policy, max_marks, add_new=True):
+    """Stream the file at path and join it to by_code (code -> current record).
+
+    max_marks is the grading engine's per component maximum. New codes are
+    planned as new students when add_new is set and the row has every field.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown merge policy {policy!r}")
+    plan = MergePlan(path, policy)
+    new_rows = {}
+    unmatched = {}
+    matched = set()
+    with open(path, "r", newline="") as f:
+        columns = RECORD_FIELDS
+        first = True
+        for line_no, row in enumerate(csv.reader(f), 1):
+            if not any(c.strip() for c in row):
+                continue
+            if first:
+                first = False
+                header = _columns(row)
+                if header is not None:
+                    columns = header
+                    continue
+                if len(row) <= 2 and row[0].strip().isdigit():
+                    # count (and version) line of the app's own format
+                    continue
+            plan.rows += 1
+            try:
+                values = _parse_row(columns, row, max_marks)
+            except ValueError as e:
+                plan.rejected.append((line_no, str(e)))
+                continue
+            code = values.pop("code")
+            current = by_code.get(code)
+            if current is None:
+                if add_new and all(f in values for f in RECORD_FIELDS[1:]):
+                    # a later row for the same new code replaces the earlier one
+                    new_rows[code] = dict(values, code=code)
+                    unmatched.pop(code, None)
+                elif code not in new_rows:
+                    unmatched[code] = None
+                continue
+            matched.add(code)
+            # a code listed twice is merged against what its earlier row planned
+            planned = plan.updates.get(code, {})
+            for field, new in values.items():
+                old = planned.get(field, current[field])
+                planned[field] = _merged_value(policy, field, old, new)
+            planned = {k: v for k, v in planned.items() if v != current[k]}
+            if planned:
+                plan.updates[code] = planned
+            else:
+                plan.updates.pop(code, None)
+    plan.matched = len(matched)
+    for code, fields in plan.updates.items():
+        current = by_code[code]
+        plan.changes.extend(Change(code, k, current[k], v) for k, v in fields.items())
+    plan.added = list(new_rows.values())
+    plan.unmatched = list(unmatched)
+    return plan
+
+
+def _parse_row(columns, row, max_marks):
+    values = {}
+    for field, cell in zip(columns, row):
+        cell = cell.strip()
+        if not field or not cell:
+            continue
+        if field in MARK_FIELDS:
+            try:
+                mark = int(cell)
+            except ValueError:
+                raise ValueError(f"{field} {cell!r} is not a whole number")
+            if not 0 <= mark <= max_marks[field]:
+                raise ValueError(f"{field} {mark} is outside 0-{max_marks[field]}")
+            values[field] = mark
+        else:
+            values[field] = cell
+    if not values.get("code"):
+        raise ValueError("no student code")
+    return values
+
+
+def write_report(path, plan):
+    """CSV diff report: one line per changed field, new student, unmatched code and rejected row."""
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["status", "code", "field", "old", "new"])
+        for c in plan.changes:
+            w.writerow(["changed", c.code, c.field, c.old, c.new])
+        for s in plan.added:
+            w.writerow(["added", s["code"], "", "", ",".join(str(s[k]) for k in RECORD_FIELDS[1:])])
+        for code in plan.unmatched:
+            w.writerow(["unmatched", code, "", "", ""])
+        for line_no, reason in plan.rejected:
+            w.writerow(["rejected", "", f"line {line_no}", "", reason])
@@ -0,0 +1,302 @@
+# memprofile.py
+# Memory diagnostics with tracemalloc. While tracing is on, checkpoints at key
+# points (after a load, after view_all, after opening a dialog) snapshot the
+# Python heap and charge every allocation to a subsystem of the app: student
+# records, extra details, indexes, table rows, charts, images... A summary
+# keeps the totals per subsystem and per allocation site, so two checkpoints
+# can be compared and memory that grows every time a dialog is opened shows
+# up as a delta.
+#
+# Tracing can be switched on from the Memory window, or from the start with
+# Python's own switch so the first load is seen too:
+#
+#     PYTHONTRACEMALLOC=25 python studentmanager.py
+#
+# Only memory allocated by Python is traced: Tk keeps Treeview items and
+# image data in Tcl's memory, so those are counted as gauges instead.
+import dis
+import gc
+import inspect
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_right
+from collections import deque
+
+import studentmodel
+
+# frames kept per allocation: enough to get from json/csv/tkinter back to our code
+TRACE_FRAMES = 25
+MAX_SNAPSHOTS = 30
+# a checkpoint with the same label as one taken less than this ago is skipped
+CHECKPOINT_MIN_INTERVAL_S = 30.0
+TOP_SITES = 30
+# tracebacks classified between progress reports
+SUMMARY_CHUNK = 10000
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# subsystem of allocations made in each of our modules (see also MemoryProfiler.assign)
+MODULES = {
+    "studentmodel.py": "student records",
+    "grading.py": "student records",
+    "sharedmarks.py": "student records",
+    "marksmerge.py": "student records",
+    "fuzzysearch.py": "indexes",
+    "aggregates.py": "indexes",
+    "rankindex.py": "indexes",
+    "extraindex.py": "indexes",
+    "studentquery.py": "indexes",
+    "treesync.py": "table rows",
+    "edithistory.py": "history",
+    "snapshots.py": "history",
+    "workspace.py": "workspace",
+    "filewatch.py": "file watching",
+    "studentapi.py": "API",
+    "jobs.py": "jobs",
+    "memprofile.py": "profiler",
+}
+# libraries whose allocations belong to them whoever called them
+LIBRARIES = (
+    (os.sep + "matplotlib" + os.sep, "charts"),
+    (os.sep + "PIL" + os.sep, "images"),
+    (os.sep + "reportlab" + os.sep, "exports"),
+)
+OTHER = "other"
+
+
+def _line_range(fn):
+    code = inspect.unwrap(fn).__code__
+    lines = [line for _, line in dis.findlinestarts(code) if line is not None]
+    return code.co_filename, code.co_firstlineno, max(lines, default=code.co_firstlineno)
+
+
+class MemSnapshot:
+    """Heap usage at one checkpoint, grouped by subsystem and allocation site."""
+    def __init__(self, label, taken, traced, peak):
+        self.label = label
+        self.taken = taken
+        self.traced = traced
+        self.peak = peak
+        # subsystem -> [bytes, blocks]
+        self.subsystems = {}
+        # (subsystem, "file:line") -> [bytes, blocks]
+        self.sites = {}
+        # name -> number (students, Treeview items, live Figure objects, ...)
+        self.gauges = {}
+
+    def add(self, subsystem, site, size, count):
+        for table, key in ((self.subsystems, subsystem), (self.sites, (subsystem, site))):
+            entry = table.get(key)
+            if entry is None:
+                table[key] = [size, count]
+            else:
+                entry[0] += size
+                entry[1] += count
+
+    def subsystem_rows(self, base=None):
+        """[(subsystem, bytes, delta bytes, blocks)], biggest first; the delta is against base."""
+        return _rows(self.subsystems, base.subsystems if base is not None else None, by_delta=False)
+
+    def site_rows(self, base=None, limit=TOP_SITES):
+        """[((subsystem, site), bytes, delta bytes, blocks)]: the biggest sites, or the fastest
+        growing ones when compared with base."""
+        return _rows(self.sites, base.sites if base is not None else None, by_delta=base is not None)[:limit]
+
+    def gauge_rows(self, base=None):
+        rows = []
+        for name, value in self.gauges.items():
+            old = base.gauges.get(name) if base is not None else None
+            rows.append((name, value, value - old if old is not None else None))
+        return rows
+
+
+def _rows(table, base, by_delta):
+    rows = []
+    for key, (size, count) in table.items():
+        delta = size - base.get(key, (0, 0))[0] if base is not None else None
+        rows.append((key, size, delta, count))
+    if base is not None:
+        # what has gone since base is worth seeing too
+        rows += [(key, 0, -size, 0) for key, (size, _) in base.items() if key not in table]
+    rows.sort(key=(lambda r: -r[2]) if by_delta else (lambda r: -r[1]))
+    return rows
+
+
+class MemoryProfiler:
+    def __init__(self):
+        self.snapshots = deque(maxlen=MAX_SNAPSHOTS)
+        self.lock = threading.Lock()
+        # filename -> sorted [(first line, last line, subsystem)] of assigned functions
+        self._ranges = {}
+        # type name -> class whose live instances are counted at each checkpoint
+        self.watched = {}
+        self._last_taken = {}
+        # filename -> (library subsystem or None, whether it is one of our modules)
+        self._files = {}
+        self.assign("extra details", studentmodel.load_extra, studentmodel.read_extra_file,
+                    studentmodel.StudentModel.reset_extra, studentmodel.StudentModel.set_extra)
+
+    # tracing ----------------------------------------------------------------
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+    def stop(self):
+        tracemalloc.stop()
+
+    # configuration ----------------------------------------------------------
+    def assign(self, subsystem, *objects):
+        """Charge allocations made in these functions (or all methods of these classes) to subsystem.
+
+        Takes precedence over MODULES, so one module can be split between subsystems.
+        """
+        for obj in objects:
+            fns = [v for v in vars(obj).values() if inspect.isfunction(v)] if inspect.isclass(obj) else [obj]
+            for fn in fns:
+                filename, first, last = _line_range(fn)
+                ranges = self._ranges.setdefault(filename, [])
+                ranges.append((first, last, subsystem))
+                ranges.sort()
+
+    def watch(self, name, cls):
+        """Count the live instances of cls at every checkpoint (e.g. Figure, PhotoImage)."""
+        self.watched[name] = cls
+
+    def classify(self, frames):
+        """(subsystem, site) of an allocation from its (filename, lineno) frames, most recent first.
+
+        The site is the innermost line of our own code; the subsystem is that
+        of the library the allocation happened in (matplotlib, PIL, reportlab)
+        or else of that line.
+        """
+        owner = None
+        files = self._files
+        for filename, lineno in frames:
+            kind = files.get(filename)
+            if kind is None:
+                library = next((subsystem for marker, subsystem in LIBRARIES if marker in filename), None)
+                kind = files[filename] = (library, os.path.dirname(filename) == APP_DIR)
+            if owner is None:
+                owner = kind[0]
+            if kind[1]:
+                return owner or self._subsystem_at(filename, lineno), f"{os.path.basename(filename)}:{lineno}"
+        if frames:
+            return owner or OTHER, f"{_short(frames[0][0])}:{frames[0][1]}"
+        return OTHER, "?"
+
+    def _subsystem_at(self, filename, lineno):
+        ranges = self._ranges.get(filename)
+        if ranges:
+            # the latest starting range that holds the line: nested functions sit inside their parent's
+            i = bisect_right(ranges, (lineno, float("inf"), "")) - 1
+            while i >= 0:
+                if lineno <= ranges[i][1]:
+                    return ranges[i][2]
+                i -= 1
+        return MODULES.get(os.path.basename(filename), "window")
+
+    # checkpoints ------------------------------------------------------------
+    def take(self, label, force=False):
+        """Snapshot the heap now; returns the raw snapshot for summarize(), or None.
+
+        None when not tracing, or when the same checkpoint was taken moments
+        ago (view_all runs after every edit) unless force is set.
+        """
+        if not tracemalloc.is_tracing():
+            return None
+        now = time.monotonic()
+        if not force and now - self._last_taken.get(label, -CHECKPOINT_MIN_INTERVAL_S) < CHECKPOINT_MIN_INTERVAL_S:
+            return None
+        self._last_taken[label] = now
+        # only what is still reachable: a closed window's cycles would otherwise look like a leak
+        gc.collect()
+        traced, peak = tracemalloc.get_traced_memory()
+        return (label, time.time(), traced, peak, tracemalloc.take_snapshot())
+
+    def summarize(self, taken, gauges=None, job=None):
+        """Group a snapshot from take() and add it to self.snapshots.
+
+        Slow for big heaps (every distinct traceback is classified), so the app
+        runs it as a background job; gauges are values read on the Tk thread.
+        """
+        label, when, traced, peak, raw = taken
+        snap = MemSnapshot(label, when, traced, peak)
+        # Snapshot.statistics() groups the blocks by traceback in one pass; it is
+        # the slow part and cannot report progress, so progress covers classifying
+        stats = raw.statistics("traceback")
+        for i, stat in enumerate(stats):
+            if job is not None and i % SUMMARY_CHUNK == 0:
+                job.progress(i, len(stats))
+            # frames most recent first, as classify() reads them
+            subsystem, site = self.classify(tuple((f.filename, f.lineno) for f in reversed(stat.traceback)))
+            snap.add(subsystem, site, stat.size, stat.count)
+        snap.gauges.update(gauges or {})
+        if self.watched:
+            counts = dict.fromkeys(self.watched, 0)
+            classes = tuple(self.watched.items())
+            for obj in gc.get_objects():
+                for name, cls in classes:
+                    if isinstance(obj, cls):
+                        counts[name] += 1
+            snap.gauges.update((f"live {name}", n) for name, n in counts.items())
+        with self.lock:
+            self.snapshots.append(snap)
+        return snap
+
+    def baseline(self, snap, mode):
+        """The snapshot to compare snap with: "previous", "same label" (the previous one
+        with snap's label, for dialogs opened again and again) or "first"."""
+        with self.lock:
+            snaps = list(self.snapshots)
+        if snap not in snaps:
+            return None
+        before = snaps[:snaps.index(snap)]
+        if mode == "first":
+            return before[0] if before else None
+        if mode == "same label":
+            before = [s for s in before if s.label == snap.label]
+        return before[-1] if before else None
+
+    def clear(self):
+        with self.lock:
+            self.snapshots.clear()
+        self._last_taken.clear()
+
+
+def _short(filename):
+    # "matplotlib/figure.py" rather than the whole site-packages path
+    parts = filename.replace("\\", "/").split("/")
+    return "/".join(parts[-2:])
+
+
+def mb(size):
+    return f"{size / 2**20:.1f} MB" if size is not None else ""
+
+
+def mb_delta(size):
+    return f"{size / 2**20:+.1f} MB" if size is not None else ""
+
+
+def format_report(snap, base=None):
+    """Plain text report of one snapshot, with deltas when base is given."""
+    against = f" (compared with {base.label} at {time.strftime('%H:%M:%S', time.localtime(base.taken))})" if base else ""
+    lines = [f"{snap.label} at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snap.taken))}{against}",
+             f"traced {mb(snap.traced)}, peak {mb(snap.peak)}", "", "By subsystem:"]
+    for name, size, delta, count in snap.subsystem_rows(base):
+        lines.append(f"  {name:<18} {mb(size):>12} {mb_delta(delta):>12} {count:>10} blocks")
+    lines += ["", "Top allocation sites:"]
+    for (subsystem, site), size, delta, count in snap.site_rows(base):
+        lines.append(f"  {site:<40} {subsystem:<18} {mb(size):>12} {mb_delta(delta):>12} {count:>10} blocks")
+    if snap.gauges:
+        lines += ["", "Counts:"]
+        for name, value, delta in snap.gauge_rows(base):
+            lines.append(f"  {name:<24} {value:>10}" + (f" ({delta:+})" if delta is not None else ""))
+    return "\n".join(lines) + "\n"
+
+
+MEM = MemoryProfiler()
@@ -0,0 +1,139 @@
+# perfstats.py
+# Lightweight timing for user actions. Methods decorated with @timed("name")
+# (or blocks wrapped in PERF.measure("name")) record a call count, a latency
+# histogram and recent samples per operation into the shared PERF recorder.
+# cProfile can be switched on at runtime to see *why* an operation is slow;
+# the captured profile is dumped to a .prof file for pstats/snakeviz.
+import cProfile
+import functools
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# upper bounds (ms) of the histogram buckets; the last bucket is open ended
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+RECENT_SAMPLES = 1000
+
+
+class OpStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.last_ms = ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.recent.append(ms)
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """p-th percentile (0-100) of the recent samples."""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    def histogram(self):
+        """[(label, count)] for the non-empty buckets."""
+        out = []
+        lower = 0
+        for bound, n in zip(BUCKET_BOUNDS_MS + (None,), self.buckets):
+            label = f"{lower}-{bound} ms" if bound is not None else f">{lower} ms"
+            if n:
+                out.append((label, n))
+            lower = bound
+        return out
+
+
+class PerfRecorder:
+    def __init__(self):
+        self.ops = {}
+        self.lock = threading.Lock()
+        self.profiler = None
+        self.last_profile = None
+
+    def record(self, name, ms):
+        with self.lock:
+            stats = self.ops.get(name)
+            if stats is None:
+                stats = self.ops[name] = OpStats()
+            stats.add(ms)
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self):
+        """Copy of (name, OpStats) pairs, slowest mean first."""
+        with self.lock:
+            items = list(self.ops.items())
+        return sorted(items, key=lambda kv: -kv[1].mean_ms)
+
+    def reset(self):
+        with self.lock:
+            self.ops.clear()
+
+    # cProfile capture (profiles the thread that starts it, i.e. the Tk thread)
+    @property
+    def profiling(self):
+        return self.profiler is not None
+
+    def start_profile(self):
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self):
+        """Stop capturing; returns the profiler so it can still be dumped."""
+        prof = self.profiler
+        if prof is not None:
+            prof.disable()
+            self.profiler = None
+            self.last_profile = prof
+        return prof
+
+    def dump_profile(self, path):
+        prof = self.profiler or self.last_profile
+        if prof is None:
+            raise ValueError("No profile has been captured yet")
+        if prof is self.profiler:
+            # dump what has been captured so far and keep going
+            prof.disable()
+            prof.dump_stats(path)
+            prof.enable()
+        else:
+            prof.dump_stats(path)
+
+
+PERF = PerfRecorder()
+
+
+def timed(name):
+    """Decorator recording every call of the function under `name` in PERF."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                PERF.record(name, (time.perf_counter() - start) * 1000)
+        return inner
+    return wrap
@@ -0,0 +1,132 @@
+# rankindex.py
+# Class rank and percentile without re-sorting the cohort. Percentages are
+# bucketed to 2 decimal places (keys 0..10000, see aggregates.perc_key) and a
+# Fenwick tree over the keys answers "how many students are at or below this
+# percentage" in O(log K), with O(log K) updates as marks are edited. For
+# drawing the whole table at once the plain counts are kept too, and their
+# prefix sums are rebuilt in O(K) the first time they are needed after a change.
+from itertools import accumulate
+from math import ceil
+
+from aggregates import MAX_KEY, perc_key
+from studentmodel import ModelListener
+
+SIZE = MAX_KEY + 1
+
+
+class RankIndex(ModelListener):
+    """Order statistics over student percentages: rank, percentile and k-th student."""
+    def __init__(self):
+        # bumped on every change, so callers can tell that ranks may have moved
+        self.version = 0
+        self.records_reset([])
+
+    def records_reset(self, students):
+        counts = [0] * SIZE
+        self.key_codes = {}
+        for s in students:
+            key = perc_key(s["perc"])
+            counts[key] += 1
+            self.key_codes.setdefault(key, set()).add(s["code"])
+        self.count = len(students)
+        self.counts = counts
+        # build the Fenwick tree in O(K) from the plain counts
+        tree = [0] + counts
+        for i in range(1, SIZE + 1):
+            j = i + (i & -i)
+            if j <= SIZE:
+                tree[j] += tree[i]
+        self.tree = tree
+        self._prefix = None
+        self.version += 1
+
+    def _bump(self, perc, code, delta):
+        key = perc_key(perc)
+        i = key + 1
+        tree = self.tree
+        while i <= SIZE:
+            tree[i] += delta
+            i += i & -i
+        self.count += delta
+        self.counts[key] += delta
+        codes = self.key_codes.setdefault(key, set())
+        if delta > 0:
+            codes.add(code)
+        else:
+            codes.discard(code)
+            if not codes:
+                del self.key_codes[key]
+        self._prefix = None
+        self.version += 1
+
+    def record_added(self, s):
+        self._bump(s["perc"], s["code"], 1)
+
+    def record_removed(self, s):
+        self._bump(s["perc"], s["code"], -1)
+
+    def record_changed(self, old, s):
+        if old["perc"] != s["perc"] or old["code"] != s["code"]:
+            self._bump(old["perc"], old["code"], -1)
+            self._bump(s["perc"], s["code"], 1)
+
+    def at_or_below(self, key):
+        """Number of students whose key is <= key, O(log K)."""
+        i = key + 1
+        total = 0
+        tree = self.tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def rank(self, perc):
+        """1 for the best percentage; equal percentages share a rank."""
+        return self.count - self.at_or_below(perc_key(perc)) + 1
+
+    def percentile(self, perc):
+        """Share of the class (0-100) at or below this percentage."""
+        if not self.count:
+            return 0.0
+        return 100.0 * self.at_or_below(perc_key(perc)) / self.count
+
+    def kth_key(self, k):
+        """Key of the k-th lowest student (1-based), by descending the tree in O(log K)."""
+        pos = 0
+        step = 1 << SIZE.bit_length()
+        tree = self.tree
+        while step:
+            nxt = pos + step
+            if nxt <= SIZE and tree[nxt] < k:
+                pos = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return pos  # tree index pos + 1 holds key pos
+
+    def code_at_percentile(self, p):
+        """Code of a student at the p-th percentile (0-100), None for an empty class."""
+        if not self.count:
+            return None
+        k = min(self.count, max(1, ceil(p / 100 * self.count)))
+        return min(self.key_codes[self.kth_key(k)])
+
+    def ranked_codes(self, n, best=True):
+        """Codes of the n best (or worst) students, ties in code order; O(K + n)."""
+        counts, key_codes = self.counts, self.key_codes
+        out = []
+        for key in (range(MAX_KEY, -1, -1) if best else range(SIZE)):
+            if counts[key]:
+                out.extend(sorted(key_codes[key]))
+                if len(out) >= n:
+                    break
+        return out[:n]
+
+    def rank_columns(self):
+        """Function s -> (rank, percentile) for drawing many rows; O(1) per row."""
+        if self._prefix is None:
+            self._prefix = list(accumulate(self.counts))
+        prefix, n = self._prefix, self.count
+        def columns(s):
+            below = prefix[perc_key(s["perc"])]
+            return n - below + 1, 100.0 * below / n if n else 0.0
+        return columns
@@ -0,0 +1,215 @@
+# sharedmarks.py
+# Several app instances can work on one shared marks file. Writes happen under
+# an advisory lock (fcntl, where the platform has it) on a ".lock" file next
+# to it, and the file's header line carries a version as well as the count:
+#
+#     1000,42
+#
+# Each instance remembers the version it last read or wrote. If the file has
+# moved on by the time it saves, the other instance's changes are merged into
+# the loaded model record by record (keyed by student code) instead of being
+# overwritten, and only records both sides changed differently are reported
+# as conflicts. Local changes are tracked as model events, with the record's
+# value before the first local change kept as the merge base, so a merge costs
+# a parse of the other file and O(changes) bookkeeping, never a reload.
+from collections import namedtuple
+from contextlib import contextmanager
+from operator import itemgetter
+
+try:
+    import fcntl  # type: ignore
+except ImportError:
+    fcntl = None
+
+from studentmodel import RECORD_FIELDS, MarksDiff, ModelListener, read_marks, write_marks
+from workspace import file_signature
+
+LOCK_SUFFIX = ".lock"
+
+# base/mine/theirs are (name, c1, c2, c3, exam) rows, None where the record does not exist
+Conflict = namedtuple("Conflict", "code base mine theirs")
+MergeResult = namedtuple("MergeResult", "applied conflicts")
+
+_row = itemgetter(*RECORD_FIELDS[1:])
+
+
+def row_of(s):
+    return None if s is None else _row(s)
+
+
+def record_of(code, row):
+    s = {"code": code}
+    s.update(zip(RECORD_FIELDS[1:], row))
+    return s
+
+
+@contextmanager
+def locked(path, exclusive=True):
+    """Hold an advisory lock for path (shared for reading, exclusive for writing).
+
+    The lock is taken on a separate file because saving replaces the marks
+    file's contents. Without fcntl (e.g. on Windows) nothing is locked and
+    saves rely on the version check alone.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path + LOCK_SUFFIX, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_version(path):
+    """Version from the 'count,version' header; 0 for older files or a missing file."""
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    parts = line.split(",")
+                    return int(parts[1]) if len(parts) > 1 else 0
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def read_marks_locked(path):
+    # for the file watcher: never parse a file another instance is half way through writing
+    with locked(path, exclusive=False):
+        return read_marks(path)
+
+
+class MarksSync(ModelListener):
+    """Merge base for one model: the file version it matches and the local changes since."""
+    def __init__(self, model):
+        self.model = model
+        self.version = 0
+        self.signature = None
+        # code -> row as it was in the file before the first local change (None: added here)
+        self.base = {}
+        self._applying = False
+
+    # what the model holds now is exactly the file at this version
+    def loaded(self, version, signature):
+        self.version = version
+        self.signature = signature
+        self.base = {}
+
+    def records_reset(self, students):
+        self.base = {}
+
+    def records_regraded(self, students):
+        pass
+
+    def record_added(self, s):
+        if not self._applying:
+            self.base.setdefault(s["code"], None)
+            self._settle(s["code"])
+
+    def record_removed(self, s):
+        if not self._applying:
+            self.base.setdefault(s["code"], row_of(s))
+            self._settle(s["code"])
+
+    def record_changed(self, old, s):
+        if not self._applying:
+            self.base.setdefault(old["code"], row_of(old))
+            if s["code"] != old["code"]:
+                self.base.setdefault(s["code"], None)
+                self._settle(old["code"])
+            self._settle(s["code"])
+
+    def _settle(self, code):
+        # back as it was in the file (edited and reverted, undone, saved unchanged): not a local change
+        if self.base.get(code, 0) == row_of(self.model.by_code.get(code)):
+            del self.base[code]
+
+    def file_changed(self, path):
+        return file_signature(path) != self.signature or read_version(path) != self.version
+
+    def merge(self, theirs):
+        """Three-way merge of another instance's records into the model.
+
+        Changes only the other side made are applied to the model straight
+        away; records both sides changed differently are returned as conflicts
+        and left as they are here.
+        """
+        by_code = self.model.by_code
+        base = self.base
+        added, removed, changed, conflicts = [], [], [], []
+        seen = set()
+        for s in theirs:
+            code = s["code"]
+            if code in seen:
+                continue
+            seen.add(code)
+            their_row = _row(s)
+            mine = by_code.get(code)
+            my_row = row_of(mine)
+            if my_row == their_row:
+                continue
+            if code not in base or base[code] == my_row:
+                # untouched here, so the other side changed or added it
+                (added if mine is None else changed).append(s)
+            elif base[code] != their_row:
+                conflicts.append(Conflict(code, base[code], my_row, their_row))
+        for code, mine in by_code.items():
+            if code in seen:
+                continue
+            if code not in base or base[code] == _row(mine):
+                removed.append(code)
+            elif base[code] is not None:
+                # deleted there after being edited here
+                conflicts.append(Conflict(code, base[code], _row(mine), None))
+        diff = MarksDiff(added, removed, changed)
+        self.apply(diff)
+        return MergeResult(diff, conflicts)
+
+    def apply(self, diff):
+        """Apply changes that came from the file without counting them as local edits."""
+        self._applying = True
+        try:
+            self.model.apply_diff(diff)
+        finally:
+            self._applying = False
+
+    def resolve(self, conflicts, take_theirs):
+        """Settle conflicts: take_theirs is the set of codes where the other side wins.
+
+        Either way the other side's row becomes the base, so the next save
+        only sees "kept mine" records as ordinary local changes.
+        """
+        added, removed, changed = [], [], []
+        for c in conflicts:
+            if c.code in take_theirs:
+                self.base.pop(c.code, None)
+                if c.theirs is None:
+                    if c.code in self.model.by_code:
+                        removed.append(c.code)
+                elif c.code in self.model.by_code:
+                    changed.append(record_of(c.code, c.theirs))
+                else:
+                    added.append(record_of(c.code, c.theirs))
+            else:
+                self.base[c.code] = c.theirs
+        self.apply(MarksDiff(added, removed, changed))
+
+    def save(self, path, force=False):
+        """Write the model to path under the lock, merging first if someone else wrote it.
+
+        Returns a MergeResult: nothing is written when it has conflicts.
+        force writes without merging (e.g. after restoring an old version).
+        """
+        with locked(path):
+            version = read_version(path)
+            merged = MergeResult(MarksDiff([], [], []), [])
+            if not force and self.file_changed(path):
+                merged = self.merge(read_marks(path))
+                if merged.conflicts:
+                    return merged
+            version = max(version, self.version) + 1
+            write_marks(path, self.model.students, version)
+            self.loaded(version, file_signature(path))
+        return merged
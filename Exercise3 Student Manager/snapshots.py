@@ -0,0 +1,382 @@
+# snapshots.py
+# Version history for the marks and extra details files. Every save becomes a
+# version: most versions are small zlib-compressed deltas (records set or
+# removed, keyed by student code) against the version before; every
+# FULL_EVERY versions a full snapshot of both files is written (lzma or zlib),
+# so any version is restored from the nearest full snapshot plus at most a few
+# deltas. Only the newest KEEP_CHAINS full snapshots (and their deltas) are kept.
+#
+# The store listens to the StudentModel, so it knows which codes changed since
+# the last version and a delta costs O(changes), not a rescan of the cohort.
+# A full snapshot is the bytes save_data has just written, compressed on a
+# writer thread (zlib and lzma release the GIL), so saving never waits on it.
+#
+# Instances sharing a marks file share its history too: the writer numbers a
+# version only when it is written, re-reading index.json under a lock on it
+# and adding to what is on disk rather than rewriting this instance's copy,
+# and each delta names the version it applies to (that instance's previous
+# one, not necessarily the newest in the index).
+import json
+import lzma
+import os
+import queue
+import threading
+import zlib
+from datetime import datetime
+from operator import itemgetter
+
+from sharedmarks import locked
+from studentmodel import RECORD_FIELDS, ModelListener, parse_marks_line
+from workspace import file_signature
+
+SNAPSHOT_DIRNAME = ".snapshots"
+INDEX_FILE = "index.json"
+FULL_EVERY = 20
+KEEP_CHAINS = 10
+
+CODECS = {
+    "zlib": (".z", lambda b: zlib.compress(b, 6), zlib.decompress),
+    "lzma": (".xz", lambda b: lzma.compress(b, preset=1), lzma.decompress),
+}
+
+_row = itemgetter(*RECORD_FIELDS[1:])
+
+
+def snapshot_dir_for(marks_path):
+    """History directory for a marks file: <dir>/.snapshots/<file stem>/."""
+    directory, name = os.path.split(os.path.abspath(marks_path))
+    return os.path.join(directory, SNAPSHOT_DIRNAME, os.path.splitext(name)[0])
+
+
+def files_signature(*paths):
+    """Cheap identity of the saved files, used to tell if they still match the newest version."""
+    return [list(file_signature(p) or ()) for p in paths]
+
+
+def _read_bytes(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+def _record(code, row):
+    s = {"code": code}
+    s.update(zip(RECORD_FIELDS[1:], row))
+    return s
+
+
+class SnapshotStore(ModelListener):
+    """Versioned, compressed history of (students, extra) for one marks file."""
+    def __init__(self, directory, full_codec="zlib", full_every=FULL_EVERY, keep_chains=KEEP_CHAINS):
+        self.directory = directory
+        self.full_codec = full_codec
+        self.full_every = full_every
+        self.keep_chains = keep_chains
+        self.lock = threading.Lock()
+        self.index = self._read_index()
+        self._since_full = 0
+        # codes touched since this store's last version (_base) and the record
+        # order it had; _dirty is None when that is unknown and the next
+        # version must be full
+        self._dirty = None
+        self._order = None
+        self._base = None
+        # versions get their number when written, so until then they are
+        # known by a local id; _written maps the id to the version number
+        self._last_id = 0
+        self._written = {}
+        # codes added since the newest version, in the order they were appended
+        self._added = {}
+        self._jobs = queue.Queue()
+        self._writer = None
+        self.error = None
+
+    # index ------------------------------------------------------------
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, list) else []
+        except (OSError, ValueError):
+            return []
+
+    def _write_index(self, index):
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def _index_lock(self, exclusive=True):
+        os.makedirs(self.directory, exist_ok=True)
+        return locked(os.path.join(self.directory, INDEX_FILE), exclusive)
+
+    @property
+    def versions(self):
+        """Every version in the history, including those other instances recorded."""
+        try:
+            with self._index_lock(exclusive=False):
+                index = self._read_index()
+        except OSError:
+            # e.g. a read-only directory: what this instance has seen will do
+            index = None
+        with self.lock:
+            if index is not None:
+                self.index = index
+            return list(self.index)
+
+    # model events --------------------------------------------------------
+    def records_reset(self, students):
+        self._dirty = None
+
+    def records_regraded(self, students):
+        # only derived fields changed, nothing that is stored
+        pass
+
+    def record_added(self, s):
+        self.touch(s["code"])
+        self._added[s["code"]] = None
+
+    def record_removed(self, s):
+        self.touch(s["code"])
+        self._added.pop(s["code"], None)
+
+    def record_changed(self, old, s):
+        self.touch(old["code"])
+        self.touch(s["code"])
+        if old["code"] != s["code"]:
+            # a renamed record keeps its place, so the order check stores the order
+            self._added.pop(old["code"], None)
+            self._added[s["code"]] = None
+
+    def extras_reset(self, extra):
+        # replaced wholesale (e.g. reloaded), so the next version has to be full
+        self._dirty = None
+
+    def extra_changed(self, code, old, new):
+        self.touch(code)
+
+    def touch(self, code):
+        if self._dirty is not None:
+            self._dirty.add(code)
+
+    # writing ------------------------------------------------------------
+    def prime(self, students, signature):
+        """Continue the history from freshly loaded data if the files are the
+        ones a recorded version was taken from, so the next save can be a delta."""
+        self.flush()
+        index = self.versions
+        pos = next((i for i in range(len(index) - 1, -1, -1) if index[i].get("files") == signature), None)
+        chain = _chain(index, pos) if pos is not None else None
+        with self.lock:
+            if chain:
+                self._order = [s["code"] for s in students]
+                self._dirty = set()
+                self._added = {}
+                self._base = self._new_id()
+                self._written[self._base] = index[pos]["version"]
+                self._since_full = len(chain) - 1
+            else:
+                self._dirty = None
+
+    def _new_id(self):
+        self._last_id += 1
+        return self._last_id
+
+    def record(self, students, by_code, extra, marks_path, extra_path):
+        """Add a version for data that has just been saved to marks_path/extra_path.
+
+        The delta (or the file bytes for a full snapshot) is captured now;
+        compressing, numbering and writing happen on the writer thread.
+        """
+        entry = {"time": datetime.now().isoformat(timespec="seconds"),
+                 "count": len(students), "files": files_signature(marks_path, extra_path)}
+        order = [s["code"] for s in students]
+        with self.lock:
+            # the writer thread sets _dirty to None when a version could not be written
+            dirty, base = self._dirty, self._base
+            self._dirty = set()
+            self._base = local_id = self._new_id()
+        if dirty is None or self._since_full + 1 >= self.full_every:
+            marks_bytes = _read_bytes(marks_path)
+            extra_bytes = _read_bytes(extra_path)
+            entry.update(kind="full", codec=self.full_codec, marks_bytes=len(marks_bytes))
+            payload = marks_bytes + extra_bytes
+            self._since_full = 0
+        else:
+            entry.update(kind="delta", codec="zlib")
+            delta = self._delta(order, by_code, extra, dirty)
+            entry["changed"] = len(delta["set"]) + len(delta["removed"])
+            payload = json.dumps(delta, separators=(",", ":")).encode("utf-8")
+            self._since_full += 1
+        self._order = order
+        self._added = {}
+        self._submit(local_id, base if entry["kind"] == "delta" else None, entry, payload)
+        return entry
+
+    def _delta(self, order, by_code, extra, dirty):
+        set_rows = {}
+        removed = []
+        for code in dirty:
+            s = by_code.get(code)
+            if s is None:
+                removed.append(code)
+            else:
+                set_rows[code] = _row(s)
+        new = [c for c in self._added if c in by_code]
+        # order only needs storing when it is not "old order, minus removed, plus new at the end"
+        if removed:
+            gone = set(removed)
+            expected = [c for c in self._order if c not in gone] + new
+        else:
+            expected = self._order + new
+        return {
+            "set": set_rows,
+            "removed": removed,
+            "added": new,
+            "extra_set": {c: extra[c] for c in dirty if c in extra},
+            "extra_removed": [c for c in dirty if c not in extra],
+            "order": None if order == expected else order,
+        }
+
+    def _submit(self, local_id, base, entry, payload):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+        self._jobs.put((local_id, base, entry, payload))
+
+    def _write_loop(self):
+        while True:
+            local_id, base, entry, payload = self._jobs.get()
+            try:
+                self._written[local_id] = self._write(base, entry, payload)
+            except Exception as e:
+                with self.lock:
+                    self.error = e
+                    # the next version cannot be a delta against one that is not stored
+                    # (deltas already queued against it fail here too)
+                    self._dirty = None
+            finally:
+                self._jobs.task_done()
+
+    def _write(self, base, entry, payload):
+        """Store one version; returns the number it was given."""
+        suffix, compress, _ = CODECS[entry["codec"]]
+        data = compress(payload)
+        with self._index_lock():
+            # as it is now: other instances may have added or pruned versions
+            index = self._read_index()
+            if base is not None:
+                version = self._written.get(base)
+                if version is None or not any(e["version"] == version for e in index):
+                    raise ValueError("the version this change was recorded against is not in the history")
+                entry["base"] = version
+            entry["version"] = index[-1]["version"] + 1 if index else 1
+            name = f"v{entry['version']:06d}.{entry['kind']}{suffix}"
+            path = os.path.join(self.directory, name)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            entry.update(file=name, bytes=len(data))
+            index.append(entry)
+            if entry["kind"] == "full":
+                self._prune(index)
+            self._write_index(index)
+        with self.lock:
+            self.index = index
+        return entry["version"]
+
+    def flush(self):
+        """Wait until every recorded version is on disk."""
+        self._jobs.join()
+
+    def take_error(self):
+        """The last error from writing a version (once), or None."""
+        with self.lock:
+            error, self.error = self.error, None
+        return error
+
+    def _prune(self, index):
+        fulls = [i for i, e in enumerate(index) if e["kind"] == "full"]
+        if len(fulls) <= self.keep_chains:
+            return
+        cut = fulls[-self.keep_chains]
+        kept = set()
+        dropped = index[:cut]
+        for entry in index[cut:]:
+            # another instance's delta can apply to a version before the cut
+            if entry["kind"] == "full" or _base_of(index, entry) in kept:
+                kept.add(entry["version"])
+            else:
+                dropped.append(entry)
+        for entry in dropped:
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except OSError:
+                pass
+        index[:] = [e for e in index if e["version"] in kept]
+
+    # reading ------------------------------------------------------------
+    def _read_blob(self, entry):
+        _, _, decompress = CODECS[entry["codec"]]
+        with open(os.path.join(self.directory, entry["file"]), "rb") as f:
+            return decompress(f.read())
+
+    def restore(self, version):
+        """(students, extra) as they were at the given version."""
+        self.flush()
+        index = self.versions
+        pos = next((i for i, e in enumerate(index) if e["version"] == version), None)
+        if pos is None:
+            raise KeyError(f"No snapshot version {version}")
+        chain = _chain(index, pos)
+        if chain is None:
+            raise ValueError(f"Version {version} has no full snapshot to start from")
+        full = self._read_blob(chain[0])
+        split = chain[0]["marks_bytes"]
+        rows = {}
+        lines = [l for l in full[:split].decode("utf-8").splitlines() if l.strip()]
+        # first non-empty line is the student count, as in read_marks
+        for line in lines[1:]:
+            s = parse_marks_line(line.strip())
+            if s is not None:
+                rows[s["code"]] = _row(s)
+        order = list(rows)
+        extra_text = full[split:].decode("utf-8")
+        extra = json.loads(extra_text) if extra_text.strip() else {}
+        for entry in chain[1:]:
+            delta = json.loads(self._read_blob(entry).decode("utf-8"))
+            for code in delta["removed"]:
+                rows.pop(code, None)
+            rows.update(delta["set"])
+            if delta["order"] is not None:
+                order = delta["order"]
+            else:
+                gone = set(delta["removed"])
+                order = [c for c in order if c not in gone] + delta["added"]
+            for code in delta["extra_removed"]:
+                extra.pop(code, None)
+            extra.update(delta["extra_set"])
+        return [_record(code, rows[code]) for code in order], extra
+
+
+def _base_of(index, entry):
+    """Version a delta applies to. Older indexes do not name it: there it is the entry before."""
+    if "base" in entry:
+        return entry["base"]
+    i = index.index(entry)
+    return index[i - 1]["version"] if i > 0 else None
+
+
+def _chain(index, pos):
+    """The entries to restore index[pos] from, its full snapshot first; None if that is gone."""
+    by_version = {e["version"]: e for e in index}
+    chain = [index[pos]]
+    while chain[-1]["kind"] != "full":
+        base = by_version.get(_base_of(index, chain[-1]))
+        if base is None:
+            return None
+        chain.append(base)
+    chain.reverse()
+    return chain
@@ -0,0 +1,440 @@
+# studentapi.py
+# A read-only HTTP/JSON API over the in-memory StudentModel, so other tools can
+# ask for graded records instead of re-parsing studentMarks.txt and repeating
+# the grading rules. One asyncio event loop accepts connections and parses
+# requests (keep-alive, so a client can send many); the lookup for each
+# request runs on a small thread pool under the model's lock, so a long filter
+# or a reload in progress never holds up other clients' sockets.
+#
+# The GUI can serve the model it has loaded (the "Serve API" button), or the
+# server runs on its own and follows changes to the files:
+#
+#     python studentapi.py --marks studentMarks.txt --port 8765
+#     python studentapi.py --unix /tmp/students.sock
+#
+# GET endpoints (all answers are JSON):
+#     /students?offset=0&limit=50&filter=<query>   a page of records, file order;
+#               &course=<name>&year=<yyyy>&domain=<email domain> narrow it by index
+#     /students/<code>                             one record plus extra details
+#     /search?q=<code or name>&limit=20            ranked, typo tolerant matches
+#     /stats                                       count, average, grades, bins
+#     /courses                                     students, average and grades per course
+#     /top?n=10   /bottom?n=10                     best/worst by percentage
+#     /health
+import argparse
+import asyncio
+import json
+import os
+import signal
+import stat
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from aggregates import GradeAggregates, BIN_WIDTH
+from extraindex import KEYS as EXTRA_KEYS, ExtraIndex
+from filewatch import FileWatcher
+from fuzzysearch import NameIndex
+from grading import GradingEngine, load_grading_config, read_grading_config
+from perfstats import PERF
+from rankindex import RankIndex
+from sharedmarks import read_marks_locked
+from studentmodel import StudentModel, diff_records, load_extra, read_extra_file
+from studentquery import CompiledQuery, QueryError
+from workspace import extra_path_for
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_PAGE = 50
+MAX_PAGE = 1000
+MAX_RESULTS = 1000
+WORKERS = 4
+# a request waiting longer than this for a reload to finish gets a 503
+LOCK_TIMEOUT = 2.0
+# requests are GETs: anything with a longer head is refused
+MAX_HEAD_BYTES = 16 * 1024
+WATCH_POLL_S = 0.5
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+@lru_cache(maxsize=64)
+def compile_filter(text):
+    # filters are compiled once and reused by every page of the same query
+    return CompiledQuery(text)
+
+
+def int_param(params, name, default, lo, hi):
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be a whole number")
+    if not lo <= value <= hi:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be between {lo} and {hi}")
+    return value
+
+
+class StudentService:
+    """Answers API requests from a model and the indexes subscribed to it."""
+    def __init__(self, model, name_index, aggregates, ranks, extra_index):
+        self.model = model
+        self.name_index = name_index
+        self.aggregates = aggregates
+        self.ranks = ranks
+        self.extra_index = extra_index
+        self.routes = {
+            "students": self.list_students,
+            "search": self.search,
+            "stats": self.stats,
+            "courses": self.courses,
+            "top": lambda params: self.ranked(params, True),
+            "bottom": lambda params: self.ranked(params, False),
+            "health": self.health,
+        }
+
+    def respond(self, target):
+        """(status, JSON body bytes) for a request target such as '/top?n=5'."""
+        parts = urlsplit(target)
+        segments = [unquote(p) for p in parts.path.split("/") if p]
+        params = parse_qs(parts.query)
+        name = segments[0] if segments else ""
+        try:
+            if name == "students" and len(segments) == 2:
+                handler, args = self.get_student, (segments[1],)
+            elif name in self.routes and len(segments) == 1:
+                handler, args = self.routes[name], (params,)
+            else:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"No such endpoint: {parts.path}")
+            with PERF.measure(f"api /{name}"):
+                if not self.model.lock.acquire(timeout=LOCK_TIMEOUT):
+                    raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "Student records are being reloaded, try again")
+                try:
+                    body = handler(*args)
+                finally:
+                    self.model.lock.release()
+            status = HTTPStatus.OK
+        except ApiError as e:
+            status, body = e.status, {"error": str(e)}
+        except Exception as e:
+            # a bug in a handler: the client still gets an answer, the details go to the log
+            print(f"Error answering {target}: {e!r}", file=sys.stderr, flush=True)
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+        return status, json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+    # the handlers run with the model lock held --------------------------------
+    def _record(self, s, rank_columns):
+        rank, pctl = rank_columns(s)
+        return {
+            "code": s["code"], "name": s["name"],
+            "c1": s["c1"], "c2": s["c2"], "c3": s["c3"], "exam": s["exam"],
+            "total": s["total"], "perc": round(s["perc"], 2), "grade": s["grade"],
+            "rank": rank, "percentile": round(pctl, 1),
+        }
+
+    def records(self, students):
+        rank_columns = self.ranks.rank_columns()
+        return [self._record(s, rank_columns) for s in students]
+
+    def list_students(self, params):
+        offset = int_param(params, "offset", 0, 0, 1 << 62)
+        limit = int_param(params, "limit", DEFAULT_PAGE, 1, MAX_PAGE)
+        students = self.model.students
+        codes = None
+        for name in EXTRA_KEYS:
+            key = params.get(name, [""])[0].strip()
+            if key:
+                found = self.extra_index.codes(name, key)
+                codes = found if codes is None else codes & found
+        if codes is not None:
+            students = self.model.in_order(codes)
+        text = params.get("filter", [""])[0].strip()
+        if text:
+            try:
+                students = compile_filter(text).filter(students, self.model.extra)
+            except QueryError as e:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"Bad filter: {e}")
+        return {
+            "total": len(students),
+            "offset": offset,
+            "limit": limit,
+            "students": self.records(students[offset:offset + limit]),
+        }
+
+    def get_student(self, code):
+        s = self.model.get(code)
+        if s is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No student with code {code}")
+        out = self.records([s])[0]
+        out["extra"] = self.model.extra.get(code, {})
+        return out
+
+    def search(self, params):
+        q = params.get("q", [""])[0].strip()
+        if not q:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "q is required")
+        limit = int_param(params, "limit", 20, 1, MAX_RESULTS)
+        # same ranking as the GUI's search box: exact code, then the name index
+        if q in self.model.by_code:
+            found = [self.model.get(q)]
+        else:
+            found = [self.model.get(c) for _, c in self.name_index.search(q, limit)]
+        return {"query": q, "students": self.records(found)}
+
+    def stats(self, params):
+        agg = self.aggregates
+        grades, counts = agg.grade_distribution(self.model.grader.grade_order)
+        return {
+            "count": agg.count,
+            "average": round(agg.average, 2),
+            "highest": agg.highest,
+            "lowest": agg.lowest,
+            "grades": dict(zip(grades, counts)),
+            "bins": [{"from": edge, "to": edge + BIN_WIDTH, "count": n} for edge, n in zip(agg.bin_edges(), agg.bins)],
+        }
+
+    def courses(self, params):
+        grade_order = self.model.grader.grade_order
+        return {"courses": [
+            {"course": course, "count": cs.count, "average": round(cs.average, 2),
+             "grades": {g: cs.grade_counts[g] for g in grade_order if cs.grade_counts.get(g)}}
+            for course, cs in sorted(self.extra_index.courses.items())
+        ]}
+
+    def ranked(self, params, best):
+        n = int_param(params, "n", 10, 1, MAX_RESULTS)
+        codes = self.ranks.ranked_codes(n, best)
+        return {"students": self.records([self.model.get(c) for c in codes])}
+
+    def health(self, params):
+        return {"status": "ok", "students": len(self.model)}
+
+
+class StudentApiServer:
+    """Serves a StudentService over HTTP on TCP (host, port) or a Unix socket."""
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, workers=WORKERS):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.workers = workers
+        self.connections = 0
+        self.loop = None
+        self._server = None
+        self._pool = None
+        self._thread = None
+        self._stopped = None
+
+    @property
+    def address(self):
+        if self.unix_path:
+            return f"unix:{self.unix_path}"
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="studentapi")
+        self._stopped = asyncio.Event()
+        if self.unix_path:
+            _remove_stale_socket(self.unix_path)
+            self._server = await asyncio.start_unix_server(self.handle, self.unix_path, limit=MAX_HEAD_BYTES)
+        else:
+            self._server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_HEAD_BYTES)
+            # port 0 asks the OS for a free port
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve(self):
+        """Run until stop() is called."""
+        await self.start()
+        await self.serve_started()
+
+    async def serve_started(self):
+        try:
+            await self._stopped.wait()
+        finally:
+            self._server.close()
+            await self._server.wait_closed()
+            self._pool.shutdown(wait=False)
+            if self.unix_path:
+                _remove_stale_socket(self.unix_path)
+
+    def start_in_thread(self):
+        """Serve from a daemon thread (as the GUI does); raises if the server cannot start."""
+        ready = threading.Event()
+        failed = []
+
+        async def main():
+            try:
+                await self.start()
+            except Exception as e:
+                failed.append(e)
+                return
+            finally:
+                ready.set()
+            await self.serve_started()
+
+        self._thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+        self._thread.start()
+        ready.wait()
+        if failed:
+            raise failed[0]
+        return self
+
+    def stop(self):
+        if self.loop is not None and self._stopped is not None:
+            self.loop.call_soon_threadsafe(self._stopped.set)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, b'{"error":"Request too large"}', False)
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split()
+                except ValueError:
+                    await self._send(writer, HTTPStatus.BAD_REQUEST, b'{"error":"Malformed request line"}', False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._send(writer, HTTPStatus.BAD_REQUEST, b'{"error":"Bad Content-Length"}', False)
+                    return
+                if length:
+                    await reader.readexactly(length)
+                if method not in ("GET", "HEAD"):
+                    await self._send(writer, HTTPStatus.METHOD_NOT_ALLOWED, b'{"error":"The API is read-only"}', keep_alive)
+                else:
+                    status, body = await self.loop.run_in_executor(self._pool, self.service.respond, target)
+                    await self._send(writer, status, b"" if method == "HEAD" else body, keep_alive, len(body))
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _send(self, writer, status, body, keep_alive, length=None):
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body) if length is None else length}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def _remove_stale_socket(path):
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+class StandaloneData:
+    """Model, indexes and extras loaded from the data files, kept in step with them."""
+    def __init__(self, marks_path, extra_path, grading_path):
+        self.grader = GradingEngine(load_grading_config(grading_path))
+        self.model = StudentModel(grader=self.grader)
+        self.name_index = self.model.subscribe(NameIndex())
+        self.aggregates = self.model.subscribe(GradeAggregates())
+        self.ranks = self.model.subscribe(RankIndex())
+        self.extra_index = self.model.subscribe(ExtraIndex(self.model))
+        self.model.reset(read_marks_locked(marks_path) if os.path.exists(marks_path) else [])
+        self.model.reset_extra(load_extra(extra_path))
+        self.service = StudentService(self.model, self.name_index, self.aggregates, self.ranks, self.extra_index)
+        self.watchers = (
+            FileWatcher(marks_path, read_marks_locked).start(),
+            FileWatcher(extra_path, read_extra_file).start(),
+            FileWatcher(grading_path, read_grading_config).start(),
+        )
+
+    async def follow_files(self):
+        # the watchers parse on their own threads; applying a change only takes the model lock
+        loop = asyncio.get_running_loop()
+        marks, extra, grading = self.watchers
+        while True:
+            await asyncio.sleep(WATCH_POLL_S)
+            result = marks.drain()
+            if result and result[0] is None:
+                await loop.run_in_executor(None, lambda: self.model.apply_diff(diff_records(self.model.by_code, result[1])))
+            result = extra.drain()
+            if result and result[0] is None:
+                self.model.reset_extra(result[1])
+            result = grading.drain()
+            if result and result[0] is None:
+                try:
+                    self.grader.configure(result[1])
+                except Exception as e:
+                    # stdout is read by apiload.py
+                    print(f"Ignoring invalid grading config: {e}", file=sys.stderr, flush=True)
+                    continue
+                await loop.run_in_executor(None, self.model.regrade)
+
+
+async def serve_standalone(args):
+    extra_path = args.extra or extra_path_for(args.marks)
+    data = StandaloneData(args.marks, extra_path, args.grading)
+    server = StudentApiServer(data.service, args.host, args.port, args.unix, args.workers)
+    await server.start()
+    # the first line is read by apiload.py to find the server
+    print(f"Serving {len(data.model)} students on {server.address}", flush=True)
+    follow = asyncio.ensure_future(data.follow_files())
+    try:
+        # a terminated server still removes its Unix socket
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.stop)
+    except (NotImplementedError, AttributeError):
+        pass
+    try:
+        await server.serve_started()
+    finally:
+        follow.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve student records as a local JSON API.")
+    parser.add_argument("--marks", default=os.path.join(SCRIPT_DIR, "studentMarks.txt"))
+    parser.add_argument("--extra", default=None, help="extra details file (default: next to the marks file)")
+    parser.add_argument("--grading", default=os.path.join(SCRIPT_DIR, "grading.json"))
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve_standalone(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,41 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
 import os
+import io
 import json
-from datetime import datetime
+import queue
+import threading
+import time
+import tracemalloc
+
+from operator import itemgetter
+
+from studentmodel import (
+    StudentModel, ModelListener, read_marks, load_extra, read_extra_file,
+)
+from grading import MARK_FIELDS, GradingEngine, load_grading_config, read_grading_config
+from filewatch import FileWatcher
+from treesync import RowChanges, TreeReconciler
+from fuzzysearch import NameIndex
+from workspace import Workspace, extra_path_for, file_signature
+from studentquery import CompiledQuery, QueryError
+from aggregates import GradeAggregates, BIN_COUNT, BIN_WIDTH
+from perfstats import PERF, timed
+from snapshots import SnapshotStore, snapshot_dir_for, files_signature
+from edithistory import EditHistory
+from rankindex import RankIndex
+from studentapi import StudentApiServer, StudentService
+from sharedmarks import MarksSync, locked, read_marks_locked, read_version
+from marksmerge import POLICIES, plan_merge, write_report
+from extraindex import KEYS as EXTRA_KEYS, ExtraIndex, course_rows, course_stats
+from jobs import CANCELLED, QUEUED, JobRunner, output_path
+from memprofile import MEM, format_report, mb, mb_delta
 
 
 try:
     from reportlab.lib.pagesizes import letter  # type: ignore
     from reportlab.pdfgen import canvas as pdfcanvas  # type: ignore
+    from reportlab.lib.utils import ImageReader  # type: ignore
     REPORTLAB_AVAILABLE = True
 except Exception:
     REPORTLAB_AVAILABLE = False
@@ -19,6 +47,7 @@ try:
     import matplotlib.pyplot as plt  # type: ignore
     from matplotlib.figure import Figure  # type: ignore
     from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg  # type: ignore
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # type: ignore
     MATPLOTLIB_AVAILABLE = True
 except Exception:
     MATPLOTLIB_AVAILABLE = False
@@ -34,6 +63,27 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 MARKS_FILE = os.path.join(SCRIPT_DIR, "studentMarks.txt")
 EXTRA_FILE = os.path.join(SCRIPT_DIR, "studentExtra.json")
 USERS_FILE = os.path.join(SCRIPT_DIR, "users.json")
+GRADING_FILE = os.path.join(SCRIPT_DIR, "grading.json")
+WATCH_POLL_MS = 500
+LOAD_POLL_MS = 50
+SEARCH_LIMIT = 50
+SUGGESTION_LIMIT = 20
+# dialogs rank up to MATCH_LIMIT matches and show them PAGE_SIZE at a time
+MATCH_LIMIT = 1000
+PAGE_SIZE = 50
+PAGING_KEYS = ("Prior", "Next")
+# rows of a merge preview drawn in its table (the report file has them all)
+MERGE_PREVIEW_ROWS = 1000
+# cohorts after the selected one that are parsed in the background
+PREFETCH_COHORTS = 2
+PERF_REFRESH_MS = 1000
+# how often an open stats window checks whether the data changed
+STATS_REFRESH_MS = 300
+MEM_REFRESH_MS = 1000
+# how often the job bar picks up progress from background jobs
+JOB_POLL_MS = 100
+# rows written between progress reports (and cancellation checks) of an export
+EXPORT_CHUNK = 1000
 
 # LOGO PATHS
 LOGO_PATHS = [
@@ -71,22 +121,324 @@ def set_app_icon(window):
         except Exception:
             pass
 
-def load_extra():
-    if os.path.exists(EXTRA_FILE):
-        try:
-            with open(EXTRA_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_extra(data):
+def save_extra(data, path=EXTRA_FILE):
     try:
-        with open(EXTRA_FILE, "w") as f:
+        with open(path, "w") as f:
             json.dump(data, f, indent=2)
     except:
         messagebox.showerror("Error", "Failed to save extra student details.")
 
+def write_csv_table(path, headers, rows, job=None):
+    # job: the background Job running the export, told the progress every EXPORT_CHUNK rows
+    with output_path(path) as tmp, open(tmp, "w") as f:
+        f.write(",".join(headers)+"\n")
+        for i, vals in enumerate(rows):
+            if job is not None and i % EXPORT_CHUNK == 0:
+                job.progress(i, len(rows))
+            f.write(",".join(str(v) for v in vals)+"\n")
+
+def write_pdf_table(path, headers, rows, job=None):
+    with output_path(path) as tmp:
+        _write_pdf_table(tmp, headers, rows, job)
+
+def _write_pdf_table(path, headers, rows, job):
+    c = pdfcanvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    x = 36; y = height - 36
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(x, y, "Oxford University - Student Manager Export")
+    if LOGO_PATH and os.path.exists(LOGO_PATH):
+        try:
+            c.drawImage(LOGO_PATH, width-130, y-30, width=72, height=72, mask='auto')
+        except:
+            pass
+    c.setFont("Helvetica", 9)
+    y -= 40
+    row_h = 14
+    # compute column x positions (simple layout)
+    col_x = [x, x+80, x+320, x+400, x+480, x+560, x+640, x+720, x+800, x+880, x+960, x+1040] # Adjusted to give more space
+    for i,h in enumerate(headers):
+        c.drawString(col_x[i], y, h)
+    y -= row_h
+    for n, vals in enumerate(rows):
+        if job is not None and n % EXPORT_CHUNK == 0:
+            job.progress(n, len(rows))
+        if y < 80:
+            c.showPage()
+            y = height - 36
+        for i,v in enumerate(vals):
+            c.drawString(col_x[i], y, str(v))
+        y -= row_h
+    c.save()
+
+def fill_match_tree(tv, rows):
+    # the small code/name/total/perc result tables used by the dialogs
+    tv.delete(*tv.get_children())
+    for s in rows:
+        # Use the student's code as the item ID (iid) for easy lookup; ensure it is a string
+        tv.insert("", "end", values=(s["code"], s["name"], s["total"], f"{s['perc']:.2f}%"), iid=str(s["code"]))
+
+class ResultPager:
+    """Prev/Next bar that hands one page of a result list to `render`.
+
+    results can be any sliceable sequence (e.g. the model's own student list),
+    so only the rows on screen are ever turned into widget items.
+    """
+    def __init__(self, parent, render, page_size=PAGE_SIZE):
+        self.render = render
+        self.page_size = page_size
+        self.results = []
+        self.capped = False
+        self.page = 0
+        self.frame = tk.Frame(parent, bg=LIGHT_BG)
+        self.prev_btn = tk.Button(self.frame, text="< Prev", command=self.prev_page, width=8)
+        self.prev_btn.pack(side="left")
+        self.info = tk.Label(self.frame, text="", bg=LIGHT_BG)
+        self.info.pack(side="left", expand=True)
+        self.next_btn = tk.Button(self.frame, text="Next >", command=self.next_page, width=8)
+        self.next_btn.pack(side="right")
+
+    @property
+    def pages(self):
+        return max(1, -(-len(self.results) // self.page_size))
+
+    def bind_keys(self, *widgets):
+        # PageUp/PageDown flip pages, Ctrl+Home/Ctrl+End jump to the ends
+        for w in widgets:
+            w.bind("<Prior>", lambda e: self.prev_page() or "break")
+            w.bind("<Next>", lambda e: self.next_page() or "break")
+            w.bind("<Control-Home>", lambda e: self.show(0) or "break")
+            w.bind("<Control-End>", lambda e: self.show(self.pages - 1) or "break")
+
+    def set_results(self, results, capped=False):
+        self.results = results
+        self.capped = capped
+        self.show(0)
+
+    def show(self, page):
+        self.page = min(max(page, 0), self.pages - 1)
+        start = self.page * self.page_size
+        self.render(self.results[start:start + self.page_size])
+        total = len(self.results)
+        noun = "top matches" if self.capped else "results"
+        self.info.config(text=f"Page {self.page + 1:,} of {self.pages:,}  ({total:,} {noun})")
+        self.prev_btn.config(state="normal" if self.page > 0 else "disabled")
+        self.next_btn.config(state="normal" if self.page < self.pages - 1 else "disabled")
+
+    def prev_page(self):
+        self.show(self.page - 1)
+
+    def next_page(self):
+        self.show(self.page + 1)
+
+def add_chart_axes(fig, ctype):
+    """Axes for a chart type ("hist", "pie" or "both") on fig: (histogram axes, its bars, pie axes)."""
+    hist_ax = bars = pie_ax = None
+    if ctype in ("hist", "both"):
+        hist_ax = fig.add_subplot(121 if ctype == "both" else 111)
+        edges = [i * BIN_WIDTH for i in range(BIN_COUNT)]
+        bars = hist_ax.bar(edges, [0] * BIN_COUNT, width=BIN_WIDTH, align="edge")
+        hist_ax.set_xlim(0, BIN_COUNT * BIN_WIDTH)
+        hist_ax.set_title("Distribution of Percentages")
+        hist_ax.set_xlabel("Percentage")
+        hist_ax.set_ylabel("Count")
+    if ctype in ("pie", "both"):
+        pie_ax = fig.add_subplot(122 if ctype == "both" else 111)
+    return hist_ax, bars, pie_ax
+
+def fill_charts(hist_ax, bars, pie_ax, bins, grades):
+    # grades: (labels, counts) of the grade distribution
+    if bars is not None:
+        for rect, n in zip(bars, bins):
+            rect.set_height(n)
+        hist_ax.set_ylim(0, max(max(bins) * 1.1, 1))
+    if pie_ax is not None:
+        # a handful of wedges at most: redrawing them costs nothing next to the data
+        labels, counts = grades
+        pie_ax.clear()
+        if counts:
+            pie_ax.pie(counts, labels=labels, autopct="%1.1f%%", startangle=90)
+        pie_ax.set_title("Grade Distribution")
+
+def write_chart(path, ctype, bins, grades, job):
+    """Draw the charts on a figure of their own and save them as a PDF page or a PNG.
+
+    Runs as a background job, so it never touches the window's figure; the
+    image only exists in memory until it is written.
+    """
+    fig = Figure(figsize=(12,5), dpi=100)
+    FigureCanvasAgg(fig)
+    fill_charts(*add_chart_axes(fig, ctype), bins, grades)
+    job.progress(1, 3)
+    png = io.BytesIO()
+    fig.savefig(png, format="png", bbox_inches="tight")
+    job.progress(2, 3)
+    with output_path(path) as tmp:
+        if path.lower().endswith(".pdf"):
+            png.seek(0)
+            c = pdfcanvas.Canvas(tmp, pagesize=letter)
+            w, h = letter
+            c.setFont("Helvetica-Bold", 14)
+            c.drawString(36, h-36, "Oxford University - Statistics Export")
+            # embed logo if available
+            if LOGO_PATH and os.path.exists(LOGO_PATH):
+                try:
+                    c.drawImage(LOGO_PATH, w-120, h-80, width=72, height=72, mask='auto')
+                except:
+                    pass
+            c.drawImage(ImageReader(png), 36, 80, width=w-72, preserveAspectRatio=True, mask='auto')
+            c.save()
+        else:
+            with open(tmp, "wb") as f:
+                f.write(png.getvalue())
+    job.progress(3, 3)
+
+class StatsWindow(ModelListener):
+    """Statistics window that keeps one figure and canvas for its whole life.
+
+    Model changes only mark it dirty (they can arrive on the loader thread);
+    a timer on the Tk thread then updates the bar heights and grade pie from
+    the aggregates and asks for a draw_idle, so a refresh costs the same for
+    ten students or a million.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.dirty = False
+        self.hist_ax = self.bars = self.pie_ax = None
+        self.win = win = tk.Toplevel(app.root)
+        win.geometry("1100x680")
+        win.configure(bg=LIGHT_BG)
+
+        # SET ICON
+        set_app_icon(win)
+
+        topf = tk.Frame(win, bg=LIGHT_BG)
+        topf.pack(fill="x", padx=12, pady=8)
+        self.header = tk.Label(topf, text="", bg=LIGHT_BG, font=("Arial",11,"bold"))
+        self.header.pack(side="left")
+
+        self.chart_type = tk.StringVar(value="hist")
+
+        # Options: Histogram, Pie, or Both
+        tk.Radiobutton(topf, text="Histogram", variable=self.chart_type, value="hist", bg=LIGHT_BG, command=self.layout).pack(side="left", padx=6)
+        tk.Radiobutton(topf, text="Pie Chart (grades)", variable=self.chart_type, value="pie", bg=LIGHT_BG, command=self.layout).pack(side="left", padx=6)
+
+        # OPTION FOR SEE BOTH
+        tk.Radiobutton(topf, text="See Both (Side-by-Side)", variable=self.chart_type, value="both", bg=LIGHT_BG, fg=ACCENT, font=("Arial", 10, "bold"), command=self.layout).pack(side="left", padx=10)
+
+        tk.Button(topf, text="Export Chart to PDF", bg="#27ae60", fg="white", command=self.export).pack(side="right", padx=8)
+
+        canvas_frame = tk.Frame(win, bg=LIGHT_BG)
+        canvas_frame.pack(fill="both", expand=True, padx=12, pady=6)
+        if MATPLOTLIB_AVAILABLE:
+            self.fig = Figure(figsize=(12,5), dpi=100)
+            self.canvas = FigureCanvasTkAgg(self.fig, master=canvas_frame)
+            self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        else:
+            self.fig = None
+            tk.Label(canvas_frame, text="matplotlib not installed. Install it to view charts.", bg=LIGHT_BG).pack()
+
+        tk.Label(win, text="By course", bg=LIGHT_BG, font=("Arial",10,"bold")).pack(anchor="w", padx=12)
+        cols = ("course", "students", "average", "grades")
+        self.course_tv = ttk.Treeview(win, columns=cols, show="headings", height=6)
+        for c in cols:
+            self.course_tv.heading(c, text=c.title())
+            self.course_tv.column(c, width=420 if c == "grades" else 200 if c == "course" else 100, anchor="w" if c in ("course", "grades") else "center")
+        self.course_tv.pack(fill="x", padx=12, pady=(2,10))
+
+        win.protocol("WM_DELETE_WINDOW", self.close)
+        app.model.subscribe(self)
+        self.layout()
+        win.after(STATS_REFRESH_MS, self.tick)
+
+    # model events: just note that the charts are out of date
+    def records_reset(self, students):
+        self.dirty = True
+
+    def record_added(self, s):
+        self.dirty = True
+
+    def record_removed(self, s):
+        self.dirty = True
+
+    def record_changed(self, old, s):
+        self.dirty = True
+
+    def extras_reset(self, extra):
+        self.dirty = True
+
+    def extra_changed(self, code, old, new):
+        self.dirty = True
+
+    def aggregates(self):
+        """(grade aggregates, per-course stats): kept by the model's listeners
+        for the whole cohort, computed for just the visible students otherwise."""
+        app = self.app
+        if app.query is None and app.browse is None:
+            return app.aggregates, app.extra_index.courses
+        visible = app.visible_students()
+        return GradeAggregates(visible), course_stats(visible, app.extra)
+
+    def layout(self):
+        """(Re)create the axes for the chosen chart type on the existing figure."""
+        if self.fig is None:
+            self.refresh()
+            return
+        self.fig.clear()
+        self.hist_ax, self.bars, self.pie_ax = add_chart_axes(self.fig, self.chart_type.get())
+        self.refresh()
+
+    def refresh(self):
+        self.dirty = False
+        app = self.app
+        agg, courses = self.aggregates()
+        scope = [f"{EXTRA_KEYS[app.browse[0]][0]} {app.browse[1]}"] if app.browse is not None else []
+        scope += [app.query.text] if app.query is not None else []
+        self.win.title(" - ".join(["Statistics"] + scope))
+        self.header.config(text=f"Average: {agg.average:.2f}%  Highest: {agg.highest:.2f}%  Lowest: {agg.lowest:.2f}%  Students: {agg.count}")
+        # one row per course, so rebuilding the rows is cheap
+        self.course_tv.delete(*self.course_tv.get_children())
+        for row in course_rows(courses, app.grader.grade_order):
+            self.course_tv.insert("", "end", values=row)
+        if self.fig is None:
+            return
+        fill_charts(self.hist_ax, self.bars, self.pie_ax, agg.bins, agg.grade_distribution(app.grader.grade_order))
+        self.canvas.draw_idle()
+
+    def tick(self):
+        if not self.win.winfo_exists():
+            return
+        if self.dirty and not self.app.loading:
+            self.refresh()
+        self.win.after(STATS_REFRESH_MS, self.tick)
+
+    def close(self):
+        self.app.model.unsubscribe(self)
+        self.app.stats_win = None
+        self.win.destroy()
+        self.app.mem_checkpoint("after closing stats", force=True)
+
+    def export(self):
+        if self.fig is None:
+            messagebox.showwarning("No Chart", "matplotlib is needed to export charts.", parent=self.win)
+            return
+        path = filedialog.asksaveasfilename(parent=self.win, defaultextension=".pdf", filetypes=[("PDF","*.pdf"),("PNG","*.png")])
+        if not path:
+            return
+        if path.lower().endswith(".pdf") and not REPORTLAB_AVAILABLE:
+            path = os.path.splitext(path)[0] + ".png"
+            messagebox.showwarning("reportlab missing", f"Install reportlab to embed charts into a PDF. The chart will be saved to {path}.", parent=self.win)
+        # the job draws from a copy of what the window shows now
+        agg, _ = self.aggregates()
+        bins = list(agg.bins)
+        grades = agg.grade_distribution(self.app.grader.grade_order)
+        ctype = self.chart_type.get()
+        app = self.app
+        app.run_job(f"Chart to {os.path.basename(path)}",
+                    lambda job: write_chart(path, ctype, bins, grades, job),
+                    on_done=lambda _: app.status_label.config(text=f"Chart saved to {path}"),
+                    on_error=lambda e: messagebox.showerror("Error", f"Chart export failed: {e}"))
+
 class LoginWindow:
     """Larger, professional login window (600x400) using Oxford branding and logo."""
     def __init__(self, master, on_success):
@@ -189,8 +541,40 @@ class StudentManager:
         #  SET ICON FOR MAIN WINDOW
         set_app_icon(root)
 
-        self.students = self.load_data()
-        self.extra = load_extra()
+        # data is loaded on a background thread once the window is up
+        self.marks_file = MARKS_FILE
+        self.extra_file = EXTRA_FILE
+        # set when a directory of cohort marks files is opened
+        self.workspace = None
+        self.active_cohort = ""
+        self._watch_polling = False
+        self.grader = GradingEngine(load_grading_config(GRADING_FILE))
+        self.model = StudentModel(grader=self.grader)
+        self.name_index = self.model.subscribe(NameIndex())
+        self.aggregates = self.model.subscribe(GradeAggregates())
+        self.ranks = self.model.subscribe(RankIndex())
+        # course / DOB year / email domain -> codes, and live per-course stats
+        self.extra_index = self.model.subscribe(ExtraIndex(self.model))
+        # undo/redo of add/update/delete
+        self.history = self.model.subscribe(EditHistory(self.model))
+        # file version and local changes, so saves merge with other instances' writes
+        self.sync = self.model.subscribe(MarksSync(self.model))
+        # table rows are rebuilt only for the records these report changed
+        self.row_changes = self.model.subscribe(RowChanges())
+        self._row_cache = {}
+        self._rank_version = None
+        # (table order list, top code, low code) as view_all last drew them
+        self._shown = None
+        self._stripe_pending = False
+        # version history of the data files, opened for each marks file that is loaded
+        self.snapshots = None
+        self.loading = False
+        self._view_mode = "all"
+        self._single_code = None
+        # active filter (a CompiledQuery) applied to the table, stats and export
+        self.query = None
+        # (index name, key) from the browse bar, e.g. ("course", "Data Science"), or None
+        self.browse = None
 
         top = tk.Frame(root, bg=OXFORD_BLUE, pady=10)
         top.pack(fill="x")
@@ -224,12 +608,44 @@ class StudentManager:
         search_btn.grid(row=0, column=2, padx=6)
         clear_btn = tk.Button(search_frame, text="Clear Search", command=self.clear_search)
         clear_btn.grid(row=0, column=3, padx=6)
+        # widgets that stay disabled while data is loading
+        self.busy_widgets = [self.search_entry, search_btn, clear_btn]
 
         self.listbox = tk.Listbox(search_frame, width=48, height=5)
         self.listbox.grid(row=1, column=1, padx=6, sticky="w")
         self.listbox.bind("<<ListboxSelect>>", self.select_suggestion)
         self.listbox.grid_remove()
 
+        filter_frame = tk.Frame(root, bg=LIGHT_BG)
+        filter_frame.pack(fill="x", padx=12)
+        tk.Label(filter_frame, text="Filter:", bg=LIGHT_BG, font=("Arial", 11)).pack(side="left", padx=4)
+        self.filter_var = tk.StringVar()
+        filter_entry = tk.Entry(filter_frame, textvariable=self.filter_var, width=60, font=("Arial", 11))
+        filter_entry.pack(side="left", padx=6)
+        filter_entry.bind("<Return>", lambda e: self.apply_filter())
+        filter_btn = tk.Button(filter_frame, text="Apply Filter", command=self.apply_filter, bg=ACCENT, fg="white", width=12)
+        filter_btn.pack(side="left", padx=6)
+        unfilter_btn = tk.Button(filter_frame, text="Clear Filter", command=self.clear_filter)
+        unfilter_btn.pack(side="left", padx=6)
+        self.filter_status = tk.Label(filter_frame, text='e.g. grade in (A,B) and exam < 50 and course = "Creative Computing"', bg=LIGHT_BG, fg="#555")
+        self.filter_status.pack(side="left", padx=6)
+        self.busy_widgets += [filter_entry, filter_btn, unfilter_btn]
+
+        browse_frame = tk.Frame(root, bg=LIGHT_BG)
+        browse_frame.pack(fill="x", padx=12, pady=(4,0))
+        tk.Label(browse_frame, text="Browse by:", bg=LIGHT_BG, font=("Arial", 11)).pack(side="left", padx=4)
+        self.browse_by = ttk.Combobox(browse_frame, state="readonly", width=14, values=[label for label, _ in EXTRA_KEYS.values()])
+        self.browse_by.current(0)
+        self.browse_by.pack(side="left", padx=6)
+        # values are listed from the index (with student counts) each time the list opens
+        self.browse_value = ttk.Combobox(browse_frame, state="readonly", width=40, postcommand=self.fill_browse_values)
+        self.browse_value.pack(side="left", padx=6)
+        self.browse_value.bind("<<ComboboxSelected>>", lambda e: self.apply_browse())
+        self.browse_by.bind("<<ComboboxSelected>>", lambda e: self.browse_value.set(""))
+        show_all_btn = tk.Button(browse_frame, text="Show All", command=self.clear_browse)
+        show_all_btn.pack(side="left", padx=6)
+        self.busy_widgets += [self.browse_by, self.browse_value, show_all_btn]
+
         key_frame = tk.Frame(root, bg=LIGHT_BG)
         key_frame.pack(fill="x", padx=12, pady=6)
         tk.Label(key_frame, text="Key:", bg=LIGHT_BG, font=("Arial", 10, "bold")).pack(side="left")
@@ -254,6 +670,7 @@ class StudentManager:
         for i,(label,cmd) in enumerate(actions):
             b = tk.Button(button_frame, text=label, command=cmd, **btn_conf)
             b.grid(row=0, column=i, padx=4, pady=4)
+            self.busy_widgets.append(b)
 
         sort_frame = tk.Frame(root, bg=LIGHT_BG)
         sort_frame.pack(fill="x", padx=12, pady=(4,0))
@@ -261,21 +678,71 @@ class StudentManager:
         self.sort_choice = ttk.Combobox(sort_frame, values=["Ascending", "Descending"], state="readonly", width=12)
         self.sort_choice.current(0)
         self.sort_choice.pack(side="left")
-        tk.Button(sort_frame, text="Sort", command=self.sort_records_from_dropdown, bg=ACCENT, fg="white").pack(side="left", padx=6)
+        sort_btn = tk.Button(sort_frame, text="Sort", command=self.sort_records_from_dropdown, bg=ACCENT, fg="white")
+        sort_btn.pack(side="left", padx=6)
+        self.busy_widgets += [self.sort_choice, sort_btn]
+        self.undo_btn = tk.Button(sort_frame, text="Undo", command=self.undo, state="disabled", width=8)
+        self.undo_btn.pack(side="left", padx=(18,4))
+        self.redo_btn = tk.Button(sort_frame, text="Redo", command=self.redo, state="disabled", width=8)
+        self.redo_btn.pack(side="left", padx=4)
+        tk.Label(sort_frame, text="Go to percentile:", bg=LIGHT_BG).pack(side="left", padx=(18,4))
+        self.pctl_var = tk.StringVar(value="90")
+        pctl_entry = tk.Entry(sort_frame, textvariable=self.pctl_var, width=6)
+        pctl_entry.pack(side="left")
+        pctl_entry.bind("<Return>", lambda e: self.goto_percentile())
+        pctl_btn = tk.Button(sort_frame, text="Go", command=self.goto_percentile)
+        pctl_btn.pack(side="left", padx=4)
+        self.busy_widgets += [pctl_entry, pctl_btn]
+        root.bind("<Control-z>", lambda e: self.undo())
+        root.bind("<Control-y>", lambda e: self.redo())
+        root.bind("<Control-Z>", lambda e: self.redo())
+
+        # workspace: one marks file per module/year, picked with the cohort selector
+        ws_btn = tk.Button(sort_frame, text="Open Workspace...", command=self.open_workspace)
+        ws_btn.pack(side="right", padx=6)
+        self.cohort_choice = ttk.Combobox(sort_frame, state="readonly", width=28)
+        self.cohort_choice.bind("<<ComboboxSelected>>", lambda e: self.switch_cohort(self.cohort_choice.get()))
+        self.cohort_label = tk.Label(sort_frame, text="Cohort:", bg=LIGHT_BG)
+        self.busy_widgets += [ws_btn, self.cohort_choice]
+        # not a busy widget: timings are worth watching while a load runs
+        tk.Button(sort_frame, text="Performance", command=self.show_performance).pack(side="right", padx=6)
+        tk.Button(sort_frame, text="Memory", command=self.show_memory).pack(side="right", padx=6)
+        history_btn = tk.Button(sort_frame, text="History...", command=self.show_history)
+        history_btn.pack(side="right", padx=6)
+        merge_btn = tk.Button(sort_frame, text="Merge Marks...", command=self.merge_marks)
+        merge_btn.pack(side="right", padx=6)
+        self.busy_widgets += [history_btn, merge_btn]
+        # read-only JSON API over this window's model for other tools (studentapi.py)
+        self.api_btn = tk.Button(sort_frame, text="Serve API", command=self.toggle_api)
+        self.api_btn.pack(side="right", padx=6)
+        self.api_server = None
+        self.perf_win = None
+        self.mem_win = None
+        self.stats_win = None
 
         self.table_frame = tk.Frame(root, bg=LIGHT_BG)
         self.table_frame.pack(padx=12, pady=(8,6), fill="both", expand=True)
 
-        cols = ("code","name","c1","c2","c3","exam","total","perc","grade")
+        cols = ("code","name","c1","c2","c3","exam","total","perc","grade","rank","percentile","cohort")
         self.tree = ttk.Treeview(self.table_frame, columns=cols, show="headings", selectmode="browse")
         for col in cols:
             self.tree.heading(col, text=col.title(), anchor="center", command=lambda _c=col: self.sort_by_column(_c))
             self.tree.column(col, anchor="center", width=100 if col!="name" else 260, minwidth=60)
+        # the cohort column is only shown once a workspace is open
+        self.tree["displaycolumns"] = cols[:-1]
         self.tree.pack(side="left", fill="both", expand=True)
 
         vsb = ttk.Scrollbar(self.table_frame, orient="vertical", command=self.tree.yview)
         vsb.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=vsb.set)
+        # stripes are painted on the rows in view, so scrolling paints the next ones
+        self.tree.configure(yscrollcommand=lambda first, last: (vsb.set(first, last), self.stripe_later()))
+        # row colours are configured once; rows only carry tag names
+        self.tree.tag_configure("even", background=ROW_EVEN)
+        self.tree.tag_configure("odd", background=ROW_ODD)
+        self.tree.tag_configure("top", background=HIGHEST_BG)
+        self.tree.tag_configure("low", background=LOWEST_BG)
+        self.tree.tag_configure("summary", background=HEADER_BG, font=("Arial",10,"bold"))
+        self.table = TreeReconciler(self.tree, stripes=("even", "odd"))
 
         style = ttk.Style()
         style.theme_use("clam")
@@ -295,124 +762,672 @@ class StudentManager:
             val.grid(row=1+i, column=1, sticky="w", pady=2)
             self.details_widgets[label.lower()] = val
 
-        self.view_all()
+        # status bar: load progress
+        self.status_frame = tk.Frame(root, bg=LIGHT_BG)
+        self.status_frame.pack(fill="x", padx=12, pady=(0,8))
+        self.status_label = tk.Label(self.status_frame, text="", bg=LIGHT_BG, anchor="w")
+        self.status_label.pack(side="left")
+        self.progress = ttk.Progressbar(self.status_frame, orient="horizontal", mode="determinate", maximum=100, length=320)
+        # exports and other slow work run as background jobs, one row each at the right of the status bar
+        self.jobs = JobRunner()
+        self.job_frame = tk.Frame(self.status_frame, bg=LIGHT_BG)
+        self.job_frame.pack(side="right")
+        self.job_rows = {}
+        self._job_polling = False
+
         self._col_sort_reverse = {}
 
-    def load_data(self):
-        if not os.path.exists(MARKS_FILE):
-            messagebox.showwarning("Missing", f"{MARKS_FILE} not found. Starting with empty dataset.")
-            return []
-        students = []
+        # pick up edits made to the data files by other programs; the
+        # watchers remember the files as they are now and start polling
+        # once the first load has finished
+        self.marks_watcher = FileWatcher(self.marks_file, read_marks_locked)
+        self.extra_watcher = FileWatcher(self.extra_file, read_extra_file)
+        self.grading_watcher = FileWatcher(GRADING_FILE, read_grading_config)
+        root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.start_loading()
+
+    def on_close(self):
+        if self.jobs.busy:
+            if not messagebox.askyesno("Jobs running", f"{len(self.jobs.jobs)} background job(s) have not finished. Cancel them and quit?"):
+                return
+            self.jobs.shutdown()
+        if self.api_server is not None:
+            self.api_server.stop()
+        # let queued snapshot versions reach the disk before exiting
+        if self.snapshots is not None:
+            self.snapshots.flush()
+        if self.workspace is not None:
+            self.workspace.shutdown()
+        self.root.destroy()
+
+    def run_job(self, title, fn, on_done=None, on_error=None):
+        """Run fn(job) in the background with a row in the job bar; callbacks run on the Tk thread."""
+        job = self.jobs.submit(title, fn, on_done, on_error)
+        if not self._job_polling:
+            self._job_polling = True
+            self.root.after(JOB_POLL_MS, self.poll_jobs)
+        return job
+
+    def poll_jobs(self):
+        for job in self.jobs.poll():
+            self.show_job(job)
+            if job.state == CANCELLED:
+                self.status_label.config(text=f"Cancelled: {job.title}")
+        if self.jobs.busy:
+            self.root.after(JOB_POLL_MS, self.poll_jobs)
+        else:
+            self._job_polling = False
+
+    def show_job(self, job):
+        row = self.job_rows.get(job.id)
+        if job.finished or job not in self.jobs.jobs:
+            if row is not None:
+                row[0].destroy()
+                del self.job_rows[job.id]
+            return
+        if row is None:
+            frame = tk.Frame(self.job_frame, bg=LIGHT_BG)
+            frame.pack(side="left", padx=(12,0))
+            label = tk.Label(frame, bg=LIGHT_BG)
+            label.pack(side="left")
+            bar = ttk.Progressbar(frame, orient="horizontal", mode="determinate", maximum=100, length=120)
+            bar.pack(side="left", padx=4)
+            tk.Button(frame, text="Cancel", command=job.cancel).pack(side="left")
+            row = self.job_rows[job.id] = (frame, label, bar)
+        _, label, bar = row
+        label.config(text=f"{job.title}: queued" if job.state == QUEUED else f"{job.title}: {job.percent:.0f}%")
+        bar["value"] = job.percent
+
+    def toggle_api(self):
+        if self.api_server is not None:
+            self.api_server.stop()
+            self.api_server = None
+            self.api_btn.config(text="Serve API")
+            self.status_label.config(text="API server stopped.")
+            return
+        service = StudentService(self.model, self.name_index, self.aggregates, self.ranks, self.extra_index)
         try:
-            with open(MARKS_FILE, "r") as f:
-                lines = [l.strip() for l in f.readlines() if l.strip()]
-            if not lines:
-                return []
+            self.api_server = StudentApiServer(service).start_in_thread()
+        except OSError as e:
+            messagebox.showerror("API", f"Could not start the API server: {e}")
+            return
+        self.api_btn.config(text="Stop API")
+        self.status_label.config(text=f"Serving student records on {self.api_server.address}")
+
+    def open_workspace(self):
+        directory = filedialog.askdirectory(title="Open workspace (folder of marks files)")
+        if not directory:
+            return
+        ws = Workspace(directory)
+        if not ws.cohorts:
+            messagebox.showwarning("Workspace", "No marks files (*.txt) found in that folder.")
+            return
+        if not self.confirm_discard(ws.cohorts[0]):
+            return
+        if self.workspace is not None:
+            self.workspace.shutdown()
+        self.workspace = ws
+        self.cohort_choice.config(values=ws.cohorts)
+        self.cohort_label.pack(side="right")
+        self.cohort_choice.pack(side="right", padx=6, before=self.cohort_label)
+        self.tree["displaycolumns"] = self.tree["columns"]
+        self.cohort_choice.set(ws.cohorts[0])
+        self.switch_cohort(ws.cohorts[0])
+
+    def confirm_discard(self, cohort):
+        """Ask before leaving changes that are not saved (after a save ended in conflicts)."""
+        if not self.sync.base:
+            return True
+        return messagebox.askyesno("Unsaved changes", f"{len(self.sync.base)} changes to "
+                                   f"{os.path.basename(self.marks_file)} have not been saved "
+                                   "(they conflict with changes made in another instance).\n"
+                                   f"Switch to {cohort} and discard them?")
+
+    def switch_cohort(self, cohort):
+        """Make another workspace cohort the active data set (parsed on first use)."""
+        if self.workspace is None or self.loading or cohort not in self.workspace.paths:
+            return
+        if cohort != self.active_cohort and not self.confirm_discard(cohort):
+            self.cohort_choice.set(self.active_cohort)
+            return
+        self.marks_watcher.stop()
+        self.extra_watcher.stop()
+        self.active_cohort = cohort
+        self.marks_file = self.workspace.paths[cohort]
+        self.extra_file = extra_path_for(self.marks_file)
+        self.marks_watcher = FileWatcher(self.marks_file, read_marks_locked)
+        self.extra_watcher = FileWatcher(self.extra_file, read_extra_file)
+        self._single_code = None
+        self.table.clear()
+        # warm up the next few cohorts concurrently so flicking through is instant
+        names = self.workspace.cohorts
+        i = names.index(cohort)
+        self.workspace.prefetch(names[i + 1:i + 1 + PREFETCH_COHORTS])
+        self.start_loading()
+
+    @property
+    def students(self):
+        return self.model.students
+
+    @property
+    def extra(self):
+        return self.model.extra
+
+    @extra.setter
+    def extra(self, extra):
+        self.model.reset_extra(extra)
+
+    def update_undo_buttons(self):
+        if self.loading:
+            return
+        label = self.history.undo_label()
+        self.undo_btn.config(state="normal" if label else "disabled", text=f"Undo {label}" if label else "Undo", width=0 if label else 8)
+        label = self.history.redo_label()
+        self.redo_btn.config(state="normal" if label else "disabled", text=f"Redo {label}" if label else "Redo", width=0 if label else 8)
+
+    def undo(self):
+        self.step_history(self.history.undo, "undo", "Undid")
+
+    def redo(self):
+        self.step_history(self.history.redo, "redo", "Redid")
+
+    def step_history(self, step, action, verb):
+        if self.loading:
+            return
+        try:
+            label = step()
+        except (KeyError, ValueError) as e:
+            # the data moved on underneath (e.g. the file was edited elsewhere);
+            # EditHistory reversed the part of the step it had applied, so the
+            # records are as before and only the table has to catch up
+            self.history.clear()
+            self.refresh_view()
+            messagebox.showerror(action.title(), f"Cannot {action} that step any more: {e}")
+            label = None
+        if label is not None:
+            self.save_data()
+            self.refresh_view()
+            self.status_label.config(text=f"{verb}: {label}")
+        self.update_undo_buttons()
+
+    def set_busy(self, busy):
+        self.loading = busy
+        for w in self.busy_widgets:
+            if isinstance(w, ttk.Combobox):
+                w.config(state="disabled" if busy else "readonly")
+            else:
+                w.config(state="disabled" if busy else "normal")
+        if busy:
+            self.undo_btn.config(state="disabled")
+            self.redo_btn.config(state="disabled")
+        else:
+            self.update_undo_buttons()
+
+    def open_snapshots(self):
+        directory = snapshot_dir_for(self.marks_file)
+        if self.snapshots is not None:
+            if self.snapshots.directory == directory:
+                return
+            self.model.unsubscribe(self.snapshots)
+        self.snapshots = self.model.subscribe(SnapshotStore(directory))
+
+    def start_loading(self, restore_version=None):
+        """Load the data files on a background thread, or rebuild a snapshot version."""
+        self.open_snapshots()
+        self.set_busy(True)
+        self.status_label.config(text="Loading student records...")
+        self.progress["value"] = 0
+        self.progress.pack(side="left", padx=8)
+        self._load_started = time.perf_counter()
+        self._load_queue = queue.Queue()
+        threading.Thread(target=self._load_worker, args=(restore_version,), daemon=True).start()
+        self.root.after(LOAD_POLL_MS, self.poll_loading)
+
+    def _load_worker(self, restore_version=None):
+        # runs off the Tk thread: only talks to the UI through the queue
+        q = self._load_queue
+        def progress(done, size):
+            q.put(("progress", 90 * done / size if size else 90, f"Reading marks... {done // 1024} KB"))
+        if restore_version is not None:
+            q.put(("progress", 30, f"Rebuilding version {restore_version}..."))
+            try:
+                students, extra = self.snapshots.restore(restore_version)
+                problem = None
+            except Exception as e:
+                students, extra = list(self.students), self.extra
+                problem = ("error", f"Could not restore version {restore_version}: {e}")
+                restore_version = None
+            q.put(("progress", 92, "Grading and indexing..."))
+            self.model.reset(students)
+            self.model.reset_extra(extra)
+            q.put(("done", problem, restore_version))
+            return
+        try:
+            # a shared lock: other instances cannot be half way through a save while we read
+            with locked(self.marks_file, exclusive=False):
+                signature = files_signature(self.marks_file, self.extra_file)
+                version = read_version(self.marks_file)
+                marks_signature = file_signature(self.marks_file)
+                students, problem = self.load_data(progress)
+            q.put(("progress", 92, "Grading and indexing..."))
+            # the UI is busy until "done" arrives, so nothing else touches the
+            # model while it grades and rebuilds its indexes here
+            self.model.reset(students)
+            self.sync.loaded(version, marks_signature)
+            q.put(("progress", 95, "Reading extra details..."))
+            self.model.reset_extra(load_extra(self.extra_file))
+            # after the extras: replacing them would make the next version a full one
+            self.snapshots.prime(self.students, signature)
+        except Exception as e:
+            # "done" must always arrive, or the window stays busy for good
+            problem = ("error", f"Failed to load: {e}")
+        q.put(("done", problem, None))
+
+    def poll_loading(self):
+        msg = None
+        while True:
+            try:
+                msg = self._load_queue.get_nowait()
+            except queue.Empty:
+                break
+            if msg[0] == "done":
+                break
+            self.progress["value"] = msg[1]
+            self.status_label.config(text=msg[2])
+        if not msg or msg[0] != "done":
+            self.root.after(LOAD_POLL_MS, self.poll_loading)
+            return
+        _, problem, restored = msg
+        PERF.record("load_data", (time.perf_counter() - self._load_started) * 1000)
+        self.progress.pack_forget()
+        cohort = f" ({self.active_cohort})" if self.active_cohort else ""
+        self.status_label.config(text=f"Loaded {len(self.students)} students{cohort}.")
+        self.set_busy(False)
+        self.mem_checkpoint("after load", force=True)
+        if restored is not None:
+            # the restored data becomes the newest version (history is never rewritten)
+            # and replaces what is in the file rather than being merged with it
+            self.save_data(force=True)
+            self.status_label.config(text=f"Restored version {restored}: {len(self.students)} students{cohort}.")
+        self.view_all()
+        if problem:
+            kind, text = problem
+            if kind == "warning":
+                messagebox.showwarning("Missing", text)
+            else:
+                messagebox.showerror("Error", text)
+        self.marks_watcher.start()
+        self.extra_watcher.start()
+        self.grading_watcher.start()
+        if not self._watch_polling:
+            self._watch_polling = True
+            self.root.after(WATCH_POLL_MS, self.poll_file_watchers)
+
+    def load_data(self, progress=None):
+        """Parse the marks file. Called on the loader thread, so problems are returned, not shown."""
+        if not os.path.exists(self.marks_file):
+            return [], ("warning", f"{self.marks_file} not found. Starting with empty dataset.")
+        try:
+            if self.workspace is not None:
+                # parsed in the workspace pool (possibly already prefetched)
+                return self.workspace.records(self.active_cohort), None
             # expecting first line = number of students, rest lines = records
-            for line in lines[1:]:
-                parts = [p.strip() for p in line.split(",")]
-                if len(parts) < 6:
-                    continue
-                try:
-                    students.append({
-                        "code": parts[0],
-                        "name": parts[1],
-                        "c1": int(parts[2]),
-                        "c2": int(parts[3]),
-                        "c3": int(parts[4]),
-                        "exam": int(parts[5])
-                    })
-                except:
-                    continue
+            return read_marks(self.marks_file, progress), None
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to read marks file: {e}")
-        return students
+            return [], ("error", f"Failed to read marks file: {e}")
 
-    def save_data(self):
-        # write file with count on first line (keeps same format)
+    @timed("save_data")
+    def save_data(self, force=False):
         try:
-            with open(MARKS_FILE, "w") as f:
-                f.write(f"{len(self.students)}\n")
-                for s in self.students:
-                    f.write(f"{s['code']},{s['name']},{s['c1']},{s['c2']},{s['c3']},{s['exam']}\n")
-            # ensure extra file is also saved
-            save_extra(self.extra)
+            # merges in what other instances saved since we last read the file
+            merged = self.sync.save(self.marks_file, force)
+            if not merged.conflicts:
+                # ensure extra file is also saved
+                with locked(self.extra_file):
+                    save_extra(self.extra, self.extra_file)
         except Exception as e:
             messagebox.showerror("Error", f"Failed saving to file: {e}")
+            return
+        if merged.conflicts:
+            self.after_merge(merged.applied)
+            self.show_conflicts(merged.conflicts)
+            return
+        if self.after_merge(merged.applied):
+            self.status_label.config(text=f"Saved, including {self.change_count(merged.applied)} changes made in another instance.")
+        # our own writes should not come back through the watchers
+        self.marks_watcher.mark_seen()
+        self.extra_watcher.mark_seen()
+        error = self.snapshots.take_error()
+        if error is not None:
+            # the store starts again from a full version, so this save is recorded in full
+            messagebox.showwarning("History", f"An earlier backup version could not be written: {error}\n"
+                                   "This save is recorded as a full version.")
+        try:
+            self.snapshots.record(self.students, self.model.by_code, self.extra, self.marks_file, self.extra_file)
+        except Exception as e:
+            messagebox.showwarning("History", f"Saved, but the backup version could not be recorded: {e}")
+
+    def poll_file_watchers(self):
+        if self.loading:
+            # the loader thread owns the model until it is done
+            self.root.after(WATCH_POLL_MS, self.poll_file_watchers)
+            return
+        result = self.marks_watcher.drain()
+        if result and result[0] is None:
+            self.merge_external(result[1])
+        result = self.extra_watcher.drain()
+        if result and result[0] is None:
+            self.extra = result[1]
+            self.history.clear()
+            self.update_undo_buttons()
+            if self._single_code in self.model.by_code:
+                self.show_details(self._single_code)
+        result = self.grading_watcher.drain()
+        if result and result[0] is None:
+            self.apply_grading_config(result[1])
+        self.root.after(WATCH_POLL_MS, self.poll_file_watchers)
+
+    def apply_grading_config(self, config):
+        try:
+            self.grader.configure(config)
+        except Exception as e:
+            messagebox.showerror("Grading", f"Ignoring invalid grading config: {e}")
+            return
+        self.model.regrade()
+        self.refresh_view()
+
+    def refresh_view(self):
+        # redraw whatever the table is showing after the data underneath changed
+        if self._view_mode == "all":
+            self.view_all()
+        elif self._single_code in self.model.by_code:
+            self.display_single(self.model.get(self._single_code))
+        else:
+            self.table.clear()
+
+    def merge_external(self, theirs):
+        """Merge records another program saved; unsaved edits here are kept."""
+        merged = self.sync.merge(theirs)
+        self.after_merge(merged.applied)
+        if merged.conflicts:
+            self.status_label.config(text=f"{len(merged.conflicts)} records were also changed elsewhere; you will be asked which to keep when saving.")
+
+    def change_count(self, diff):
+        return len(diff.added) + len(diff.removed) + len(diff.changed)
+
+    def after_merge(self, diff):
+        """Refresh after changes from the file were applied; the reconciler only touches affected rows."""
+        if not self.change_count(diff):
+            return False
+        # steps recorded against the old records may no longer apply
+        self.history.clear()
+        self.update_undo_buttons()
+        self.refresh_view()
+        return True
+
+    def show_conflicts(self, conflicts):
+        """Ask which side wins for records changed both here and in another instance, then save."""
+        win = tk.Toplevel(self.root)
+        win.title("Save Conflicts")
+        set_app_icon(win)
+        win.transient(self.root)
+        tk.Label(win, text=f"{len(conflicts)} records were changed here and in another instance since the file was loaded.\n"
+                 "Choose which version to keep (double-click a row to switch), then save.", justify="left").pack(padx=10, pady=8, anchor="w")
+        cols = ("code", "original", "mine", "theirs", "keep")
+        tv = ttk.Treeview(win, columns=cols, show="headings", height=14)
+        for col in cols:
+            tv.heading(col, text=col.title())
+            tv.column(col, width=70 if col in ("code", "keep") else 250, anchor="w")
+        tv.pack(fill="both", expand=True, padx=10)
+        def fmt(row):
+            return "(deleted)" if row is None else f"{row[0]}: {row[1]}/{row[2]}/{row[3]}/{row[4]}"
+        by_code = {}
+        for c in conflicts:
+            by_code[c.code] = c
+            tv.insert("", "end", iid=c.code, values=(c.code, fmt(c.base), fmt(c.mine), fmt(c.theirs), "mine"))
+        def choose(side, iids):
+            for iid in iids:
+                tv.set(iid, "keep", side)
+        def toggle(event):
+            iid = tv.identify_row(event.y)
+            if iid:
+                choose("theirs" if tv.set(iid, "keep") == "mine" else "mine", [iid])
+        tv.bind("<Double-1>", toggle)
+        def save():
+            take_theirs = {iid for iid in tv.get_children() if tv.set(iid, "keep") == "theirs"}
+            win.destroy()
+            self.sync.resolve(list(by_code.values()), take_theirs)
+            if take_theirs:
+                # records taken from the other instance changed under the undo steps
+                self.history.clear()
+                self.update_undo_buttons()
+            # someone may have saved again meanwhile: this merges and can ask again
+            self.save_data()
+            self.refresh_view()
+        btns = tk.Frame(win)
+        btns.pack(fill="x", padx=10, pady=8)
+        tk.Button(btns, text="All Mine", command=lambda: choose("mine", tv.get_children())).pack(side="left", padx=4)
+        tk.Button(btns, text="All Theirs", command=lambda: choose("theirs", tv.get_children())).pack(side="left", padx=4)
+        tk.Button(btns, text="Save", command=save, bg=ACCENT, fg="white", width=12).pack(side="right", padx=4)
+        tk.Button(btns, text="Cancel", command=win.destroy).pack(side="right", padx=4)
 
     def clear_table(self):
-        for r in self.tree.get_children():
-            self.tree.delete(r)
+        self.table.clear()
 
     def calc_total_perc_grade(self, s):
-        total_course = s["c1"] + s["c2"] + s["c3"]
-        total = total_course + s["exam"]
-        perc = (total / 160) * 100
-        grade = self.get_grade(perc)
-        return total_course, total, perc, grade
+        # total/perc/grade are cached on the record by the grading engine
+        return s["c1"] + s["c2"] + s["c3"], s["total"], s["perc"], s["grade"]
+
+    def check_marks(self, marks):
+        # limits come from the grading config, as for merged files (marksmerge)
+        for field in MARK_FIELDS:
+            limit = self.grader.max_marks[field]
+            if not 0 <= marks[field] <= limit:
+                raise ValueError(f"{field.title()} must be 0-{limit}")
 
     def get_grade(self, perc):
-        if perc >= 70: return "A"
-        elif perc >= 60: return "B"
-        elif perc >= 50: return "C"
-        elif perc >= 40: return "D"
-        else: return "F"
+        return self.grader.grade(perc)
 
-    def insert_row(self, s, tag=None):
+    def row_values(self, s, rank_columns=None):
+        # rank_columns (from RankIndex.rank_columns) is passed when drawing many rows
         total_course, total, perc, grade = self.calc_total_perc_grade(s)
-        values = (s["code"], s["name"], s["c1"], s["c2"], s["c3"], s["exam"], total, f"{perc:.2f}", grade)
-        # ensure iid is string
-        self.tree.insert("", "end", values=values, tags=(tag if tag else ""), iid=str(s["code"]))
+        if rank_columns is not None:
+            rank, pctl = rank_columns(s)
+        else:
+            rank, pctl = self.ranks.rank(perc), self.ranks.percentile(perc)
+        return (s["code"], s["name"], s["c1"], s["c2"], s["c3"], s["exam"], total, f"{perc:.2f}", grade, rank, f"{pctl:.1f}", self.active_cohort)
+
+    def visible_students(self):
+        # the records the table shows: everything, or those in the browsed
+        # course/year/domain that match the active filter
+        students = self.students
+        if self.browse is not None:
+            # codes come from the index and are put in table order by position
+            students = self.model.in_order(self.extra_index.codes(*self.browse))
+        if self.query is None:
+            return students
+        return self.query.filter(students, self.extra)
+
+    def browse_name(self):
+        label = self.browse_by.get()
+        return next(name for name, (l, _) in EXTRA_KEYS.items() if l == label)
+
+    def fill_browse_values(self):
+        self.browse_value["values"] = [f"{key} ({n})" for key, n in self.extra_index.keys(self.browse_name())]
+
+    @timed("browse")
+    def apply_browse(self):
+        picked = self.browse_value.get()
+        if not picked:
+            return
+        # strip the "(count)" suffix added by fill_browse_values
+        self.browse = (self.browse_name(), picked.rsplit(" (", 1)[0])
+        count = len(self.visible_students())
+        self.status_label.config(text=f"{self.browse_by.get()} {self.browse[1]}: {count} students shown.")
+        self.view_all()
+        if self.stats_win is not None:
+            self.stats_win.dirty = True
 
-    def view_all(self):
-        self.clear_table()
-        if not self.students:
+    def clear_browse(self):
+        self.browse = None
+        self.browse_value.set("")
+        self.view_all()
+        if self.stats_win is not None:
+            self.stats_win.dirty = True
+
+    @timed("apply_filter")
+    def apply_filter(self):
+        text = self.filter_var.get().strip()
+        if not text:
+            self.clear_filter()
             return
-        # Handle case where students list is empty before trying to find min/max
-        if not self.students:
-            avg = 0
-            self.tree.insert("", "end", values=("", "Summary", "", "", "", "", "", f"Average: {avg:.2f}%", f"Students: {len(self.students)}"), tags=("summary",))
+        try:
+            query = CompiledQuery(text)
+        except QueryError as e:
+            messagebox.showerror("Filter", str(e))
             return
+        self.query = query
+        start = time.perf_counter()
+        count = len(self.visible_students())
+        elapsed = (time.perf_counter() - start) * 1000
+        self.filter_status.config(text=f"{count} of {len(self.students)} students match ({elapsed:.0f} ms)")
+        self.view_all()
+        if self.stats_win is not None:
+            self.stats_win.dirty = True
 
-        top_student = max(self.students, key=lambda x: x["c1"]+x["c2"]+x["c3"]+x["exam"])
-        low_student = min(self.students, key=lambda x: x["c1"]+x["c2"]+x["c3"]+x["exam"])
-        total_perc = 0
-        for i, s in enumerate(self.students):
-            total_course, total, perc, grade = self.calc_total_perc_grade(s)
-            total_perc += perc
-            if s == top_student:
-                tag = "top"
-            elif s == low_student:
-                tag = "low"
-            else:
-                tag = "even" if i%2==0 else "odd"
-            self.insert_row(s, tag)
-        self.tree.tag_configure("even", background=ROW_EVEN)
-        self.tree.tag_configure("odd", background=ROW_ODD)
-        self.tree.tag_configure("top", background=HIGHEST_BG)
-        self.tree.tag_configure("low", background=LOWEST_BG)
-        avg = total_perc / len(self.students)
-        # show a blank line and summary at end
-        self.tree.insert("", "end", values=("", "", "", "", "", "", "", "", ""))
-        self.tree.insert("", "end", values=("", "Summary", "", "", "", "", "", f"Average: {avg:.2f}%", f"Students: {len(self.students)}"), tags=("summary",))
-        self.tree.tag_configure("summary", background=HEADER_BG, font=("Arial",10,"bold"))
+    def clear_filter(self):
+        self.filter_var.set("")
+        self.query = None
+        self.filter_status.config(text="")
+        self.view_all()
+        if self.stats_win is not None:
+            self.stats_win.dirty = True
+
+    def top_low(self, students=None):
+        students = self.students if students is None else students
+        top_student = max(students, key=itemgetter("total"))
+        low_student = min(students, key=itemgetter("total"))
+        return top_student, low_student
+
+    def row_tag(self, s, top_student, low_student):
+        if s is top_student:
+            return ("top",)
+        elif s is low_student:
+            return ("low",)
+        # even/odd depend on position, so the reconciler paints them on the rows in view
+        return ()
+
+    def cached_row(self, s, rank_columns):
+        row = self._row_cache.get(s["code"])
+        if row is None:
+            row = self._row_cache[s["code"]] = self.row_values(s, rank_columns)
+        return row
+
+    def stripe_later(self):
+        if not self._stripe_pending:
+            self._stripe_pending = True
+            self.root.after_idle(self.paint_stripes)
+
+    def paint_stripes(self):
+        self._stripe_pending = False
+        first, last = self.tree.yview()
+        self.table.paint(first, last)
+
+    def summary_values(self, students=None):
+        if students is None or students is self.students:
+            students = self.students
+            avg = self.model.average_perc()
+        else:
+            avg = sum(s["perc"] for s in students) / len(students) if students else 0
+        return ("", "Summary", "", "", "", "", "", f"Average: {avg:.2f}%", f"Students: {len(students)}", "", "", "")
+
+    @timed("view_all")
+    def view_all(self):
+        # row values are cached per record and rebuilt only for the records the
+        # model reported changed, or whose rank moved. When the table already
+        # shows every record in model order only those rows go to Tk; otherwise
+        # the reconciler diffs the whole list and sends only the differences
+        self._view_mode = "all"
+        self._single_code = None
         for k in self.details_widgets:
             self.details_widgets[k].config(text="")
+        changed, removed, moved = self.row_changes.take()
+        cache = self._row_cache
+        if changed is None:
+            cache.clear()
+        else:
+            for code in changed:
+                cache.pop(code, None)
+        rank_columns = self.ranks.rank_columns()
+        if self._rank_version != self.ranks.version:
+            # an edited percentage moves the rank of everyone between its old and new value
+            self._rank_version = self.ranks.version
+            by_code = self.model.by_code
+            for code, values in cache.items():
+                rank, pctl = rank_columns(by_code[code])
+                pctl = f"{pctl:.1f}"
+                if values[9] != rank or values[10] != pctl:
+                    # only the rank and percentile columns move
+                    cache[code] = values[:9] + (rank, pctl) + values[11:]
+                    changed.add(code)
+        students = self.visible_students()
+        if not students:
+            self.table.clear()
+            self._shown = None
+            return
+        top_student, low_student = self.top_low(students)
+        summary = ("__summary__", self.summary_values(students), ("summary",))
+        shown = self._shown
+        if (changed is not None and not moved and self.query is None and self.browse is None
+                and shown is not None and shown[0] is self.table.order):
+            by_code = self.model.by_code
+            self.table.remove(removed)
+            codes = changed | {shown[1], shown[2], top_student["code"], low_student["code"]}
+            rows = [(code, self.cached_row(by_code[code], rank_columns), self.row_tag(by_code[code], top_student, low_student))
+                    for code in codes if code in by_code]
+            rows.append(summary)
+            self.table.update(rows)
+        else:
+            rows = [(str(s["code"]), self.cached_row(s, rank_columns), self.row_tag(s, top_student, low_student))
+                    for s in students]
+            # show a blank line and summary at end
+            rows.append(("__blank__", ("",) * len(rows[0][1]), ("blank",)))
+            rows.append(summary)
+            self.table.sync(rows)
+        self._shown = (self.table.order, top_student["code"], low_student["code"])
+        self.stripe_later()
+        self.mem_checkpoint("after view_all")
+
+    def goto_percentile(self):
+        try:
+            p = float(self.pctl_var.get())
+            if not 0 <= p <= 100:
+                raise ValueError
+        except ValueError:
+            messagebox.showwarning("Percentile", "Enter a percentile between 0 and 100.")
+            return
+        code = self.ranks.code_at_percentile(p)
+        if code is None:
+            messagebox.showinfo("No data", "No students loaded.")
+            return
+        s = self.model.get(code)
+        self.display_single(s)
+        self.status_label.config(text=f"{p:g}th percentile: {s['name']} ({s['perc']:.2f}%, rank {self.ranks.rank(s['perc'])} of {len(self.students)})")
 
     def display_single(self, s):
         # show just this student's row in table and populate details pane
-        self.clear_table()
-        self.insert_row(s)
-        # Ensure tags are configured even for single row view
-        self.tree.tag_configure("even", background=ROW_EVEN)
-        self.tree.tag_configure("odd", background=ROW_ODD)
-        self.tree.tag_configure("top", background=HIGHEST_BG)
-        self.tree.tag_configure("low", background=LOWEST_BG)
-        extras = self.extra.get(s["code"], {})
+        self._view_mode = "single"
+        self._single_code = s["code"]
+        self.table.sync([(str(s["code"]), self.row_values(s), ())])
+        self.show_details(s["code"])
+
+    def show_details(self, code):
+        extras = self.extra.get(code, {})
         self.details_widgets["email"].config(text=extras.get("email",""))
         self.details_widgets["dob"].config(text=extras.get("dob",""))
         self.details_widgets["course"].config(text=extras.get("course",""))
 
+    @timed("view_individual")
     def view_individual(self):
         if not self.students:
             messagebox.showerror("Error", "No students loaded.")
@@ -452,23 +1467,29 @@ class StudentManager:
         listbox = tk.Listbox(search_frame, width=50, height=8) # Increased height
         listbox.pack(pady=4, fill="x")
 
-        def update_listbox(event=None):
-            typed = search_var.get().strip().lower()
+        def render_page(rows):
             listbox.delete(0, tk.END)
-            if not typed:
-                # Show all students if search is empty
-                matches = [f"{s['code']} - {s['name']}" for s in self.students]
-            else:
-                matches = [f"{s['code']} - {s['name']}" for s in self.students if typed in s['name'].lower() or typed in s['code'].lower()]
-
-            for m in matches:
-                listbox.insert(tk.END, m)
-
-            if matches:
+            if rows:
+                listbox.insert(tk.END, *[f"{s['code']} - {s['name']}" for s in rows])
                 listbox.selection_clear(0, tk.END)
                 listbox.selection_set(0) # Select the first result
                 listbox.see(0) # Ensure the first item is visible
 
+        pager = ResultPager(search_frame, render_page)
+        pager.frame.pack(fill="x")
+        pager.bind_keys(search_entry, listbox)
+
+        def update_listbox(event=None):
+            if event is not None and event.keysym in PAGING_KEYS:
+                return
+            typed = search_var.get().strip().lower()
+            if not typed:
+                # Show all students if search is empty (paged straight off the model)
+                pager.set_results(self.students)
+            else:
+                matches = self.find_students(typed, MATCH_LIMIT)
+                pager.set_results(matches, capped=len(matches) >= MATCH_LIMIT)
+
         search_entry.bind("<KeyRelease>", update_listbox)
         update_listbox() # Populate initially
 
@@ -487,7 +1508,7 @@ class StudentManager:
             student_code = code_name_parts[0].strip()
 
             # Find the student dictionary using the code
-            selected_student = next((s for s in self.students if s["code"] == student_code), None)
+            selected_student = self.model.get(student_code)
 
             if selected_student:
                 self.display_single(selected_student)
@@ -503,35 +1524,50 @@ class StudentManager:
         tk.Button(top, text="View Selected", command=select_student, bg=ACCENT, fg="white", width=18).pack(pady=8)
 
 
+    @timed("highest")
     def highest(self):
         if not self.students:
             messagebox.showerror("Error", "No students loaded.")
             return
-        stu = max(self.students, key=lambda s: s["c1"]+s["c2"]+s["c3"]+s["exam"])
+        stu = max(self.students, key=itemgetter("total"))
         self.display_single(stu)
 
+    @timed("lowest")
     def lowest(self):
         if not self.students:
             messagebox.showerror("Error", "No students loaded.")
             return
-        stu = min(self.students, key=lambda s: s["c1"]+s["c2"]+s["c3"]+s["exam"])
+        stu = min(self.students, key=itemgetter("total"))
         self.display_single(stu)
 
-    def update_suggestions(self, event):
-        typed = self.search_var.get().strip().lower()
-        # show inline suggestions (like Google) in the listbox under the input
+    def find_students(self, query, limit=SEARCH_LIMIT):
+        """Ranked, typo tolerant matches for a code or name (best first)."""
+        q = query.strip()
+        # suggestions fill the box with "code - name"; the code part is exact
+        code = q.split(" - ", 1)[0].strip()
+        if code in self.model.by_code:
+            return [self.model.get(code)]
+        return [self.model.get(c) for _, c in self.name_index.search(q, limit)]
+
+    def show_suggestions(self, matches):
         self.listbox.delete(0, tk.END)
-        if not typed:
-            self.listbox.grid_remove()
-            return
-        matches = [f"{s['code']} - {s['name']}" for s in self.students if typed in s['name'].lower() or typed in s['code'].lower()]
-        for m in matches[:20]:
-            self.listbox.insert(tk.END, m)
+        for s in matches:
+            self.listbox.insert(tk.END, f"{s['code']} - {s['name']}")
         if matches:
             self.listbox.grid()
         else:
             self.listbox.grid_remove()
 
+    @timed("update_suggestions")
+    def update_suggestions(self, event):
+        typed = self.search_var.get().strip().lower()
+        # show inline suggestions (like Google) in the listbox under the input
+        if not typed:
+            self.show_suggestions([])
+            return
+        self.show_suggestions(self.find_students(typed, SUGGESTION_LIMIT))
+
+    @timed("select_suggestion")
     def select_suggestion(self, event):
         if not self.listbox.curselection():
             return
@@ -541,6 +1577,7 @@ class StudentManager:
         # hide suggestions; user can press Search to display
         self.listbox.grid_remove()
 
+    @timed("search_student")
     def search_student(self):
         q = self.search_var.get().strip().lower()
         # hide suggestions after search
@@ -548,13 +1585,19 @@ class StudentManager:
         if not q:
             messagebox.showwarning("Empty", "Enter name or code to search.")
             return
-        # we allow searching by "code - name" or part of name/code
-        found = [s for s in self.students if q in s["name"].lower() or q in s["code"].lower() or q in f"{s['code']} - {s['name']}".lower()]
+        # we allow searching by "code - name", code, or (misspelt) name
+        found = self.find_students(q)
         if not found:
             messagebox.showinfo("Not found", "No matching student.")
             return
-        self.display_single(found[0])
+        exact = [s for s in found if s["name"].lower() == q]
+        if len(found) == 1 or len(exact) == 1:
+            self.display_single(found[0] if len(found) == 1 else exact[0])
+            return
+        # ambiguous: offer the ranked matches instead of guessing
+        self.show_suggestions(found[:SUGGESTION_LIMIT])
 
+    @timed("clear_search")
     def clear_search(self):
         self.search_var.set("")
         self.listbox.grid_remove()
@@ -563,24 +1606,31 @@ class StudentManager:
     def sort_records_from_dropdown(self):
         choice = self.sort_choice.get()
         reverse = False if choice == "Ascending" else True
-        self.students.sort(key=lambda s: s["c1"]+s["c2"]+s["c3"]+s["exam"], reverse=reverse)
+        self.model.sort(key=itemgetter("total"), reverse=reverse)
         self.view_all()
 
+    @timed("sort_by_column")
     def sort_by_column(self, col):
         # called when clicking on column header; toggles sort
+        if self.loading:
+            return
         reverse = self._col_sort_reverse.get(col, False)
-        if col in ("c1","c2","c3","exam","total","perc"):
-            if col in ("total","perc"):
-                self.students.sort(key=lambda s: s["c1"]+s["c2"]+s["c3"]+s["exam"], reverse=not reverse)
+        if col in ("c1","c2","c3","exam","total","perc","rank","percentile"):
+            if col == "rank":
+                # rank 1 is the highest total
+                self.model.sort(key=itemgetter("total"), reverse=reverse)
+            elif col in ("total","perc","percentile"):
+                self.model.sort(key=itemgetter("total"), reverse=not reverse)
             else:
-                self.students.sort(key=lambda s: s.get(col,0), reverse=not reverse)
+                self.model.sort(key=lambda s: s.get(col,0), reverse=not reverse)
         elif col == "code":
-            self.students.sort(key=lambda s: int(s["code"]) if s["code"].isdigit() else s["code"], reverse=not reverse)
+            self.model.sort(key=lambda s: int(s["code"]) if s["code"].isdigit() else s["code"], reverse=not reverse)
         else:
-            self.students.sort(key=lambda s: s.get(col,"").lower(), reverse=not reverse)
+            self.model.sort(key=lambda s: s.get(col,"").lower(), reverse=not reverse)
         self._col_sort_reverse[col] = not reverse
         self.view_all()
 
+    @timed("add_student")
     def add_student(self):
         top = tk.Toplevel(self.root)
         top.title("Add Student - Oxford Manager")
@@ -621,27 +1671,23 @@ class StudentManager:
                     raise ValueError("Code required")
                 name = entries["Name"].get().strip()
                 c1 = int(entries["C1"].get()); c2 = int(entries["C2"].get()); c3 = int(entries["C3"].get()); exam = int(entries["Exam"].get())
-                for v in (c1,c2,c3):
-                    if not (0 <= v <= 20):
-                        raise ValueError("Coursework marks 0-20")
-                if not (0 <= exam <= 100):
-                    raise ValueError("Exam must be 0-100")
-                if any(s["code"]==code for s in self.students):
+                self.check_marks({"c1": c1, "c2": c2, "c3": c3, "exam": exam})
+                if code in self.model.by_code:
                     raise ValueError("Student code already exists")
                 student = {"code":code, "name":name, "c1":c1, "c2":c2, "c3":c3, "exam":exam}
-                self.students.append(student)
                 extras = {"email": entries["Email"].get().strip(), "dob": entries["DOB (YYYY-MM-DD)"].get().strip(), "course": entries["Course"].get().strip()}
-                if extras["email"] or extras["dob"] or extras["course"]:
-                    self.extra[code] = extras
-                    save_extra(self.extra)
+                # goes through the edit history so it can be undone; save_data writes both files
+                self.history.add(student, extras if (extras["email"] or extras["dob"] or extras["course"]) else None)
                 self.save_data()
                 self.view_all()
+                self.update_undo_buttons()
                 top.destroy()
             except Exception as e:
                 messagebox.showerror("Invalid", str(e))
 
         tk.Button(top, text="Add Student", command=save, bg="#27ae60", fg="white", width=18).pack(pady=12)
 
+    @timed("delete_student")
     def delete_student(self):
         top = tk.Toplevel(self.root)
         top.title("Delete Student")
@@ -671,51 +1717,50 @@ class StudentManager:
         btn_container = tk.Frame(top, bg=LIGHT_BG)
         btn_container.pack(pady=6)
 
-        # Frame for Treeview
+        # Frame for Treeview and its page bar
         search_results_frame = tk.Frame(top, bg=LIGHT_BG)
         search_results_frame.pack(pady=6, fill="both", expand=True)
 
-        # Store reference to Treeview for deletion (will be created in find_and_show)
+        # show matches in a Treeview for nicer UI; built once, refilled a page at a time
+        cols = ("code","name","total","perc")
+        tv = ttk.Treeview(search_results_frame, columns=cols, show="headings", height=6)
+        for c in cols:
+            tv.heading(c, text=c.title())
+            tv.column(c, width=120 if c!="name" else 260, anchor="center")
+        scr = ttk.Scrollbar(search_results_frame, orient="vertical", command=tv.yview)
+        tv.configure(yscrollcommand=scr.set)
+        pager = ResultPager(search_results_frame, lambda rows: fill_match_tree(tv, rows))
+        pager.bind_keys(q_ent, tv)
+
+        # Store reference to Treeview for deletion (shown by find_and_show)
         self.tv_delete = None
 
+        def hide_results():
+            pager.frame.pack_forget()
+            tv.pack_forget()
+            scr.pack_forget()
+            self.delete_btn.pack_forget()
+            self.tv_delete = None
+
         def find_and_show():
             q = q_ent.get().strip()
 
-            # Clear and hide previous results
-            for widget in search_results_frame.winfo_children():
-                widget.destroy()
-
             if not q:
                 result_lbl.config(text="Enter code or name.")
-                self.delete_btn.pack_forget()
-                self.tv_delete = None
+                hide_results()
                 return
 
-            matches = [s for s in self.students if q.lower() in s["code"].lower() or q.lower() in s["name"].lower()]
+            matches = self.find_students(q, MATCH_LIMIT)
 
             if not matches:
                 result_lbl.config(text="No matching student found.")
-                self.delete_btn.pack_forget()
-                self.tv_delete = None
+                hide_results()
                 return
 
-            # show matches in a Treeview for nicer UI
-            cols = ("code","name","total","perc")
-            tv = ttk.Treeview(search_results_frame, columns=cols, show="headings", height=6)
-            for c in cols:
-                tv.heading(c, text=c.title())
-                tv.column(c, width=120 if c!="name" else 260, anchor="center")
-            for s in matches:
-                # Calculate total and percentage for display
-                _, total, perc, _ = self.calc_total_perc_grade(s)
-                # Use the student's code as the item ID (iid) for easy lookup in confirm_delete_student
-                # Ensure iid is always string
-                tv.insert("", "end", values=(s["code"], s["name"], total, f"{perc:.2f}%"), iid=str(s["code"]))
-
+            pager.frame.pack(side="bottom", fill="x")
             tv.pack(side="left", fill="both", expand=True)
-            scr = ttk.Scrollbar(search_results_frame, orient="vertical", command=tv.yview)
             scr.pack(side="right", fill="y")
-            tv.configure(yscrollcommand=scr.set)
+            pager.set_results(matches, capped=len(matches) >= MATCH_LIMIT)
 
             # Store reference to the Treeview
             self.tv_delete = tv
@@ -768,7 +1813,7 @@ class StudentManager:
             return
 
         # Find the student dictionary using the code from the item
-        chosen_student = next((s for s in self.students if str(s["code"]) == chosen_code), None)
+        chosen_student = self.model.get(chosen_code)
 
         if not chosen_student:
             messagebox.showerror("Error", "Could not identify student in main list.")
@@ -779,16 +1824,13 @@ class StudentManager:
 
         # Perform deletion: Remove the dictionary object from the list
         try:
-            self.students.remove(chosen_student)
-
-            # Remove from extra details if it exists
-            if chosen_code in self.extra:
-                del self.extra[chosen_code]
-                save_extra(self.extra)  # ensure extras are saved after deletion
+            # removes the extra details too, and can be undone
+            self.history.remove(chosen_student["code"])
 
             # Save data to both files immediately
             self.save_data()
             self.view_all() # Update the main display
+            self.update_undo_buttons()
             messagebox.showinfo("Deleted", "Student removed.")
             # clear tv reference
             try:
@@ -803,6 +1845,7 @@ class StudentManager:
              messagebox.showerror("Error", f"Failed to complete deletion: {e}")
 
 
+    @timed("update_student")
     def update_student(self):
         top = tk.Toplevel(self.root)
         top.title("Update Student")
@@ -835,7 +1878,7 @@ class StudentManager:
             if not q:
                 result_lbl.config(text="Enter code or name.")
                 return
-            matches = [s for s in self.students if q.lower() in s["code"].lower() or q.lower() in s["name"].lower()]
+            matches = self.find_students(q, MATCH_LIMIT)
             if not matches:
                 result_lbl.config(text="No matching student found.")
                 return
@@ -845,26 +1888,27 @@ class StudentManager:
                 # show a small chooser window
                 choose = tk.Toplevel(top)
                 choose.title("Choose Student")
-                choose.geometry("600x300")
+                choose.geometry("600x330")
                 tvc = ttk.Treeview(choose, columns=("code","name","total","perc"), show="headings", height=8)
                 for c in ("code","name","total","perc"):
                     tvc.heading(c, text=c.title())
                     tvc.column(c, width=130 if c!="name" else 300)
-                for s in matches:
-                    total = s["c1"]+s["c2"]+s["c3"]+s["exam"]
-                    perc = (total/160)*100
-                    tvc.insert("", "end", values=(s["code"], s["name"], total, f"{perc:.2f}%"), iid=s["code"]) # Using code as iid
+                tk.Button(choose, text="Choose", command=lambda: choose_selected(), bg=ACCENT, fg="white").pack(side="bottom", pady=6)
+                pager = ResultPager(choose, lambda rows: fill_match_tree(tvc, rows))
+                pager.frame.pack(side="bottom", fill="x", padx=6)
+                pager.bind_keys(tvc)
                 tvc.pack(fill="both", expand=True)
+                pager.set_results(matches, capped=len(matches) >= MATCH_LIMIT)
+                tvc.focus_set()
                 def choose_selected():
                     sel = tvc.selection()
                     if not sel:
                         messagebox.showwarning("Select", "Select a student.")
                         return
-                    code = tvc.item(sel[0], "iid") # Get code from iid
-                    chosen_local = next(x for x in matches if x["code"]==code)
+                    chosen_local = self.model.get(sel[0]) # iid is the code
                     choose.destroy()
-                    populate_form(chosen_local)
-                tk.Button(choose, text="Choose", command=choose_selected, bg=ACCENT, fg="white").pack(pady=6)
+                    if chosen_local:
+                        populate_form(chosen_local)
                 return
             else:
                 populate_form(chosen)
@@ -906,31 +1950,21 @@ class StudentManager:
                     new_code = entries["Code"].get().strip()
                     name = entries["Name"].get().strip()
                     c1 = int(entries["C1"].get()); c2 = int(entries["C2"].get()); c3 = int(entries["C3"].get()); exam = int(entries["Exam"].get())
-                    if not (0<=c1<=20 and 0<=c2<=20 and 0<=c3<=20):
-                        raise ValueError("Coursework marks 0-20")
-                    if not (0<=exam<=100):
-                        raise ValueError("Exam 0-100")
-                    if new_code != chosen["code"] and any(s["code"]==new_code for s in self.students if s is not chosen):
+                    self.check_marks({"c1": c1, "c2": c2, "c3": c3, "exam": exam})
+                    if new_code != chosen["code"] and new_code in self.model.by_code:
                         # Ensure we check against *other* students only if the code changed
                         raise ValueError("Code already exists for another student")
 
                     # Store old code for extra data deletion
                     old_code = chosen["code"]
 
-                    chosen["code"] = new_code
-                    chosen["name"] = name
-                    chosen["c1"] = c1; chosen["c2"] = c2; chosen["c3"] = c3; chosen["exam"] = exam
-
-                    # Update/Save extra data
-                    self.extra[new_code] = {"email": entries["Email"].get().strip(), "dob": entries["DOB (YYYY-MM-DD)"].get().strip(), "course": entries["Course"].get().strip()}
+                    # the extra details move with the code (the old entry goes if it changed)
+                    extras = {"email": entries["Email"].get().strip(), "dob": entries["DOB (YYYY-MM-DD)"].get().strip(), "course": entries["Course"].get().strip()}
+                    self.history.update(old_code, {"code": new_code, "name": name, "c1": c1, "c2": c2, "c3": c3, "exam": exam}, extras)
 
-                    # if code changed, remove old extra entry
-                    if new_code != old_code and old_code in self.extra:
-                        del self.extra[old_code]
-
-                    save_extra(self.extra)
                     self.save_data()
                     self.view_all()
+                    self.update_undo_buttons()
                     top.destroy()
                 except Exception as e:
                     messagebox.showerror("Invalid", str(e))
@@ -938,192 +1972,417 @@ class StudentManager:
 
         tk.Button(top, text="Find & Edit", command=find_and_edit, bg=ACCENT, fg="white", width=18).pack(pady=6)
 
+    @timed("show_stats")
     def show_stats(self):
-        if not self.students:
+        if self.stats_win is not None:
+            self.stats_win.win.lift()
+            return
+        if not self.visible_students():
             messagebox.showinfo("No data", "No students to analyse.")
             return
-        totals = [s["c1"]+s["c2"]+s["c3"]+s["exam"] for s in self.students]
-        percs = [(t/160)*100 for t in totals]
-        avg = sum(percs)/len(percs)
-        highest = max(percs); lowest = min(percs)
-
-        stats_win = tk.Toplevel(self.root)
-        stats_win.title("Statistics")
-        stats_win.geometry("1100x680")
-        stats_win.configure(bg=LIGHT_BG)
-
-        # SET ICON
-        set_app_icon(stats_win)
-
-        topf = tk.Frame(stats_win, bg=LIGHT_BG)
-        topf.pack(fill="x", padx=12, pady=8)
-        tk.Label(topf, text=f"Average: {avg:.2f}%  Highest: {highest:.2f}%  Lowest: {lowest:.2f}%", bg=LIGHT_BG, font=("Arial",11,"bold")).pack(side="left")
+        self.stats_win = StatsWindow(self)
+        self.mem_checkpoint("after opening stats", force=True)
+
+    def show_history(self):
+        self.snapshots.flush()
+        versions = self.snapshots.versions
+        if not versions:
+            messagebox.showinfo("History", "No saved versions yet. A version is recorded every time the data is saved.")
+            return
+        win = tk.Toplevel(self.root)
+        win.title("History")
+        win.geometry("760x420")
+        win.configure(bg=LIGHT_BG)
+        set_app_icon(win)
+
+        cols = ("version", "time", "kind", "students", "changed", "size")
+        tv = ttk.Treeview(win, columns=cols, show="headings", selectmode="browse")
+        for c in cols:
+            tv.heading(c, text=c.title())
+            tv.column(c, width=200 if c == "time" else 100, anchor="center")
+        tv.pack(fill="both", expand=True, padx=12, pady=(12,6))
+        for e in reversed(versions):
+            changed = e.get("changed", "") if e["kind"] == "delta" else "all"
+            tv.insert("", "end", iid=str(e["version"]), values=(e["version"], e["time"].replace("T", " "), e["kind"],
+                                                               e["count"], changed, f"{e['bytes'] / 1024:.1f} KB"))
+
+        def restore_selected():
+            sel = tv.selection()
+            if not sel:
+                messagebox.showwarning("Select", "Please select a version to restore.", parent=win)
+                return
+            if not messagebox.askyesno("Restore", f"Replace the current data with version {sel[0]}?\n"
+                                       "The current data stays in the history.", parent=win):
+                return
+            win.destroy()
+            self.start_loading(restore_version=int(sel[0]))
 
-        chart_type = tk.StringVar(value="hist")
+        tk.Button(win, text="Restore Selected", command=restore_selected, bg=ACCENT, fg="white").pack(pady=8)
 
-        # Options: Histogram, Pie, or Both
-        tk.Radiobutton(topf, text="Histogram", variable=chart_type, value="hist", bg=LIGHT_BG).pack(side="left", padx=6)
-        tk.Radiobutton(topf, text="Pie Chart (grades)", variable=chart_type, value="pie", bg=LIGHT_BG).pack(side="left", padx=6)
+    def merge_marks(self):
+        """Merge a marks file from an exam board: pick a policy, preview the diff, apply as one undo step."""
+        path = filedialog.askopenfilename(title="Merge marks file", filetypes=[("Marks files", "*.txt *.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        win = tk.Toplevel(self.root)
+        win.title(f"Merge {os.path.basename(path)}")
+        win.geometry("820x560")
+        win.configure(bg=LIGHT_BG)
+        set_app_icon(win)
+        win.transient(self.root)
+        win.grab_set()
+
+        opts = tk.Frame(win, bg=LIGHT_BG)
+        opts.pack(fill="x", padx=12, pady=8)
+        policy = tk.StringVar(value="overwrite")
+        for name, text in POLICIES.items():
+            tk.Radiobutton(opts, text=f"{name}: {text}", variable=policy, value=name, bg=LIGHT_BG,
+                           command=lambda: preview()).pack(anchor="w")
+        add_new = tk.BooleanVar(value=True)
+        tk.Checkbutton(opts, text="Add students that are not in the cohort yet (rows with every field)", variable=add_new,
+                       bg=LIGHT_BG, command=lambda: preview()).pack(anchor="w", pady=(4,0))
+        summary = tk.Label(win, text="", bg=LIGHT_BG, anchor="w", justify="left")
+        summary.pack(fill="x", padx=12)
+        cols = ("status", "code", "field", "old", "new")
+        tv = ttk.Treeview(win, columns=cols, show="headings")
+        for c in cols:
+            tv.heading(c, text=c.title())
+            tv.column(c, width=140, anchor="center")
+        tv.pack(fill="both", expand=True, padx=12, pady=6)
+        state = {"plan": None}
+
+        def preview():
+            try:
+                plan = plan_merge(path, self.model.by_code, policy.get(), self.grader.max_marks, add_new.get())
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Merge", f"Cannot read {path}: {e}", parent=win)
+                return
+            state["plan"] = plan
+            tv.delete(*tv.get_children())
+            rows = [("changed", c.code, c.field, c.old, c.new) for c in plan.changes[:MERGE_PREVIEW_ROWS]]
+            rows += [("added", s["code"], "", "", s["name"]) for s in plan.added[:MERGE_PREVIEW_ROWS - len(rows)]]
+            rows += [("rejected", "", f"line {n}", "", reason) for n, reason in plan.rejected[:MERGE_PREVIEW_ROWS - len(rows)]]
+            for values in rows:
+                tv.insert("", "end", values=values)
+            more = len(plan.changes) + len(plan.added) + len(plan.rejected) - len(rows)
+            summary.config(text=plan.summary() + (f"\nShowing the first {len(rows)} lines; save the report to see all {len(rows) + more}." if more > 0 else ""))
+
+        def save_report():
+            if state["plan"] is None:
+                return
+            report = filedialog.asksaveasfilename(parent=win, defaultextension=".csv", filetypes=[("CSV","*.csv")],
+                                                  initialfile=os.path.splitext(os.path.basename(path))[0] + "-merge-report.csv")
+            if report:
+                try:
+                    write_report(report, state["plan"])
+                except OSError as e:
+                    messagebox.showerror("Merge", f"Could not write the report: {e}", parent=win)
 
-        # OPTION FOR SEE BOTH
-        tk.Radiobutton(topf, text="See Both (Side-by-Side)", variable=chart_type, value="both", bg=LIGHT_BG, fg=ACCENT, font=("Arial", 10, "bold")).pack(side="left", padx=10)
+        def apply():
+            plan = state["plan"]
+            if plan is None:
+                return
+            if not (plan.updates or plan.added):
+                messagebox.showinfo("Merge", "Nothing to change.", parent=win)
+                return
+            win.destroy()
+            self.apply_merge(plan)
+
+        btns = tk.Frame(win, bg=LIGHT_BG)
+        btns.pack(fill="x", padx=12, pady=8)
+        tk.Button(btns, text="Save Report...", command=save_report).pack(side="left")
+        tk.Button(btns, text="Apply Merge", command=apply, bg=ACCENT, fg="white", width=14).pack(side="right")
+        tk.Button(btns, text="Cancel", command=win.destroy).pack(side="right", padx=6)
+        preview()
+
+    @timed("apply_merge")
+    def apply_merge(self, plan):
+        self.status_label.config(text=f"Merging {len(plan.updates) + len(plan.added)} students...")
+        self.root.config(cursor="watch")
+        self.root.update_idletasks()
+        try:
+            # one undo step for the whole file, and one save at the end
+            with self.history.batch(f"Merge {os.path.basename(plan.path)}"):
+                for code, fields in plan.updates.items():
+                    self.history.update(code, fields)
+                for s in plan.added:
+                    self.history.add(s)
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Merge", f"Merge stopped part way: {e}\nUndo reverts what was merged.")
+        finally:
+            self.root.config(cursor="")
+        self.save_data()
+        self.refresh_view()
+        self.update_undo_buttons()
+        self.status_label.config(text=f"Merged {os.path.basename(plan.path)}: {len(plan.updates)} students updated, {len(plan.added)} added.")
+
+    def show_performance(self):
+        if self.perf_win is not None and self.perf_win.winfo_exists():
+            self.perf_win.lift()
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Performance")
+        win.geometry("820x480")
+        win.configure(bg=LIGHT_BG)
+        set_app_icon(win)
+        self.perf_win = win
+
+        cols = ("op", "calls", "last", "mean", "p50", "p95", "max")
+        tv = ttk.Treeview(win, columns=cols, show="headings", height=12)
+        for c in cols:
+            tv.heading(c, text=c if c in ("op", "calls") else f"{c} (ms)")
+            tv.column(c, width=200 if c == "op" else 90, anchor="w" if c == "op" else "e")
+        tv.pack(fill="both", expand=True, padx=12, pady=(12,6))
+        hist_label = tk.Label(win, text="Select an operation to see its latency histogram.", bg=LIGHT_BG, anchor="w", justify="left")
+        hist_label.pack(fill="x", padx=12)
+
+        btns = tk.Frame(win, bg=LIGHT_BG)
+        btns.pack(fill="x", padx=12, pady=8)
+        prof_btn = tk.Button(btns, width=16)
+        prof_btn.pack(side="left", padx=4)
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            sel = tv.selection()
+            tv.delete(*tv.get_children())
+            for name, st in PERF.snapshot():
+                tv.insert("", "end", iid=name, values=(name, st.count, f"{st.last_ms:.1f}", f"{st.mean_ms:.1f}",
+                                                       f"{st.percentile(50):.1f}", f"{st.percentile(95):.1f}", f"{st.max_ms:.1f}"))
+            if sel and tv.exists(sel[0]):
+                tv.selection_set(sel[0])
+            prof_btn.config(text="Stop Profiling" if PERF.profiling else "Start Profiling")
+            win.after(PERF_REFRESH_MS, refresh)
+
+        def show_histogram(event=None):
+            sel = tv.selection()
+            if not sel:
+                return
+            st = dict(PERF.snapshot()).get(sel[0])
+            if st is None:
+                return
+            hist_label.config(text=f"{sel[0]}:   " + "   ".join(f"{label}: {n}" for label, n in st.histogram()))
 
-        canvas_frame = tk.Frame(stats_win, bg=LIGHT_BG)
-        canvas_frame.pack(fill="both", expand=True, padx=12, pady=6)
+        def toggle_profile():
+            if PERF.profiling:
+                PERF.stop_profile()
+            else:
+                PERF.start_profile()
+            prof_btn.config(text="Stop Profiling" if PERF.profiling else "Start Profiling")
 
-        def draw_chart():
-            for widget in canvas_frame.winfo_children():
-                widget.destroy()
-            if not MATPLOTLIB_AVAILABLE:
-                tk.Label(canvas_frame, text="matplotlib not installed. Install it to view charts.", bg=LIGHT_BG).pack()
+        def dump_profile():
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=".prof", filetypes=[("cProfile output","*.prof")], title="Save profile")
+            if not path:
                 return
-
-            ctype = chart_type.get()
-
-            # Prepare Data
-            grades = [self.get_grade(p) for p in percs]
-            # Use fixed order for grades
-            grade_order = ["A", "B", "C", "D", "F"]
-            labels = [g for g in grade_order if g in grades]
-            counts = [grades.count(g) for g in labels]
-
-            # Logic for "See Both"
-            if ctype == "both":
-                fig = Figure(figsize=(12,5), dpi=100)
-                # subplot 1: Histogram
-                ax1 = fig.add_subplot(121)
-                ax1.hist(percs, bins=10)
-                ax1.set_title("Distribution of Percentages")
-                ax1.set_xlabel("Percentage")
-                ax1.set_ylabel("Count")
-
-                # subplot 2: Pie
-                ax2 = fig.add_subplot(122)
-                ax2.pie(counts, labels=labels, autopct="%1.1f%%", startangle=90)
-                ax2.set_title("Grade Distribution")
-
-            elif ctype == "hist":
-                fig = Figure(figsize=(9,5))
-                ax = fig.add_subplot(111)
-                ax.hist(percs, bins=10)
-                ax.set_title("Distribution of Percentages")
-                ax.set_xlabel("Percentage")
-                ax.set_ylabel("Count")
-            else: # pie
-                fig = Figure(figsize=(9,5))
-                ax = fig.add_subplot(111)
-                ax.pie(counts, labels=labels, autopct="%1.1f%%", startangle=90)
-                ax.set_title("Grade Distribution")
-
-            canvas = FigureCanvasTkAgg(fig, master=canvas_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True)
-            stats_win._current_fig = fig
-
-        draw_chart_btn = tk.Button(topf, text="Draw Chart", command=draw_chart, bg=ACCENT, fg="white")
-        draw_chart_btn.pack(side="left", padx=8)
-
-        export_btn = tk.Button(topf, text="Export Chart to PDF", bg="#27ae60", fg="white")
-        export_btn.pack(side="right", padx=8)
-
-        def export_chart_to_pdf():
-            if not hasattr(stats_win, "_current_fig"):
-                messagebox.showwarning("No Chart", "Draw a chart before exporting.")
+            try:
+                PERF.dump_profile(path)
+                messagebox.showinfo("Saved", f"Profile saved to {path}\nOpen it with: python -m pstats {os.path.basename(path)}", parent=win)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not save profile: {e}", parent=win)
+
+        def reset():
+            PERF.reset()
+            hist_label.config(text="")
+            tv.delete(*tv.get_children())
+
+        prof_btn.config(command=toggle_profile)
+        tk.Button(btns, text="Dump .prof...", command=dump_profile).pack(side="left", padx=4)
+        tk.Button(btns, text="Reset Timings", command=reset).pack(side="left", padx=4)
+        tv.bind("<<TreeviewSelect>>", show_histogram)
+        refresh()
+
+    def mem_checkpoint(self, label, force=False):
+        """Memory snapshot at a key point when tracemalloc is tracing; grouped by a background job."""
+        taken = MEM.take(label, force)
+        if taken is None:
+            return
+        # Tk's own memory is invisible to tracemalloc, so count what it holds for us
+        gauges = {
+            "students": len(self.model.students),
+            "extra details": len(self.model.extra),
+            "Treeview rows": len(self.table.order),
+            "Tk images": len(self.root.image_names()),
+            "open windows": sum(isinstance(w, tk.Toplevel) for w in self.root.winfo_children()),
+        }
+        self.run_job(f"Memory {label}", lambda job: MEM.summarize(taken, gauges, job))
+
+    def show_memory(self):
+        if self.mem_win is not None and self.mem_win.winfo_exists():
+            self.mem_win.lift()
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Memory")
+        win.geometry("960x640")
+        win.configure(bg=LIGHT_BG)
+        set_app_icon(win)
+        self.mem_win = win
+
+        top = tk.Frame(win, bg=LIGHT_BG)
+        top.pack(fill="x", padx=12, pady=(12,4))
+        trace_btn = tk.Button(top, width=16)
+        trace_btn.pack(side="left", padx=4)
+        tk.Button(top, text="Take Snapshot", command=lambda: self.mem_checkpoint("manual", force=True)).pack(side="left", padx=4)
+        tk.Label(top, text="Compare with:", bg=LIGHT_BG).pack(side="left", padx=(18,4))
+        compare = ttk.Combobox(top, values=["previous", "same label", "first"], state="readonly", width=12)
+        compare.current(0)
+        compare.pack(side="left")
+        traced_label = tk.Label(top, text="", bg=LIGHT_BG, anchor="w")
+        traced_label.pack(side="left", padx=12)
+
+        panes = tk.Frame(win, bg=LIGHT_BG)
+        panes.pack(fill="both", expand=True, padx=12, pady=4)
+        snap_tv = ttk.Treeview(panes, columns=("label", "time", "traced"), show="headings", selectmode="browse", height=8)
+        for c, w in (("label", 160), ("time", 80), ("traced", 90)):
+            snap_tv.heading(c, text=c)
+            snap_tv.column(c, width=w, anchor="w" if c == "label" else "e")
+        snap_tv.pack(side="left", fill="y")
+        sub_tv = ttk.Treeview(panes, columns=("subsystem", "size", "delta", "blocks"), show="headings", height=8)
+        for c in ("subsystem", "size", "delta", "blocks"):
+            sub_tv.heading(c, text=c)
+            sub_tv.column(c, width=180 if c == "subsystem" else 100, anchor="w" if c == "subsystem" else "e")
+        sub_tv.pack(side="left", fill="both", expand=True, padx=(8,0))
+        gauge_label = tk.Label(win, text="", bg=LIGHT_BG, anchor="w", justify="left")
+        gauge_label.pack(fill="x", padx=12)
+        site_cols = ("site", "subsystem", "size", "delta", "blocks")
+        site_tv = ttk.Treeview(win, columns=site_cols, show="headings", height=10)
+        for c in site_cols:
+            site_tv.heading(c, text=c)
+            site_tv.column(c, width=300 if c == "site" else 160 if c == "subsystem" else 100, anchor="w" if c in ("site", "subsystem") else "e")
+        site_tv.pack(fill="both", expand=True, padx=12, pady=4)
+
+        btns = tk.Frame(win, bg=LIGHT_BG)
+        btns.pack(fill="x", padx=12, pady=8)
+        # the snapshots listed in snap_tv, by position
+        shown = []
+
+        def selected():
+            sel = snap_tv.selection()
+            if not sel or int(sel[0]) >= len(shown):
+                return None, None
+            snap = shown[int(sel[0])]
+            return snap, MEM.baseline(snap, compare.get())
+
+        def show_snapshot(event=None):
+            snap, base = selected()
+            for tv in (sub_tv, site_tv):
+                tv.delete(*tv.get_children())
+            if snap is None:
+                gauge_label.config(text="")
                 return
-            path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF","*.pdf"),("PNG","*.png")])
-            if not path:
+            for name, size, delta, count in snap.subsystem_rows(base):
+                sub_tv.insert("", "end", values=(name, mb(size), mb_delta(delta), count))
+            for (subsystem, site), size, delta, count in snap.site_rows(base):
+                site_tv.insert("", "end", values=(site, subsystem, mb(size), mb_delta(delta), count))
+            gauge_label.config(text="   ".join(f"{name}: {value}" + (f" ({delta:+})" if delta else "")
+                                               for name, value, delta in snap.gauge_rows(base)))
+
+        def refresh():
+            if not win.winfo_exists():
                 return
-            fig = stats_win._current_fig
-            tmp_img = os.path.join(SCRIPT_DIR, f"__temp_chart_{datetime.now().timestamp():.0f}.png")
-            fig.savefig(tmp_img, bbox_inches="tight")
-            if path.lower().endswith(".pdf"):
-                if not REPORTLAB_AVAILABLE:
-                    messagebox.showwarning("reportlab missing", f"Saved chart image to {tmp_img}. Install reportlab to embed into PDF.")
-                    return
-                try:
-                    c = pdfcanvas.Canvas(path, pagesize=letter)
-                    w, h = letter
-                    c.setFont("Helvetica-Bold", 14)
-                    c.drawString(36, h-36, "Oxford University - Statistics Export")
-                    # embed logo if available
-                    if LOGO_PATH and os.path.exists(LOGO_PATH):
-                        try:
-                            c.drawImage(LOGO_PATH, w-120, h-80, width=72, height=72, mask='auto')
-                        except:
-                            pass
-                    c.drawImage(tmp_img, 36, 80, width=w-72, preserveAspectRatio=True, mask='auto')
-                    c.save()
-                    os.remove(tmp_img)
-                    messagebox.showinfo("Exported", f"PDF saved to {path}")
-                except Exception as e:
-                    messagebox.showerror("Error", f"PDF export failed: {e}")
+            if MEM.tracing:
+                traced, peak = tracemalloc.get_traced_memory()
+                traced_label.config(text=f"Tracing: {mb(traced)} traced, peak {mb(peak)}")
             else:
-                try:
-                    os.replace(tmp_img, path)
-                    messagebox.showinfo("Saved", f"Chart saved to {path}")
-                except Exception as e:
-                    messagebox.showerror("Error", f"Save failed: {e}")
-
-        export_btn.config(command=export_chart_to_pdf)
-
+                traced_label.config(text="Not tracing (start it here, or run with PYTHONTRACEMALLOC=25 to see the first load)")
+            trace_btn.config(text="Stop Tracing" if MEM.tracing else "Start Tracing")
+            snaps = list(MEM.snapshots)
+            if snaps != shown:
+                shown[:] = snaps
+                snap_tv.delete(*snap_tv.get_children())
+                for i, snap in enumerate(snaps):
+                    snap_tv.insert("", "end", iid=str(i), values=(snap.label, time.strftime("%H:%M:%S", time.localtime(snap.taken)), mb(snap.traced)))
+                if snaps:
+                    # follow the newest snapshot as they arrive
+                    snap_tv.selection_set(str(len(snaps) - 1))
+                    snap_tv.see(str(len(snaps) - 1))
+                else:
+                    show_snapshot()
+            win.after(MEM_REFRESH_MS, refresh)
+
+        def toggle_tracing():
+            if MEM.tracing:
+                MEM.stop()
+            else:
+                MEM.start()
+                self.mem_checkpoint("tracing started", force=True)
+            trace_btn.config(text="Stop Tracing" if MEM.tracing else "Start Tracing")
+
+        def save_report():
+            snap, base = selected()
+            if snap is None:
+                messagebox.showinfo("Memory", "Select a snapshot first.", parent=win)
+                return
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=".txt", filetypes=[("Text","*.txt")], title="Save memory report")
+            if not path:
+                return
+            try:
+                with open(path, "w") as f:
+                    f.write(format_report(snap, base))
+                self.status_label.config(text=f"Memory report saved to {path}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not save report: {e}", parent=win)
+
+        trace_btn.config(command=toggle_tracing)
+        tk.Button(btns, text="Save Report...", command=save_report).pack(side="left", padx=4)
+        tk.Button(btns, text="Clear Snapshots", command=MEM.clear).pack(side="left", padx=4)
+        snap_tv.bind("<<TreeviewSelect>>", show_snapshot)
+        compare.bind("<<ComboboxSelected>>", show_snapshot)
+        refresh()
+
+    def shown_columns(self):
+        # indexes of the columns currently displayed (cohort is hidden outside a workspace)
+        cols = list(self.tree["columns"])
+        shown = self.tree["displaycolumns"]
+        if not shown or shown[0] == "#all":
+            return list(range(len(cols)))
+        return [cols.index(c) for c in shown]
+
+    def export_rows(self):
+        """Headers and values of the displayed columns for every student row in the table."""
+        shown = self.shown_columns()
+        headers = [self.tree.heading(self.tree["columns"][i])["text"] for i in shown]
+        # read the reconciler's copy of the rows rather than asking Tk for each one
+        rows = []
+        for iid in self.table.order:
+            vals = self.table.rows[iid][0]
+            if vals and vals[0] != "":
+                rows.append([vals[i] for i in shown])
+        return headers, rows
+
+    @timed("export_pdf")
     def export_pdf(self):
-        items = [i for i in self.tree.get_children() if self.tree.item(i)["values"] and self.tree.item(i)["values"][0]!=""]
-        if not items:
+        # only the copy of the rows is taken here; the file is written by a background job
+        headers, rows = self.export_rows()
+        if not rows:
             messagebox.showinfo("Empty", "No data to export.")
             return
         save_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF","*.pdf"),("CSV","*.csv")], title="Export")
         if not save_path:
             return
+        writer, kind = write_csv_table, "CSV"
         if save_path.lower().endswith(".pdf"):
             if not REPORTLAB_AVAILABLE:
                 messagebox.showwarning("ReportLab missing", "reportlab not installed. The app will save CSV instead.")
                 save_path = os.path.splitext(save_path)[0] + ".csv"
             else:
-                try:
-                    c = pdfcanvas.Canvas(save_path, pagesize=letter)
-                    width, height = letter
-                    x = 36; y = height - 36
-                    c.setFont("Helvetica-Bold", 14)
-                    c.drawString(x, y, "Oxford University - Student Manager Export")
-                    if LOGO_PATH and os.path.exists(LOGO_PATH):
-                        try:
-                            c.drawImage(LOGO_PATH, width-130, y-30, width=72, height=72, mask='auto')
-                        except:
-                            pass
-                    c.setFont("Helvetica", 9)
-                    y -= 40
-                    headers = [self.tree.heading(col)["text"] for col in self.tree["columns"]]
-                    row_h = 14
-                    # compute column x positions (simple layout)
-                    col_x = [x, x+80, x+320, x+400, x+480, x+560, x+640, x+720, x+800] # Adjusted to give more space
-                    for i,h in enumerate(headers):
-                        c.drawString(col_x[i], y, h)
-                    y -= row_h
-                    for item in items:
-                        vals = self.tree.item(item)["values"]
-                        if y < 80:
-                            c.showPage()
-                            y = height - 36
-                        for i,v in enumerate(vals):
-                            c.drawString(col_x[i], y, str(v))
-                        y -= row_h
-                    c.save()
-                    messagebox.showinfo("Exported", f"PDF saved to {save_path}")
-                    return
-                except Exception as e:
-                    messagebox.showerror("Error", f"PDF export failed: {e}")
-                    return
-        # fallback CSV
-        try:
-            with open(save_path, "w") as f:
-                headers = [self.tree.heading(col)["text"] for col in self.tree["columns"]]
-                f.write(",".join(headers)+"\n")
-                for item in items:
-                    vals = [str(v) for v in self.tree.item(item)["values"]]
-                    f.write(",".join(vals)+"\n")
-            messagebox.showinfo("Saved", f"CSV saved to {save_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Export failed: {e}")
+                writer, kind = write_pdf_table, "PDF"
+        self.run_job(f"{kind} of {len(rows)} rows",
+                     lambda job: writer(save_path, headers, rows, job),
+                     on_done=lambda _: self.status_label.config(text=f"{kind} saved to {save_path}"),
+                     on_error=lambda e: messagebox.showerror("Error", f"{kind} export failed: {e}"))
+
+# subsystems the memory profiler charges this module's allocations to (the rest is "window")
+MEM.assign("charts", StatsWindow, add_chart_axes, fill_charts, write_chart)
+MEM.assign("exports", write_csv_table, write_pdf_table, _write_pdf_table, StudentManager.export_rows)
+MEM.assign("images", set_app_icon, LoginWindow)
+MEM.assign("table rows", StudentManager.view_all, StudentManager.row_values, StudentManager.cached_row,
+           StudentManager.summary_values)
+MEM.watch("Toplevel", tk.Toplevel)
+MEM.watch("PhotoImage", tk.PhotoImage)
+if MATPLOTLIB_AVAILABLE:
+    MEM.watch("Figure", Figure)
+if PIL_AVAILABLE:
+    MEM.watch("ImageTk.PhotoImage", ImageTk.PhotoImage)
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,318 @@
+# studentmodel.py
+# In-memory student records, kept separate from the Tk code so background
+# threads (file watcher, loaders) can parse and diff without touching widgets.
+# The model's lock is held while records change, so readers on other threads
+# (e.g. the JSON API in studentapi.py) never see a half-applied update.
+import json
+import os
+import threading
+from collections import namedtuple
+
+from grading import MARK_FIELDS, GradingEngine
+
+RECORD_FIELDS = ("code", "name") + MARK_FIELDS
+PROGRESS_EVERY = 5000
+
+# result of comparing an incoming marks file against the loaded records
+MarksDiff = namedtuple("MarksDiff", "added removed changed")
+
+
+def parse_marks_line(line):
+    """Parse one 'code,name,c1,c2,c3,exam' line, returns None if it is invalid."""
+    parts = [p.strip() for p in line.split(",")]
+    if len(parts) < 6:
+        return None
+    try:
+        return {
+            "code": parts[0],
+            "name": parts[1],
+            "c1": int(parts[2]),
+            "c2": int(parts[3]),
+            "c3": int(parts[4]),
+            "exam": int(parts[5])
+        }
+    except ValueError:
+        return None
+
+
+def read_marks(path, progress=None):
+    """Read a marks file (first line = number of students, rest = records).
+
+    progress, if given, is called as progress(chars_read, file_size) every few
+    thousand lines so a loader thread can report how far it has got.
+    """
+    students = []
+    size = os.path.getsize(path) if progress else 0
+    done = 0
+    with open(path, "r") as f:
+        header_seen = False
+        for n, line in enumerate(f):
+            if progress:
+                done += len(line)
+                if n % PROGRESS_EVERY == 0:
+                    progress(done, size)
+            line = line.strip()
+            if not line:
+                continue
+            if not header_seen:
+                header_seen = True
+                continue
+            s = parse_marks_line(line)
+            if s is not None:
+                students.append(s)
+    if progress:
+        progress(size, size)
+    return students
+
+
+def write_marks(path, students, version=None):
+    # write file with count on first line (keeps same format); a version,
+    # if given, follows the count (see sharedmarks.py) and read_marks skips it
+    with open(path, "w") as f:
+        f.write(f"{len(students)}\n" if version is None else f"{len(students)},{version}\n")
+        for s in students:
+            f.write(f"{s['code']},{s['name']},{s['c1']},{s['c2']},{s['c3']},{s['exam']}\n")
+
+
+def load_extra(path):
+    """Extra details (code -> course/email/dob), {} if the file is missing or unreadable."""
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except:
+            return {}
+    return {}
+
+
+def read_extra_file(path):
+    # strict variant of load_extra for the file watcher: a half-written file
+    # must raise rather than wipe the in-memory extras
+    with open(path, "r") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("extra details file must contain an object")
+    return data
+
+
+def diff_records(current, incoming):
+    """Keyed diff of incoming records against current (a code -> record dict)."""
+    added, changed = [], []
+    seen = set()
+    for s in incoming:
+        code = s["code"]
+        if code in seen:
+            continue
+        seen.add(code)
+        old = current.get(code)
+        if old is None:
+            added.append(s)
+        elif any(old[k] != s[k] for k in RECORD_FIELDS[1:]):
+            changed.append(s)
+    removed = [code for code in current if code not in seen]
+    return MarksDiff(added, removed, changed)
+
+
+class ModelListener:
+    """Base class for indexes that StudentModel keeps in step with its records."""
+    def records_reset(self, students):
+        pass
+
+    def records_regraded(self, students):
+        # derived fields (total/perc/grade) changed for everyone
+        self.records_reset(students)
+
+    def records_reordered(self, students):
+        # same records, new order (sort)
+        pass
+
+    def record_added(self, s):
+        pass
+
+    def record_removed(self, s):
+        pass
+
+    def record_changed(self, old, s):
+        # old is a copy of the record taken before the update
+        pass
+
+    def extras_reset(self, extra):
+        pass
+
+    def extra_changed(self, code, old, new):
+        # old/new are the code's extra details before and after, None when absent
+        pass
+
+
+class StudentModel:
+    """Ordered list of student dicts plus a code index and running totals.
+
+    Every record that goes in is graded, so total/perc/grade are always
+    present on the dicts in self.students. Subscribed listeners are told
+    about every add/remove/change so their indexes never need a rescan.
+    The extra details (code -> course/email/dob) live here too and are
+    changed through set_extra/reset_extra for the same reason; an entry is
+    replaced, never edited in place.
+    """
+    def __init__(self, students=None, grader=None):
+        self.grader = grader or GradingEngine()
+        self.students = []
+        self.by_code = {}
+        self.total_sum = 0
+        self.extra = {}
+        # code -> index in self.students, built on demand and dropped when rows move
+        self._positions = None
+        self.listeners = []
+        # re-entrant: apply_diff holds it across the adds/removes it makes
+        self.lock = threading.RLock()
+        self.reset(students or [])
+
+    def subscribe(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+            listener.records_reset(self.students)
+            listener.extras_reset(self.extra)
+        return listener
+
+    def unsubscribe(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def __len__(self):
+        return len(self.students)
+
+    def get(self, code):
+        return self.by_code.get(code)
+
+    def average_perc(self):
+        if not self.students:
+            return 0
+        return self.total_sum / self.grader.max_total * 100 / len(self.students)
+
+    def reset(self, students, graded=False):
+        # graded=True when a loader thread already ran grade_batch; grading
+        # happens before taking the lock as nobody else can see the new list yet
+        students = list(students)
+        if not graded:
+            self.grader.grade_batch(students)
+        by_code = {s["code"]: s for s in students}
+        total_sum = sum(s["total"] for s in students)
+        with self.lock:
+            self.students = students
+            self.by_code = by_code
+            self._positions = None
+            self.total_sum = total_sum
+            for l in self.listeners:
+                l.records_reset(self.students)
+
+    def regrade(self):
+        """Re-grade the whole cohort in one pass, e.g. after the grading config changed."""
+        with self.lock:
+            self.grader.grade_batch(self.students)
+            self.total_sum = sum(s["total"] for s in self.students)
+            for l in self.listeners:
+                l.records_regraded(self.students)
+
+    def reset_extra(self, extra):
+        with self.lock:
+            self.extra = extra
+            for l in self.listeners:
+                l.extras_reset(extra)
+
+    def set_extra(self, code, entry):
+        """Replace code's extra details (None removes them); returns the old entry."""
+        with self.lock:
+            if entry is None:
+                old = self.extra.pop(code, None)
+            else:
+                old = self.extra.get(code)
+                self.extra[code] = entry
+            if old is not None or entry is not None:
+                for l in self.listeners:
+                    l.extra_changed(code, old, entry)
+        return old
+
+    def index_of(self, code):
+        return self.students.index(self.by_code[code])
+
+    def positions(self):
+        """code -> index in self.students; O(n) after rows moved, then reused."""
+        with self.lock:
+            if self._positions is None:
+                self._positions = {s["code"]: i for i, s in enumerate(self.students)}
+            return self._positions
+
+    def in_order(self, codes):
+        """Records for the given codes in table order, in O(k log k) for k codes."""
+        pos = self.positions()
+        students = self.students
+        return [students[i] for i in sorted(pos[c] for c in codes if c in pos)]
+
+    def add(self, s, index=None):
+        """Append a record (or insert it at index, e.g. when a delete is undone)."""
+        with self.lock:
+            if s["code"] in self.by_code:
+                raise ValueError("Student code already exists")
+            self.grader.grade_record(s)
+            if index is None:
+                self.students.append(s)
+                if self._positions is not None:
+                    self._positions[s["code"]] = len(self.students) - 1
+            else:
+                self.students.insert(index, s)
+                self._positions = None
+            self.by_code[s["code"]] = s
+            self.total_sum += s["total"]
+            for l in self.listeners:
+                l.record_added(s)
+        return s
+
+    def remove(self, code):
+        with self.lock:
+            s = self.by_code.pop(code)
+            self.students.remove(s)
+            self._positions = None
+            self.total_sum -= s["total"]
+            for l in self.listeners:
+                l.record_removed(s)
+        return s
+
+    def update(self, code, fields):
+        """Update a record in place (keeps its position), code may change."""
+        with self.lock:
+            s = self.by_code[code]
+            new_code = fields.get("code", code)
+            if new_code != code and new_code in self.by_code:
+                raise ValueError("Code already exists for another student")
+            old = dict(s)
+            self.total_sum -= s["total"]
+            s.update(fields)
+            self.grader.grade_record(s)
+            self.total_sum += s["total"]
+            if new_code != code:
+                del self.by_code[code]
+                self.by_code[new_code] = s
+                self._positions = None
+            for l in self.listeners:
+                l.record_changed(old, s)
+        return s
+
+    def sort(self, key, reverse=False):
+        with self.lock:
+            self.students.sort(key=key, reverse=reverse)
+            self._positions = None
+            for l in self.listeners:
+                l.records_reordered(self.students)
+
+    def apply_diff(self, diff):
+        with self.lock:
+            for code in diff.removed:
+                if code in self.by_code:
+                    self.remove(code)
+            for s in diff.changed:
+                if s["code"] in self.by_code:
+                    self.update(s["code"], {k: s[k] for k in RECORD_FIELDS[1:]})
+            for s in diff.added:
+                if s["code"] not in self.by_code:
+                    self.add(s)
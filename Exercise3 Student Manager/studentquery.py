@@ -0,0 +1,236 @@
+# studentquery.py
+# Filter expressions over student records, e.g.
+#
+#     grade in (A,B) and exam < 50 and course = "Creative Computing"
+#
+# An expression is parsed once and compiled into a single Python list
+# comprehension, so filtering runs the whole condition inline for every row
+# instead of walking a syntax tree (or calling a function) per record.
+import re
+
+NUMERIC_FIELDS = ("c1", "c2", "c3", "exam", "total", "perc")
+RECORD_TEXT_FIELDS = ("code", "name", "grade")
+EXTRA_FIELDS = ("course", "email", "dob")
+FIELDS = NUMERIC_FIELDS + RECORD_TEXT_FIELDS + EXTRA_FIELDS
+# compared exactly (they are short codes), the other text fields ignore case
+EXACT_FIELDS = ("code", "grade")
+
+COMPARE_OPS = {"=": "==", "==": "==", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<num>-?\d+(?:\.\d+)?(?![\w.]))
+    | (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<op><=|>=|!=|==|=|<|>)
+    | (?P<punct>[(),])
+    | (?P<word>[^\s(),=<>!"']+)
+    )""", re.VERBOSE)
+
+
+class QueryError(ValueError):
+    pass
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m:
+            raise QueryError(f"Unexpected character at position {pos + 1}: {text[pos:pos + 10]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "str":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "word" and value.lower() in ("and", "or", "not", "in", "contains"):
+            kind, value = "kw", value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser producing a small tuple-based syntax tree."""
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.i = 0
+
+    def peek(self, kind=None, value=None):
+        if self.i >= len(self.tokens):
+            return None
+        tok = self.tokens[self.i]
+        if (kind and tok[0] != kind) or (value is not None and tok[1] != value):
+            return None
+        return tok
+
+    def take(self, kind=None, value=None, what="token"):
+        tok = self.peek(kind, value)
+        if tok is None:
+            got = self.tokens[self.i][1] if self.i < len(self.tokens) else "end of filter"
+            raise QueryError(f"Expected {what}, got {got!r}")
+        self.i += 1
+        return tok
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Empty filter")
+        node = self.parse_or()
+        if self.i != len(self.tokens):
+            raise QueryError(f"Unexpected {self.tokens[self.i][1]!r}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek("kw", "or"):
+            self.i += 1
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek("kw", "and"):
+            self.i += 1
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek("kw", "not"):
+            self.i += 1
+            return ("not", self.parse_not())
+        if self.peek("punct", "("):
+            self.i += 1
+            node = self.parse_or()
+            self.take("punct", ")", "')'")
+            return node
+        return self.parse_compare()
+
+    def value(self):
+        tok = self.peek()
+        if tok is None or tok[0] not in ("num", "str", "word"):
+            self.take(what="a value")
+        self.i += 1
+        return tok[1]
+
+    def parse_compare(self):
+        field = self.take("word", what="a field name")[1].lower()
+        if field not in FIELDS:
+            raise QueryError(f"Unknown field {field!r} (fields: {', '.join(FIELDS)})")
+        negate = False
+        if self.peek("kw", "not"):
+            self.i += 1
+            negate = True
+            if not self.peek("kw", "in"):
+                raise QueryError("Expected 'in' after 'not'")
+        if self.peek("kw", "in"):
+            self.i += 1
+            self.take("punct", "(", "'('")
+            values = [self.value()]
+            while self.peek("punct", ","):
+                self.i += 1
+                values.append(self.value())
+            self.take("punct", ")", "')'")
+            node = ("in", field, values)
+            return ("not", node) if negate else node
+        if self.peek("kw", "contains"):
+            self.i += 1
+            return ("contains", field, self.value())
+        op = self.take("op", what="a comparison operator")[1]
+        return ("cmp", field, COMPARE_OPS[op], self.value())
+
+
+def parse(text):
+    return _Parser(text).parse()
+
+
+def _uses_extra(node):
+    if node[0] in ("and", "or"):
+        return _uses_extra(node[1]) or _uses_extra(node[2])
+    if node[0] == "not":
+        return _uses_extra(node[1])
+    return node[1] in EXTRA_FIELDS
+
+
+class _Compiler:
+    def __init__(self):
+        self.consts = {}
+        self.uses_extra = False
+
+    def const(self, value):
+        name = f"_c{len(self.consts)}"
+        self.consts[name] = value
+        return name
+
+    def field_expr(self, field):
+        if field in EXTRA_FIELDS:
+            self.uses_extra = True
+            return f'_get(s["code"], _empty).get("{field}", "").lower()'
+        if field in EXACT_FIELDS or field in NUMERIC_FIELDS:
+            return f's["{field}"]'
+        return f's["{field}"].lower()'
+
+    def literal(self, field, value):
+        # values stay as typed until the field is known: an unquoted code like 0042 keeps its zeros
+        if field in NUMERIC_FIELDS:
+            try:
+                return float(value)
+            except ValueError:
+                raise QueryError(f"{field} needs a number, got {value!r}")
+        return value if field in EXACT_FIELDS else value.lower()
+
+    def exact_variants(self, values):
+        # grade/code compare exactly, so accept the typed, upper and lower forms
+        out = set()
+        for v in values:
+            out.update((v, v.upper(), v.lower()))
+        return out
+
+    def emit(self, node):
+        kind = node[0]
+        if kind == "and":
+            # record-only tests first, so extras are looked up only for rows that pass them
+            left, right = node[1], node[2]
+            if _uses_extra(left) and not _uses_extra(right):
+                left, right = right, left
+            return f"({self.emit(left)} and {self.emit(right)})"
+        if kind == "or":
+            return f"({self.emit(node[1])} or {self.emit(node[2])})"
+        if kind == "not":
+            return f"(not {self.emit(node[1])})"
+        field = node[1]
+        expr = self.field_expr(field)
+        if kind == "contains":
+            if field in NUMERIC_FIELDS:
+                raise QueryError(f"'contains' needs a text field, not {field}")
+            needle = self.literal(field, node[2])
+            return f"({self.const(needle.lower())} in {expr}.lower())" if field in EXACT_FIELDS else f"({self.const(needle)} in {expr})"
+        if kind == "in":
+            values = [self.literal(field, v) for v in node[2]]
+            if field in EXACT_FIELDS:
+                values = self.exact_variants(values)
+            return f"({expr} in {self.const(frozenset(values))})"
+        _, _, op, value = node
+        value = self.literal(field, value)
+        if field in EXACT_FIELDS and op in ("==", "!="):
+            test = f"({expr} in {self.const(frozenset(self.exact_variants([value])))})"
+            return test if op == "==" else f"(not {test})"
+        return f"({expr} {op} {self.const(value)})"
+
+
+class CompiledQuery:
+    """A parsed filter ready to run: query.filter(students, extra) -> matching list."""
+    def __init__(self, text):
+        self.text = text
+        self.tree = parse(text)
+        comp = _Compiler()
+        cond = comp.emit(self.tree)
+        self.uses_extra = comp.uses_extra
+        self.source = f"lambda _rows, _get, _empty: [s for s in _rows if {cond}]"
+        self._fn = eval(compile(self.source, "<filter>", "eval"), dict(comp.consts))
+
+    def filter(self, students, extra=None):
+        get = (extra or {}).get
+        return self._fn(students, get, {})
+
+    def matches(self, s, extra=None):
+        return bool(self.filter([s], extra))
@@ -0,0 +1,205 @@
+# treesync.py
+# Keeps a ttk.Treeview in step with a list of rows using the fewest Tk calls.
+# Every Tk call is a round trip through the interpreter, so instead of
+# deleting and re-inserting the whole table we diff against what we last
+# showed and only insert / delete / update / move the rows that differ.
+#
+# Alternating row stripes depend on position, so one deleted row would
+# re-tag every row below it. They are kept out of the diff and painted only
+# on the rows in view (paint), as the table scrolls.
+from bisect import bisect_left
+from math import ceil
+
+from studentmodel import ModelListener
+
+# above this many out-of-place rows a single set_children call is cheaper
+# than individual moves
+MAX_SINGLE_MOVES = 64
+
+
+def longest_increasing_run(seq):
+    """Indexes of one longest strictly increasing subsequence of seq."""
+    tails, tails_idx = [], []
+    prev = [-1] * len(seq)
+    for i, v in enumerate(seq):
+        j = bisect_left(tails, v)
+        if j == len(tails):
+            tails.append(v)
+            tails_idx.append(i)
+        else:
+            tails[j] = v
+            tails_idx[j] = i
+        prev[i] = tails_idx[j - 1] if j > 0 else -1
+    out = []
+    i = tails_idx[-1] if tails_idx else -1
+    while i != -1:
+        out.append(i)
+        i = prev[i]
+    out.reverse()
+    return out
+
+
+class TreeReconciler:
+    """Mirror of a flat Treeview: iid order plus the values/tags last sent to Tk.
+
+    Rows without tags of their own get the stripes tags in turn, but only
+    once paint() has seen them in view.
+    """
+    def __init__(self, tree, stripes=None):
+        self.tree = tree
+        self.stripes = stripes
+        self.order = []
+        self.rows = {}
+        # iid -> stripe tag it has in Tk
+        self.painted = {}
+        self.stats = {"insert": 0, "delete": 0, "update": 0, "move": 0, "paint": 0}
+
+    def clear(self):
+        if self.order:
+            self.tree.delete(*self.order)
+            self.stats["delete"] += len(self.order)
+        self.order = []
+        self.rows = {}
+        self.painted = {}
+
+    def update(self, rows):
+        """Send new values/tags for rows already shown, (iid, values, tags) as in sync()."""
+        for iid, values, tags in rows:
+            old = self.rows.get(iid)
+            if old is not None and old != (values, tags):
+                self.tree.item(iid, values=values, tags=tags)
+                self.stats["update"] += 1
+                self.rows[iid] = (values, tags)
+                self.painted.pop(iid, None)
+
+    def remove(self, iids):
+        """Delete rows that are shown; the rest keep their place."""
+        gone = {iid for iid in iids if iid in self.rows}
+        if not gone:
+            return
+        self.tree.delete(*gone)
+        self.stats["delete"] += len(gone)
+        for iid in gone:
+            del self.rows[iid]
+            self.painted.pop(iid, None)
+        self.order = [iid for iid in self.order if iid not in gone]
+
+    def paint(self, first, last):
+        """Stripe the rows between the yview fractions first and last, plus a page either side."""
+        if not self.stripes or not self.order:
+            return
+        n = len(self.order)
+        lo, hi = int(float(first) * n), ceil(float(last) * n)
+        page = hi - lo + 1
+        stripes, painted, rows, tree = self.stripes, self.painted, self.rows, self.tree
+        for i in range(max(0, lo - page), min(n, hi + page)):
+            iid = self.order[i]
+            if rows[iid][1]:
+                continue
+            stripe = stripes[i % len(stripes)]
+            if painted.get(iid) != stripe:
+                tree.item(iid, tags=(stripe,))
+                painted[iid] = stripe
+                self.stats["paint"] += 1
+
+    def sync(self, rows):
+        """Make the tree show rows, a list of (iid, values, tags) in display order."""
+        tree = self.tree
+        new_order = [r[0] for r in rows]
+        new_pos = {iid: i for i, iid in enumerate(new_order)}
+
+        gone = [iid for iid in self.order if iid not in new_pos]
+        if gone:
+            tree.delete(*gone)
+            self.stats["delete"] += len(gone)
+            for iid in gone:
+                del self.rows[iid]
+                self.painted.pop(iid, None)
+        kept = [iid for iid in self.order if iid in new_pos]
+
+        # rows on the longest run already in the right relative order stay put
+        seq = [new_pos[iid] for iid in kept]
+        stable = {kept[i] for i in longest_increasing_run(seq)}
+        misplaced = len(kept) - len(stable)
+        added = len(new_order) - len(kept)
+        bulk = misplaced + added > MAX_SINGLE_MOVES
+
+        mirror = list(kept)
+        appended = []
+        prev = None
+        for iid, values, tags in rows:
+            old = self.rows.get(iid)
+            if old is None:
+                if bulk:
+                    tree.insert("", "end", iid=iid, values=values, tags=tags)
+                    appended.append(iid)
+                else:
+                    index = mirror.index(prev) + 1 if prev is not None else 0
+                    tree.insert("", index, iid=iid, values=values, tags=tags)
+                    mirror.insert(index, iid)
+                self.stats["insert"] += 1
+            else:
+                if old != (values, tags):
+                    tree.item(iid, values=values, tags=tags)
+                    self.stats["update"] += 1
+                    self.painted.pop(iid, None)
+                if not bulk and iid not in stable:
+                    mirror.remove(iid)
+                    index = mirror.index(prev) + 1 if prev is not None else 0
+                    tree.move(iid, "", index)
+                    self.stats["move"] += 1
+                    mirror.insert(index, iid)
+            self.rows[iid] = (values, tags)
+            prev = iid
+
+        if bulk and kept + appended != new_order:
+            # one call reorders every row
+            tree.set_children("", *new_order)
+            self.stats["move"] += misplaced
+        self.order = new_order
+
+
+class RowChanges(ModelListener):
+    """Codes whose table rows are out of date since the last take().
+
+    changed is None when every row is; removed holds the codes of deleted
+    records; moved is set when rows were added or reordered, so the order has
+    to be synced as well.
+    """
+    def __init__(self):
+        self.changed = None
+        self.removed = set()
+        self.moved = True
+
+    def take(self):
+        changed, removed, moved = self.changed, self.removed, self.moved
+        self.changed, self.removed, self.moved = set(), set(), False
+        return changed, removed, moved
+
+    def _touch(self, *codes):
+        if self.changed is not None:
+            self.changed.update(codes)
+
+    def records_reset(self, students):
+        self.changed = None
+        self.removed = set()
+        self.moved = True
+
+    def records_regraded(self, students):
+        self.changed = None
+
+    def records_reordered(self, students):
+        self.moved = True
+
+    def record_added(self, s):
+        self._touch(s["code"])
+        self.moved = True
+
+    def record_removed(self, s):
+        self._touch(s["code"])
+        self.removed.add(s["code"])
+
+    def record_changed(self, old, s):
+        self._touch(old["code"], s["code"])
+        if old["code"] != s["code"]:
+            self.moved = True
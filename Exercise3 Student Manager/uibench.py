@@ -0,0 +1,290 @@
+# uibench.py
+# Responsiveness of the real window: the app is started on an X display
+# (a private Xvfb server when there is none), synthetic key presses and
+# clicks are injected with event_generate, and each latency runs from the
+# event until update_idletasks() has nothing left to do, so it includes the
+# Tk work (Treeview and Listbox updates, geometry, redraw) that benchmark.py
+# leaves out. For example:
+#
+#     python uibench.py --sizes 1k,10k,100k --repeat 20 --out ui.json
+#
+# Per scenario the report also gives the median time spent in the Python
+# handler itself (from the app's own @timed records); the rest is Tk's. Every
+# sample checks that its handler really ran, and an exception in a Tk callback
+# or a message box the app tries to show stops the run with that message
+# (a modal dialog would otherwise stall it).
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter as tk
+import traceback
+from datetime import datetime
+
+import gencohort
+import studentmanager
+from benchmark import search_queries, summarize
+from perfstats import PERF
+
+XVFB_SCREEN = "1280x1024x24"
+XVFB_START_S = 10.0
+LOAD_TIMEOUT_S = 600.0
+# a point inside the Treeview's heading row
+HEADING_Y = 10
+SORT_COLUMNS = ("total", "name", "exam", "code")
+KEYSYMS = {" ": "space", "-": "minus", "'": "apostrophe", ".": "period"}
+
+
+def start_xvfb():
+    """Start Xvfb on a free display and point DISPLAY at it; returns the process."""
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise SystemExit("No X display: set DISPLAY or install Xvfb (e.g. apt install xvfb)")
+    n = next(n for n in range(99, 1000) if not os.path.exists(f"/tmp/.X{n}-lock"))
+    proc = subprocess.Popen([xvfb, f":{n}", "-screen", "0", XVFB_SCREEN, "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + XVFB_START_S
+    while not os.path.exists(f"/tmp/.X11-unix/X{n}"):
+        if proc.poll() is not None or time.monotonic() > deadline:
+            proc.kill()
+            raise SystemExit(f"Xvfb did not start on :{n}")
+        time.sleep(0.05)
+    os.environ["DISPLAY"] = f":{n}"
+    return proc
+
+
+class Problems:
+    """What went wrong inside the app: Tk callback exceptions and the message boxes it showed.
+
+    Stands in for studentmanager's messagebox while the benchmark runs.
+    """
+    def __init__(self):
+        self.seen = []
+
+    def callback_exception(self, exc, value, tb):
+        self.seen.append("".join(traceback.format_exception(exc, value, tb)).rstrip())
+
+    def _shown(self, title, message, **options):
+        self.seen.append(f"The app showed a message box: {title}: {message}")
+
+    showinfo = showwarning = showerror = _shown
+
+    def askyesno(self, title, message, **options):
+        # only asked when closing with background jobs running
+        return True
+
+    def check(self):
+        if self.seen:
+            raise RuntimeError(self.seen[0])
+
+
+def measure(root, action, problems):
+    """Seconds from running action (which injects events) until Tk's idle work is done."""
+    # start from a quiet event loop so one sample's redraw is not charged to the next
+    root.update()
+    start = time.perf_counter()
+    action()
+    root.update_idletasks()
+    elapsed = time.perf_counter() - start
+    problems.check()
+    return elapsed
+
+
+def click(widget, x=None, y=None):
+    x = widget.winfo_width() // 2 if x is None else x
+    y = widget.winfo_height() // 2 if y is None else y
+    widget.event_generate("<Enter>", x=x, y=y)
+    widget.event_generate("<ButtonPress-1>", x=x, y=y)
+    widget.event_generate("<ButtonRelease-1>", x=x, y=y)
+
+
+def heading_x(tree, col):
+    """x of the middle of col's heading, checked against the Treeview's own hit test."""
+    shown = list(tree["displaycolumns"])
+    if not shown or shown[0] == "#all":
+        shown = list(tree["columns"])
+    x = 0
+    for c in shown:
+        width = tree.column(c, "width")
+        if c == col:
+            x += width // 2
+            break
+        x += width
+    if tree.identify_region(x, HEADING_Y) != "heading" or tree.identify_column(x) != f"#{shown.index(col) + 1}":
+        raise RuntimeError(f"Could not find the heading of column {col!r}")
+    return x
+
+
+def handler_ms(op):
+    st = dict(PERF.snapshot()).get(op)
+    return st.percentile(50) if st is not None else None
+
+
+def handler_calls(op):
+    st = dict(PERF.snapshot()).get(op)
+    return st.count if st is not None else 0
+
+
+def expect_call(op, before, what):
+    if handler_calls(op) <= before:
+        raise RuntimeError(f"{what} did not run {op}: the synthetic events are not reaching the widget")
+
+
+def bench_keystrokes(app, queries, problems):
+    """Latency of each key typed into the search box (KeyRelease runs update_suggestions)."""
+    root, entry = app.root, app.search_entry
+    entry.focus_force()
+    root.update()
+    # Tk sends key events to the focus window, and drops them when it has none
+    if root.focus_get() is not entry:
+        raise RuntimeError(f"The search box did not get the keyboard focus (focus is on {root.focus_get()})")
+    times = []
+    for q in queries:
+        app.search_var.set("")
+        entry.icursor("end")
+        for ch in q:
+            keysym = KEYSYMS.get(ch, ch)
+            before = handler_calls("update_suggestions")
+            times.append(measure(root, lambda: (entry.event_generate("<KeyPress>", keysym=keysym),
+                                                entry.event_generate("<KeyRelease>", keysym=keysym)), problems))
+            expect_call("update_suggestions", before, f"Typing {ch!r}")
+        if app.search_var.get() != q:
+            raise RuntimeError(f"Typed {q!r} but the search box holds {app.search_var.get()!r}: "
+                               "synthetic key events are not reaching the entry")
+    app.search_var.set("")
+    app.show_suggestions([])
+    return times
+
+
+def bench_sort(app, repeat, problems):
+    """Header click to repainted table, cycling through a few columns."""
+    root, tree = app.root, app.tree
+    times = []
+    for i in range(repeat):
+        col = SORT_COLUMNS[i % len(SORT_COLUMNS)]
+        x = heading_x(tree, col)
+        before = handler_calls("sort_by_column")
+        times.append(measure(root, lambda: click(tree, x, HEADING_Y), problems))
+        expect_call("sort_by_column", before, f"Clicking the {col!r} heading")
+    return times
+
+
+def bench_dialog(app, repeat, problems):
+    """Click on "View Individual" until its dialog is laid out; the dialog is closed after each run."""
+    root = app.root
+    button = next(w for w in app.busy_widgets if w.winfo_class() == "Button" and w.cget("text") == "View Individual")
+    times = []
+    for _ in range(repeat):
+        before = set(root.winfo_children())
+        times.append(measure(root, lambda: click(button), problems))
+        opened = [w for w in root.winfo_children() if w not in before and w.winfo_class() == "Toplevel"]
+        if not opened:
+            raise RuntimeError("Clicking View Individual did not open a dialog")
+        for w in opened:
+            w.destroy()
+    return times
+
+
+def bench_size(label, n, data_dir, seed, repeat, log):
+    cohort_dir = os.path.join(data_dir, f"{label}-seed{seed}")
+    marks_path = os.path.join(cohort_dir, "studentMarks.txt")
+    extra_path = os.path.join(cohort_dir, "studentExtra.json")
+    if not (os.path.exists(marks_path) and os.path.exists(extra_path)):
+        log(f"  generating {n} students in {cohort_dir}")
+        gencohort.write_cohort(cohort_dir, n, seed)
+    # the window reads its data files from these when it is created
+    studentmanager.MARKS_FILE = marks_path
+    studentmanager.EXTRA_FILE = extra_path
+
+    results = {}
+
+    def record(name, times, op=None):
+        results[name] = summarize(times)
+        if op is not None:
+            results[name]["handler_median_ms"] = handler_ms(op)
+        r = results[name]
+        handler = f"   handler {r['handler_median_ms']:8.2f} ms" if r.get("handler_median_ms") is not None else ""
+        log(f"  {name:<18} median {r['median_ms']:8.2f} ms   p95 {r['p95_ms']:8.2f} ms   p99 {r['p99_ms']:8.2f} ms{handler}")
+
+    PERF.reset()
+    root = tk.Tk()
+    problems = Problems()
+    root.report_callback_exception = problems.callback_exception
+    messagebox = studentmanager.messagebox
+    studentmanager.messagebox = problems
+    app = None
+    try:
+        start = time.perf_counter()
+        app = studentmanager.StudentManager(root, "uibench")
+        while app.loading or not app.table.order:
+            problems.check()
+            if time.perf_counter() - start > LOAD_TIMEOUT_S:
+                raise RuntimeError("Loading did not finish")
+            root.update()
+            time.sleep(0.005)
+        root.update_idletasks()
+        results["load"] = {"seconds": time.perf_counter() - start}
+        log(f"  {'load':<18} {results['load']['seconds']:.2f} s")
+
+        rng = random.Random(seed)
+        # typed as a user would: names and codes, each key waits for the last to settle
+        queries = [q for q in search_queries(app.students, rng, max(1, repeat // 4)) if q]
+        record("keystroke", bench_keystrokes(app, queries, problems), "update_suggestions")
+        record("header click", bench_sort(app, repeat, problems), "sort_by_column")
+        record("dialog open", bench_dialog(app, repeat, problems), "view_individual")
+    finally:
+        if app is not None:
+            app.on_close()
+        else:
+            root.destroy()
+        studentmanager.messagebox = messagebox
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Student Manager UI latency with synthetic input on an X display.")
+    parser.add_argument("--sizes", default="1k,10k,100k", help="comma separated sizes, e.g. 1k,100k,1M")
+    parser.add_argument("--repeat", type=int, default=20, help="clicks per scenario (typing uses repeat/4 queries)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default=os.path.join(tempfile.gettempdir(), "studentmanager-bench"),
+                        help="where generated cohorts are kept between runs")
+    parser.add_argument("--xvfb", action="store_true", help="use a private Xvfb display even if DISPLAY is set")
+    parser.add_argument("--out", default=None, help="write results to this JSON file")
+    args = parser.parse_args()
+
+    xvfb = start_xvfb() if args.xvfb or not os.environ.get("DISPLAY") else None
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "display": os.environ.get("DISPLAY"),
+        "xvfb": xvfb is not None,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "sizes": {},
+    }
+    try:
+        for label in args.sizes.split(","):
+            label = label.strip()
+            n = gencohort.parse_size(label)
+            print(f"{label} ({n} students)")
+            report["sizes"][label] = bench_size(label, n, args.data, args.seed, args.repeat, print)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# workspace.py
+# A workspace is a directory holding one marks file per module/year ("cohort").
+# Opening one only lists the files; a cohort is parsed the first time it is
+# selected, in a process pool so several cohorts can be parsed at once and the
+# Tk thread never waits on the disk. The last few parsed cohorts are kept, so
+# flicking back to one is instant too.
+import glob
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from studentmodel import read_marks
+
+MARKS_PATTERN = "*.txt"
+# parsed cohorts kept (least recently used dropped first)
+MAX_CACHED_COHORTS = 4
+
+
+def cohort_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def extra_path_for(marks_path):
+    """Extra details file that goes with a marks file (studentMarks.txt -> studentExtra.json)."""
+    base, _ = os.path.splitext(marks_path)
+    if base.endswith("Marks"):
+        return base[:-len("Marks")] + "Extra.json"
+    return base + ".json"
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class Workspace:
+    """Cohorts found in a directory, parsed lazily and concurrently on demand."""
+    def __init__(self, directory, max_workers=None, use_processes=True, max_cached=MAX_CACHED_COHORTS):
+        self.directory = directory
+        self.paths = {}
+        for path in sorted(glob.glob(os.path.join(directory, MARKS_PATTERN))):
+            self.paths[cohort_name(path)] = path
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.max_cached = max_cached
+        self._executor = None
+        # cohort -> (file signature, future), least recently used first
+        self._loaded = OrderedDict()
+
+    @property
+    def cohorts(self):
+        return list(self.paths)
+
+    def _pool(self):
+        if self._executor is None:
+            if self.use_processes:
+                try:
+                    # spawn, not fork: the GUI process has Tk and watcher threads running
+                    ctx = multiprocessing.get_context("spawn")
+                    self._executor = ProcessPoolExecutor(self.max_workers, mp_context=ctx)
+                except (OSError, ValueError, NotImplementedError):
+                    self._executor = None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor
+
+    def load(self, cohort):
+        """Future for the cohort's parsed records. A file is re-parsed only after it changes."""
+        path = self.paths[cohort]
+        sig = file_signature(path)
+        cached = self._loaded.get(cohort)
+        if cached and cached[0] == sig:
+            self._loaded.move_to_end(cohort)
+            return cached[1]
+        future = self._pool().submit(read_marks, path)
+        self._loaded[cohort] = (sig, future)
+        self._loaded.move_to_end(cohort)
+        while len(self._loaded) > self.max_cached:
+            _, (_, old) = self._loaded.popitem(last=False)
+            old.cancel()
+        return future
+
+    def records(self, cohort):
+        """The cohort's records as new dicts, which the caller may change; blocks until parsed.
+
+        The cached records stay exactly as parsed, so edits made to one copy
+        never show up when the cohort is selected again.
+        """
+        return [dict(s) for s in self.load(cohort).result()]
+
+    def prefetch(self, cohorts):
+        for name in cohorts:
+            if name in self.paths:
+                self.load(name)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None